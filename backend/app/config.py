@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,6 +6,77 @@ class Settings(BaseSettings):
     jwt_secret: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24 * 7  # 7 days
+
+    # Tests/CI: relationships using app.db.LAZY_LOAD raise instead of lazy-loading (catches N+1)
+    orm_raise_on_lazy_load: bool = False
+
+    # Use orjson for the default JSON response class (opt-in)
+    orjson_responses: bool = False
+
+    # Response compression
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes - smaller bodies are sent as-is
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_content_types: list[str] = [
+        "application/json",
+        "text/html",
+        "text/plain",
+        "text/css",
+        "text/csv",
+        "application/javascript",
+        "image/svg+xml",
+    ]
+
+    # Notification outbox relay
+    notification_outbox_enabled: bool = True
+    notification_outbox_interval: float = 1.0  # seconds between polls when the outbox is empty
+    notification_outbox_batch_size: int = 200
+    # Live notification streams LISTEN on this connection; pgbouncer in transaction
+    # mode can't hold a LISTEN, so point this at a direct/session-pooled URL
+    notification_listen_url: Optional[str] = None  # defaults to database_url
+
+    # Notification retention (scheduled maintenance)
+    notification_maintenance_enabled: bool = True
+    notification_maintenance_interval: int = 3600  # seconds between runs
+    notification_maintenance_batch_size: int = 1000
+    notification_retention_days: int = 90  # read notifications older than this are removed
+    notification_retention_action: str = "archive"  # "archive" (to notifications_archive) or "delete"
+
+    # Conversations of ended jobs/hires become read-only; paid hires after a week (swept)
+    conversation_status_sweep_interval: int = 3600  # seconds between sweeps
+
+    # Contract/worker payment balances are recomputed from the payment ledger
+    payment_balance_reconcile_interval: int = 3600  # seconds between runs
+    statement_timezone: str = "Asia/Manila"  # earnings statement dates are in this local time
+
+    # Notification digests: repeated notifications about the same thing are merged
+    notification_digest_types: list[str] = ["job_application"]
+    notification_digest_window_minutes: int = 60  # default for users without a digest preference
+    notification_timezone: str = "Asia/Manila"  # quiet hours are in this local time
+
+    # Web Push (VAPID) - disabled until a key pair is configured
+    web_push_enabled: bool = True
+    vapid_public_key: Optional[str] = None   # base64url application server key, given to clients
+    vapid_private_key: Optional[str] = None  # base64url private key or path to a PEM file
+    vapid_subject: str = "mailto:admin@casaligan.local"
+    web_push_ttl: int = 86400  # seconds the push service keeps an undelivered push
+    web_push_batch_size: int = 100
+    web_push_concurrency: int = 8
+    web_push_interval: float = 2.0  # seconds between polls when nothing is due
+
+    # Upload storage: "local" (files under upload_dir) or "s3" (any S3-compatible store)
+    storage_backend: str = "local"
+    upload_dir: str = "uploads"
+    upload_tmp_dir: str = ".upload_tmp"  # Keep on the same filesystem as upload_dir
+    s3_bucket: str = ""
+    s3_endpoint_url: Optional[str] = None  # e.g. http://localhost:9000 for MinIO
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    s3_public_url: Optional[str] = None  # CDN or bucket URL used to build file URLs
+    s3_presign_expires: int = 900  # seconds
+    orphan_blob_sweep_interval: int = 86400  # seconds between sweeps for unreferenced blobs
     
     class Config:
         env_file = ".env"
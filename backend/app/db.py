@@ -21,8 +21,30 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessions for routes that change state: a real READ COMMITTED transaction, so the
+# route's changes and anything written alongside them (notification outbox rows,
+# payment ledger entries) are committed together by its db.commit() or not at all
+TransactionalSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine.execution_options(isolation_level="READ COMMITTED")
+)
+
 Base = declarative_base()
 
+# Loader for relationships meant to be loaded explicitly (selectinload/joinedload or a
+# query). With ORM_RAISE_ON_LAZY_LOAD=true (tests/CI) touching one that isn't loaded -
+# usually an N+1 inside a loop - raises instead of quietly running a query per row.
+LAZY_LOAD = "raise_on_sql" if settings.orm_raise_on_lazy_load else "select"
+
+def transactional_connection():
+    """Connection with a real transaction for background jobs
+
+    The engine defaults to AUTOCOMMIT; row locks and multi-statement atomicity need
+    READ COMMITTED. Use as `with transactional_connection() as conn, conn.begin():`.
+    """
+    return engine.connect().execution_options(isolation_level="READ COMMITTED")
+
 def get_db():
     """Dependency for FastAPI routes"""
     db = SessionLocal()
@@ -30,3 +52,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_transactional_db():
+    """Dependency for FastAPI routes that change state (POST/PUT/PATCH/DELETE)
+
+    Nothing is written until the route commits; an exception rolls everything back.
+    """
+    db = TransactionalSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
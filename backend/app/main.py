@@ -1,10 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from app.config import settings
+from app.middleware.compression import CompressionMiddleware
+from app.serialization import get_default_response_class
+from app.staticfiles import UploadStaticFiles
 from app.routers import auth, jobs, payments, checkins, progress, debug, upload, reports, packages, direct_hire, notifications, ratings, messaging
 
-app = FastAPI(title="Casaligan API", version="1.0.0")
+app = FastAPI(
+    title="Casaligan API",
+    version="1.0.0",
+    default_response_class=get_default_response_class(),
+)
 
 # CORS is critical for the Frontend to talk to the Backend
 origins = [
@@ -28,10 +35,21 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# Create uploads directory and mount static files
-UPLOAD_DIR = Path("uploads")
+# Compress large JSON payloads (job lists, worker profiles) for mobile clients
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        content_types=settings.compression_content_types,
+    )
+
+# Create uploads directory and mount static files. Local-disk uploads (and files
+# uploaded before switching to S3) keep being served from here.
+UPLOAD_DIR = Path(settings.upload_dir)
 UPLOAD_DIR.mkdir(exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # Include routers
 app.include_router(auth.router)
@@ -61,6 +79,64 @@ async def startup_event():
     except Exception as e:
         print(f"⚠ Warning: Could not connect to database: {e}")
         print("  The application will start but database operations may fail.")
+    
+    # Deliver queued notifications in the background
+    from app.services.notification_outbox import start_outbox_relay
+    start_outbox_relay()
+    
+    # Receive delivered notifications for this process's live streams
+    from app.services.notification_stream import start_listener
+    start_listener()
+    
+    # Send Web Push notifications in the background (no-op without VAPID keys)
+    from app.services.web_push import start_push_worker
+    start_push_worker()
+    
+    # Periodic maintenance jobs
+    from app.services.scheduler import schedule
+    if settings.notification_maintenance_enabled:
+        from app.services.notification_maintenance import run_notification_maintenance
+        schedule(
+            "notification_maintenance",
+            run_notification_maintenance,
+            interval=settings.notification_maintenance_interval,
+            initial_delay=60
+        )
+    from app.services.conversation_status import sweep_conversation_status
+    schedule(
+        "conversation_status",
+        sweep_conversation_status,
+        interval=settings.conversation_status_sweep_interval,
+        initial_delay=30
+    )
+    from app.services.payment_ledger import reconcile_payment_balances
+    schedule(
+        "payment_balances",
+        reconcile_payment_balances,
+        interval=settings.payment_balance_reconcile_interval,
+        initial_delay=90
+    )
+    from app.services.upload_storage import sweep_orphan_blobs
+    schedule(
+        "orphan_blobs",
+        sweep_orphan_blobs,
+        interval=settings.orphan_blob_sweep_interval,
+        initial_delay=120
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    from app.services.image_service import shutdown_pool
+    from app.services.notification_outbox import stop_outbox_relay
+    from app.services.notification_stream import stop_listener
+    from app.services.scheduler import stop_scheduled_tasks
+    from app.services.web_push import stop_push_worker
+    await stop_outbox_relay()
+    await stop_listener()
+    await stop_push_worker()
+    await stop_scheduled_tasks()
+    shutdown_pool()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,219 @@
+"""
+Response compression middleware (gzip, and Brotli when the `brotli` package is installed)
+
+Only responses whose content type is in the allowlist and whose body is at least
+`minimum_size` bytes are compressed. Streaming responses are compressed chunk by
+chunk and flushed after every chunk, so clients still receive data incrementally.
+"""
+import zlib
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional - fall back to gzip only
+    brotli = None
+
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+# Responses that must never carry a compressed body
+_SKIP_STATUS_CODES = {204, 206, 304}
+
+
+class _GzipEncoder:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31 -> gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Parse an Accept-Encoding header into {coding: q-value}"""
+    codings = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+class CompressionMiddleware:
+    """Compress eligible responses with Brotli or gzip depending on Accept-Encoding"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        content_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES,
+        enable_brotli: bool = True,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = {t.lower() for t in content_types}
+        self.enable_brotli = enable_brotli and brotli is not None
+
+    def select_encoding(self, accept_encoding: str) -> Optional[str]:
+        """Pick the best supported encoding the client accepts"""
+        codings = parse_accept_encoding(accept_encoding)
+        wildcard = codings.get("*", 0.0)
+        if self.enable_brotli and codings.get("br", wildcard) > 0:
+            return "br"
+        if codings.get("gzip", wildcard) > 0:
+            return "gzip"
+        return None
+
+    def create_encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = self.select_encoding(headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request state: buffers the start message until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.encoder = None
+
+    def is_compressible(self, message: Message) -> bool:
+        if message.get("status") in _SKIP_STATUS_CODES:
+            return False
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.middleware.content_types
+
+    def prepare_headers(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the start message until we know whether the body gets compressed
+            self.initial_message = message
+            self.passthrough = not self.is_compressible(message)
+            return
+
+        if message_type != "http.response.body":
+            # Anything else (e.g. http.response.zerocopy) is sent as-is, so the
+            # held start message has to go out first, uncompressed
+            if self.initial_message and not self.started:
+                self.started = True
+                self.passthrough = True
+                await self.downstream(self.initial_message)
+            await self.downstream(message)
+            return
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.downstream(self.initial_message)
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Small response - not worth the CPU
+                await self.downstream(self.initial_message)
+                await self.downstream(message)
+                return
+
+            self.encoder = self.middleware.create_encoder(self.encoding)
+
+            if not more_body:
+                # Whole body available - compress in one go
+                body = self.encoder.finish(body)
+                self.prepare_headers(len(body))
+                await self.downstream(self.initial_message)
+                await self.downstream({"type": "http.response.body", "body": body})
+                return
+
+            # First chunk of a streaming response
+            self.prepare_headers(None)
+            await self.downstream(self.initial_message)
+            await self.downstream({
+                "type": "http.response.body",
+                "body": self.encoder.compress(body),
+                "more_body": True,
+            })
+            return
+
+        # Subsequent chunks of a streaming response
+        chunk = self.encoder.compress(body) if more_body else self.encoder.finish(body)
+        await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
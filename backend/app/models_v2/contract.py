@@ -2,7 +2,7 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.db import Base
+from app.db import Base, LAZY_LOAD
 import enum
 
 class ContractStatus(str, enum.Enum):
@@ -38,6 +38,6 @@ class Contract(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
-    post = relationship("ForumPost", back_populates="contracts")
-    worker = relationship("Worker")
-    payment_schedules = relationship("PaymentSchedule", back_populates="contract")
+    post = relationship("ForumPost", back_populates="contracts", lazy=LAZY_LOAD)
+    worker = relationship("Worker", lazy=LAZY_LOAD)
+    payment_schedules = relationship("PaymentSchedule", back_populates="contract", lazy=LAZY_LOAD)
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import ARRAY, ENUM
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Index, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.db import Base
 import enum
@@ -32,6 +32,12 @@ class Conversation(Base):
     title = Column(String(255), nullable=True)  # Optional custom title
     status = Column(conversation_status_enum, default='active')
     
+    # Inbox summary, kept current by app.services.conversation_summary
+    last_message_id = Column(Integer, nullable=True)
+    last_message_preview = Column(String(255), nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    unread_counts = Column(ARRAY(Integer), nullable=False, default=list)  # unread_counts[i] belongs to participant_ids[i]
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -52,6 +58,13 @@ class Message(Base):
     content = Column(Text, nullable=False)
     message_type = Column(String(50), default="text")  # text, image, system
     
+    # Client-generated key; retried sends with the same key return the original message
+    client_message_id = Column(String(64), nullable=True)
+    
+    # Full-text search (GIN indexed; see app.services.message_search). Deferred so
+    # ordinary message loads don't fetch the tsvector
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True)))
+    
     # Timestamps
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
     read_at = Column(DateTime(timezone=True), nullable=True)  # When recipient read it
@@ -59,6 +72,14 @@ class Message(Base):
     # Soft delete
     deleted_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Constraints
+    __table_args__ = (
+        Index(
+            'idx_messages_sender_client_id', 'sender_id', 'client_message_id',
+            unique=True, postgresql_where=client_message_id.isnot(None)
+        ),
+    )
+    
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User", foreign_keys=[sender_id])
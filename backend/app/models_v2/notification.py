@@ -1,11 +1,18 @@
 """Notification model for in-app notifications"""
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Time, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
 import enum
 
 
+class DigestFrequency(str, enum.Enum):
+    IMMEDIATE = "immediate"   # Every event is its own notification
+    HOURLY = "hourly"         # Repeated events merged for up to an hour
+    DAILY = "daily"           # Repeated events merged for up to a day
+
+
 class NotificationType(str, enum.Enum):
     # Job/Contract related (Flow 1)
     JOB_APPLICATION = "job_application"           # Worker applied to your job
@@ -53,11 +60,83 @@ class Notification(Base):
     is_read = Column(Boolean, default=False, nullable=False)
     read_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Digest: how many events this row stands for (see notification_digest)
+    group_count = Column(Integer, default=1, nullable=False)
+    
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())  # latest event for digests
     
     # Relationship
     user = relationship("User", back_populates="notifications")
     
     def __repr__(self):
         return f"<Notification(id={self.notification_id}, user={self.user_id}, type={self.type})>"
+
+
+class NotificationOutbox(Base):
+    """Notifications written with a state change, waiting to be delivered by the outbox relay"""
+    __tablename__ = "notification_outbox"
+    
+    outbox_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Same content as Notification
+    type = Column(SQLEnum(NotificationType), nullable=False)
+    title = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    reference_type = Column(String(50), nullable=True)
+    reference_id = Column(Integer, nullable=True)
+    
+    # Delivery tracking - rows are deleted once delivered
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.outbox_id}, user={self.user_id}, type={self.type})>"
+
+
+class NotificationArchive(Base):
+    """Read notifications moved out of the notifications table by the retention job"""
+    __tablename__ = "notifications_archive"
+    
+    notification_id = Column(Integer, primary_key=True)  # Same ID as in notifications
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    type = Column(SQLEnum(NotificationType), nullable=False)
+    title = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    reference_type = Column(String(50), nullable=True)
+    reference_id = Column(Integer, nullable=True)
+    group_count = Column(Integer, default=1, nullable=False)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class NotificationCounter(Base):
+    """Per-user unread notification count, kept in step with the notifications table"""
+    __tablename__ = "notification_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class NotificationPreference(Base):
+    """Per-user notification settings (users without a row get the defaults)"""
+    __tablename__ = "notification_preferences"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    
+    # Notification type values the user doesn't want at all
+    muted_types = Column(ARRAY(String), nullable=False, default=list)
+    
+    # No live/push delivery between these local times (notifications are still listed)
+    quiet_hours_start = Column(Time, nullable=True)
+    quiet_hours_end = Column(Time, nullable=True)
+    
+    # How long repeated notifications are merged into one digest (see DigestFrequency)
+    digest_frequency = Column(String(20), default=DigestFrequency.HOURLY.value, nullable=False)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
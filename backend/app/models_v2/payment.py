@@ -1,8 +1,8 @@
 """Payment models - Clean version"""
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Numeric, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Numeric, Enum as SQLEnum, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.db import Base
+from app.db import Base, LAZY_LOAD
 import enum
 
 class PaymentFrequency(str, enum.Enum):
@@ -35,8 +35,8 @@ class PaymentSchedule(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    contract = relationship("Contract", back_populates="payment_schedules")
-    transaction = relationship("PaymentTransaction", back_populates="schedule", uselist=False)
+    contract = relationship("Contract", back_populates="payment_schedules", lazy=LAZY_LOAD)
+    transaction = relationship("PaymentTransaction", back_populates="schedule", uselist=False, lazy=LAZY_LOAD)
 
 class PaymentTransaction(Base):
     """Actual payment transactions with proof"""
@@ -63,8 +63,9 @@ class PaymentTransaction(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relationships
-    schedule = relationship("PaymentSchedule", back_populates="transaction")
+    # Relationships - the schedule is joined into every transaction query, so the
+    # convenience properties below never cost a query per transaction
+    schedule = relationship("PaymentSchedule", back_populates="transaction", lazy="joined", innerjoin=True)
     
     # Convenience properties to get data from schedule
     @property
@@ -88,3 +89,51 @@ class CheckIn(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
+class LedgerEntryType(str, enum.Enum):
+    SENT = "sent"            # Owner marked a payment as sent (awaiting the worker's confirmation)
+    CONFIRMED = "confirmed"  # Worker confirmed a sent payment (awaiting -> earned)
+    DISPUTED = "disputed"    # Worker disputed a sent payment (leaves awaiting)
+    RECORDED = "recorded"    # Owner recorded a completed payment directly (short-term jobs)
+
+class PaymentLedgerEntry(Base):
+    """Append-only record of payment movements; balances are running sums of these"""
+    __tablename__ = "payment_ledger"
+    
+    entry_id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.contract_id"), nullable=False, index=True)
+    worker_id = Column(Integer, ForeignKey("workers.worker_id"), nullable=False, index=True)
+    schedule_id = Column(Integer, nullable=True)
+    transaction_id = Column(Integer, nullable=True)
+    
+    entry_type = Column(String(20), nullable=False)  # LedgerEntryType value
+    amount = Column(Numeric, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # A transaction is earned once; sent/disputed may repeat (re-sent after a dispute)
+        Index(
+            'idx_payment_ledger_earned_once', 'transaction_id',
+            unique=True, postgresql_where=entry_type.in_(['confirmed', 'recorded'])
+        ),
+    )
+
+class ContractBalance(Base):
+    """Running payment totals for one contract (maintained from the ledger)"""
+    __tablename__ = "contract_balances"
+    
+    contract_id = Column(Integer, ForeignKey("contracts.contract_id"), primary_key=True)
+    worker_id = Column(Integer, ForeignKey("workers.worker_id"), nullable=False, index=True)
+    awaiting_amount = Column(Numeric, nullable=False, default=0)  # Sent, not yet confirmed
+    earned_amount = Column(Numeric, nullable=False, default=0)    # Confirmed or recorded
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WorkerBalance(Base):
+    """Running payment totals for one worker across all contracts"""
+    __tablename__ = "worker_balances"
+    
+    worker_id = Column(Integer, ForeignKey("workers.worker_id"), primary_key=True)
+    awaiting_amount = Column(Numeric, nullable=False, default=0)
+    earned_amount = Column(Numeric, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,45 @@
+"""Web Push models - Browser/PWA push subscriptions and the queue of pushes to send"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class PushSubscription(Base):
+    """A Web Push subscription (PushSubscription.toJSON() from the browser)"""
+    __tablename__ = "push_subscriptions"
+
+    subscription_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    endpoint = Column(Text, nullable=False, unique=True)  # Push service URL for this browser
+    p256dh = Column(String(255), nullable=False)          # Client public key (payload encryption)
+    auth = Column(String(255), nullable=False)            # Client auth secret
+    user_agent = Column(String(255), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_success_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<PushSubscription(id={self.subscription_id}, user={self.user_id})>"
+
+
+class PushDelivery(Base):
+    """One notification waiting to be pushed to one subscription"""
+    __tablename__ = "push_deliveries"
+
+    delivery_id = Column(Integer, primary_key=True, index=True)
+    subscription_id = Column(
+        Integer, ForeignKey("push_subscriptions.subscription_id", ondelete="CASCADE"), nullable=False
+    )
+    notification_id = Column(Integer, nullable=True)
+    payload = Column(Text, nullable=False)  # JSON sent to the service worker
+
+    # Retry with exponential backoff; also used as a lease while a worker is sending
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<PushDelivery(id={self.delivery_id}, subscription={self.subscription_id})>"
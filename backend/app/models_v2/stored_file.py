@@ -0,0 +1,20 @@
+"""Stored file model - Content-addressed upload blobs"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class StoredFile(Base):
+    """One row per unique uploaded blob, keyed by its SHA-256 digest"""
+    __tablename__ = "stored_files"
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_path = Column(String, nullable=False)  # Relative to the uploads root, e.g. cas/ab/cd/<sha256>.jpg
+    size = Column(Integer, nullable=False)
+    content_type = Column(String(100), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_referenced_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<StoredFile(sha256={self.sha256[:12]}, size={self.size})>"
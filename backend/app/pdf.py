@@ -0,0 +1,98 @@
+"""Minimal streaming PDF writer for plain-text documents
+
+Lays out lines of text in a monospace font on A4 pages and yields the file one
+page at a time, so a long document never sits in memory as a whole. Only the
+object offsets (a few bytes per page) are kept until the cross-reference table
+is written at the end.
+
+Text is encoded as WinAnsi (Latin-1); other characters are replaced with '?'.
+"""
+from typing import Iterable, Iterator, List
+
+PAGE_WIDTH = 595   # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 40
+FONT_SIZE = 8
+LINE_HEIGHT = 11
+LINE_WIDTH = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))  # Courier glyphs are 0.6em wide
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+
+# Fixed object numbers; pages start after these
+_CATALOG, _PAGES, _FONT = 1, 2, 3
+
+
+def _escape(line: str) -> bytes:
+    line = line[:LINE_WIDTH].replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return line.encode("latin-1", errors="replace")
+
+
+def _object(number: int, body: bytes) -> bytes:
+    return b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+
+class _Writer:
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+
+    def write(self, number: int, body: bytes) -> bytes:
+        chunk = _object(number, body)
+        self.offsets[number] = self.offset
+        self.offset += len(chunk)
+        return chunk
+
+    def raw(self, chunk: bytes) -> bytes:
+        self.offset += len(chunk)
+        return chunk
+
+
+def _page_content(lines: List[str]) -> bytes:
+    text = [b"BT", b"/F1 %d Tf" % FONT_SIZE, b"%d TL" % LINE_HEIGHT,
+            b"%d %d Td" % (MARGIN, PAGE_HEIGHT - MARGIN - FONT_SIZE)]
+    text += [b"(" + _escape(line) + b") '" for line in lines]
+    text.append(b"ET")
+    stream = b"\n".join(text)
+    return b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+
+
+def stream_text_pdf(lines: Iterable[str], title: str = "") -> Iterator[bytes]:
+    """Yield a PDF of `lines` (one chunk per page); lines longer than LINE_WIDTH are cut"""
+    writer = _Writer()
+    yield writer.raw(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield writer.write(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+    yield writer.write(_FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+    page_ids = []
+    next_id = _FONT + 1
+
+    def emit_page(page_lines):
+        nonlocal next_id
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        return writer.write(content_id, _page_content(page_lines)) + writer.write(page_id, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+        ) % (_PAGES, PAGE_WIDTH, PAGE_HEIGHT, _FONT, content_id))
+
+    page_lines = []
+    for line in lines:
+        page_lines.append(line)
+        if len(page_lines) == LINES_PER_PAGE:
+            yield emit_page(page_lines)
+            page_lines = []
+    if page_lines or not page_ids:
+        yield emit_page(page_lines)
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    yield writer.write(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+    info_id = next_id
+    yield writer.write(info_id, b"<< /Title (" + _escape(title) + b") >>")
+
+    xref_offset = writer.offset
+    entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % writer.offsets[n] for n in range(1, info_id + 1)]
+    yield (
+        b"xref\n0 %d\n" % (info_id + 1) + b"".join(entries)
+        + b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (info_id + 1, _CATALOG, info_id, xref_offset)
+    )
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User, UserStatus
 from app.models_v2.address import Address
 from app.models_v2.document import UserDocument
@@ -23,7 +23,7 @@ from pydantic import BaseModel
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def register(user_data: UserCreate, db: Session = Depends(get_transactional_db)):
     """Register a new user (Step 1: Account & Personal Info) and return access token"""
     
     # Check if email already exists
@@ -72,7 +72,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=TokenResponse)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+def login(login_data: LoginRequest, db: Session = Depends(get_transactional_db)):
     """Login and get JWT token"""
     
     # Find user by email
@@ -112,7 +112,7 @@ def get_current_user_profile(current_user: User = Depends(get_current_user)):
 def add_address(
     address_data: AddressCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Add or update user's address (Step 2: Address)"""
     
@@ -141,7 +141,7 @@ def add_address(
 def upload_document(
     document_data: DocumentCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Upload a document (Step 3: Documents)"""
     
@@ -168,7 +168,7 @@ def get_user_documents(
 @router.post("/switch-role")
 def switch_role(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Switch between owner and housekeeper roles"""
     
@@ -224,7 +224,7 @@ class HousekeeperApplicationResponse(BaseModel):
 def apply_housekeeper(
     application_data: HousekeeperApplicationRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Submit application to become a housekeeper"""
     
@@ -297,7 +297,7 @@ def get_application_status(
 @router.post("/approve-application/{user_id}")
 def approve_application(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Approve housekeeper application (for testing - no auth required)"""
     
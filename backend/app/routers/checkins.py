@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.payment import CheckIn
 from app.models_v2.user import User
 from app.routers.auth import get_current_user
@@ -38,7 +38,7 @@ class CheckInResponse(BaseModel):
 async def check_in(
     job_id: int,
     data: CheckInRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Check in to work (housekeeper only)"""
@@ -87,7 +87,7 @@ async def check_out(
     job_id: int,
     checkin_id: int,
     data: CheckOutRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Check out from work (housekeeper only)"""
@@ -160,7 +160,7 @@ async def get_checkins(
 async def verify_checkin(
     job_id: int,
     checkin_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Verify a check-in record (owner only)"""
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_transactional_db
 from app.models_v2.user import User
 from app.routers.auth import get_current_user
 
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/debug", tags=["debug"])
 
 @router.delete("/clear-jobs")
 def clear_all_jobs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete all job posts and related data (keep users)"""
@@ -36,7 +36,7 @@ def clear_all_jobs(
 
 @router.delete("/clear-payments")
 def clear_all_payments(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete all payment schedules and transactions"""
@@ -56,7 +56,7 @@ def clear_all_payments(
 
 @router.delete("/clear-contracts")
 def clear_all_contracts(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete all contracts"""
@@ -75,7 +75,7 @@ def clear_all_contracts(
 
 @router.delete("/clear-checkins")
 def clear_all_checkins(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete all check-ins"""
@@ -5,7 +5,7 @@ from sqlalchemy.sql import func
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import date
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
 from app.models_v2.worker_employer import Worker, Employer
 from app.models_v2.package import WorkerPackage
@@ -13,6 +13,7 @@ from app.models_v2.direct_hire import DirectHire, DirectHireStatus
 from app.models_v2.address import Address
 from app.models_v2.conversation import Conversation
 from app.security import get_current_user
+from app.services.conversation_status import on_hire_status_changed
 from app.services.notification_service import (
     notify_direct_hire_request,
     notify_direct_hire_accepted,
@@ -170,7 +171,7 @@ def hire_to_response(hire: DirectHire, db: Session) -> DirectHireResponse:
 def create_direct_hire(
     hire_data: DirectHireCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Create a direct hire booking (employer only)"""
     employer = get_employer_for_user(current_user.id, db)
@@ -233,8 +234,7 @@ def create_direct_hire(
     )
     
     db.add(hire)
-    db.commit()
-    db.refresh(hire)
+    db.flush()  # Get the hire_id
     
     # Send notification to worker about new direct hire request
     employer_name = f"{current_user.first_name} {current_user.last_name}"
@@ -242,9 +242,13 @@ def create_direct_hire(
         db=db,
         worker_user_id=worker.user_id,
         employer_name=employer_name,
-        hire_id=hire.hire_id
+        hire_id=hire.hire_id,
+        commit=False
     )
     
+    db.commit()
+    db.refresh(hire)
+    
     return hire_to_response(hire, db)
 
 
@@ -275,7 +279,7 @@ def get_my_bookings(
 def approve_completion(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Approve worker's completion and proceed to payment"""
     employer = get_employer_for_user(current_user.id, db)
@@ -292,7 +296,6 @@ def approve_completion(
         raise HTTPException(status_code=400, detail="Work completion not submitted yet")
     
     hire.status = DirectHireStatus.COMPLETED
-    db.commit()
     
     # Send notification to worker that completion was approved
     worker = db.query(Worker).filter(Worker.worker_id == hire.worker_id).first()
@@ -302,9 +305,12 @@ def approve_completion(
             db=db,
             worker_user_id=worker.user_id,
             employer_name=employer_name,
-            hire_id=hire.hire_id
+            hire_id=hire.hire_id,
+            commit=False
         )
     
+    db.commit()
+    
     return {"message": "Completion approved. Please proceed to payment.", "status": "completed"}
 
 
@@ -313,7 +319,7 @@ def submit_payment(
     hire_id: int,
     payment_data: PaymentSubmit,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Submit payment for a completed direct hire"""
     employer = get_employer_for_user(current_user.id, db)
@@ -339,9 +345,6 @@ def submit_payment(
     hire.paid_at = func.now()
     hire.status = DirectHireStatus.PAID
     
-    db.commit()
-    db.refresh(hire)
-    
     # Send notification to worker about payment
     worker = db.query(Worker).filter(Worker.worker_id == hire.worker_id).first()
     if worker:
@@ -351,9 +354,13 @@ def submit_payment(
             worker_user_id=worker.user_id,
             employer_name=employer_name,
             amount=float(hire.total_amount),
-            hire_id=hire.hire_id
+            hire_id=hire.hire_id,
+            commit=False
         )
     
+    db.commit()
+    db.refresh(hire)
+    
     return hire_to_response(hire, db)
 
 
@@ -361,7 +368,7 @@ def submit_payment(
 def cancel_booking(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Cancel a pending booking (employer only)"""
     employer = get_employer_for_user(current_user.id, db)
@@ -378,6 +385,7 @@ def cancel_booking(
         raise HTTPException(status_code=400, detail="Cannot cancel a booking that is already in progress or completed")
     
     hire.status = DirectHireStatus.CANCELLED
+    on_hire_status_changed(db, hire)
     db.commit()
     
     return {"message": "Booking cancelled"}
@@ -412,7 +420,7 @@ def get_my_direct_jobs(
 def accept_hire(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Accept a direct hire request (worker only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -429,7 +437,6 @@ def accept_hire(
         raise HTTPException(status_code=400, detail="Can only accept pending requests")
     
     hire.status = DirectHireStatus.ACCEPTED
-    db.commit()
     
     # Send notification to employer that worker accepted
     employer = db.query(Employer).filter(Employer.employer_id == hire.employer_id).first()
@@ -439,7 +446,8 @@ def accept_hire(
             db=db,
             employer_user_id=employer.user_id,
             worker_name=worker_name,
-            hire_id=hire.hire_id
+            hire_id=hire.hire_id,
+            commit=False
         )
         
         # Auto-create conversation for both parties
@@ -456,7 +464,8 @@ def accept_hire(
                 status='active'
             )
             db.add(conversation)
-            db.commit()
+    
+    db.commit()
     
     return {"message": "Hire request accepted", "status": "accepted"}
 
@@ -465,7 +474,7 @@ def accept_hire(
 def reject_hire(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Reject a direct hire request (worker only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -482,7 +491,6 @@ def reject_hire(
         raise HTTPException(status_code=400, detail="Can only reject pending requests")
     
     hire.status = DirectHireStatus.REJECTED
-    db.commit()
     
     # Send notification to employer that worker rejected
     employer = db.query(Employer).filter(Employer.employer_id == hire.employer_id).first()
@@ -492,9 +500,12 @@ def reject_hire(
             db=db,
             employer_user_id=employer.user_id,
             worker_name=worker_name,
-            hire_id=hire.hire_id
+            hire_id=hire.hire_id,
+            commit=False
         )
     
+    db.commit()
+    
     return {"message": "Hire request rejected", "status": "rejected"}
 
 
@@ -502,7 +513,7 @@ def reject_hire(
 def start_work(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Mark work as started (worker only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -529,7 +540,7 @@ def submit_completion(
     hire_id: int,
     completion_data: CompletionSubmit,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Submit work completion (worker only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -549,7 +560,6 @@ def submit_completion(
     hire.completion_notes = completion_data.completion_notes
     hire.completed_at = func.now()
     hire.status = DirectHireStatus.PENDING_COMPLETION
-    db.commit()
     
     # Send notification to employer that worker submitted completion
     employer = db.query(Employer).filter(Employer.employer_id == hire.employer_id).first()
@@ -559,9 +569,12 @@ def submit_completion(
             db=db,
             employer_user_id=employer.user_id,
             worker_name=worker_name,
-            hire_id=hire.hire_id
+            hire_id=hire.hire_id,
+            commit=False
         )
     
+    db.commit()
+    
     return {"message": "Completion submitted for approval", "status": "pending_completion"}
 
 
@@ -569,7 +582,7 @@ def submit_completion(
 def confirm_payment_received(
     hire_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Confirm payment received (worker only) - for cash payments"""
     worker = get_worker_for_user(current_user.id, db)
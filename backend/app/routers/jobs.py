@@ -1,29 +1,35 @@
 """
 Job posting endpoints using ForumPost model
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from sqlalchemy.sql import func
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel
 import json
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
 from app.models_v2.worker_employer import Employer, Worker
 from app.models_v2.forum import ForumPost, ForumPostStatus, InterestCheck, InterestStatus, JobType
 from app.models_v2.contract import Contract
 from app.models_v2.conversation import Conversation
-from app.models_v2.payment import PaymentSchedule, PaymentStatus, PaymentTransaction
+from app.models_v2.payment import LedgerEntryType, PaymentSchedule, PaymentStatus, PaymentTransaction
 from app.security import get_current_user
 from app.schemas.job import JobPostCreate, JobPostResponse, JobPostUpdate
+from app.serialization import model_list_response
+from app.services.conversation_status import on_job_status_changed
+from app.services.earnings_statement import iter_statement_lines, statement_csv, statement_pdf
+from app.services.payment_ledger import get_contract_balances, get_worker_balance, record_payment_event
 from app.services.notification_service import (
     notify_job_application,
-    notify_application_accepted,
+    notify_applications_accepted,
     notify_application_rejected,
     notify_completion_submitted,
     notify_completion_approved,
+    notify_completions_approved,
     notify_payment_sent,
     notify_payment_received
 )
@@ -44,7 +50,7 @@ def get_or_create_employer(user_id: int, db: Session) -> int:
 def create_job_post(
     job_data: JobPostCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Create a new job posting (owners only)"""
     
@@ -135,7 +141,7 @@ def get_job_posts(
         
         result.append(JobPostResponse.from_orm_model(post, employer_user, applicants_count))
     
-    return result
+    return model_list_response(result, JobPostResponse)
 
 @router.get("/my-posts", response_model=List[JobPostResponse])
 def get_my_job_posts(
@@ -219,7 +225,7 @@ def get_my_job_posts(
             post, current_user, applicants_count, pending_payments_count, accepted_workers_list
         ))
     
-    return result
+    return model_list_response(result, JobPostResponse)
 
 
 @router.get("/my-accepted-jobs", response_model=List[dict])
@@ -259,6 +265,13 @@ def get_my_accepted_jobs(
     if not accepted_interests:
         return []
     
+    # Earned totals come from the running contract balances (one query for all contracts)
+    balances = get_contract_balances(db, [
+        contract_id for (contract_id,) in db.query(Contract.contract_id).filter(
+            Contract.worker_id == worker_record.worker_id
+        )
+    ])
+    
     result = []
     for interest in accepted_interests:
         # Get the job post
@@ -297,7 +310,7 @@ def get_my_accepted_jobs(
         # Get payment schedules for this contract (contract already queried above)
         payment_schedules = []
         pending_payments = 0
-        total_earned = 0
+        total_earned = balances.get(contract.contract_id, (0.0, 0.0))[1] if contract else 0
         next_payment_due = None
         
         if contract:
@@ -318,8 +331,6 @@ def get_my_accepted_jobs(
                     pending_payments += 1
                     if not next_payment_due:
                         next_payment_due = schedule.due_date
-                elif status_val == "confirmed":
-                    total_earned += float(schedule.amount)
         
         # Parse job details
         job_details = {}
@@ -363,6 +374,78 @@ def get_my_accepted_jobs(
     return result
 
 
+@router.get("/my-earnings")
+def get_my_earnings(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Earnings summary for the current housekeeper across all jobs
+    
+    Returns:
+        earned: confirmed or recorded payments
+        awaiting_confirmation: payments marked as sent, not yet confirmed
+    """
+    if not current_user.is_housekeeper:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only housekeepers can view earnings"
+        )
+    
+    worker_id = db.query(Worker.worker_id).filter(Worker.user_id == current_user.id).scalar()
+    awaiting, earned = get_worker_balance(db, worker_id) if worker_id else (0.0, 0.0)
+    return {"earned": earned, "awaiting_confirmation": awaiting}
+
+
+@router.get("/my-earnings/statement")
+def export_earnings_statement(
+    start_date: date,
+    end_date: date,
+    file_format: str = Query(default="csv", alias="format", pattern="^(csv|pdf)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download the current housekeeper's earnings statement for a date range
+    
+    Covers confirmed job payments and paid direct hires, oldest first, with a total.
+    The file is streamed while the payments are read, so any range can be exported.
+    
+    Args:
+        start_date, end_date: Inclusive range (YYYY-MM-DD)
+        format: csv (default) or pdf
+    """
+    if not current_user.is_housekeeper:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only housekeepers can export earnings statements"
+        )
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    worker_id = db.query(Worker.worker_id).filter(Worker.user_id == current_user.id).scalar()
+    if not worker_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Worker profile not found"
+        )
+    worker_name = f"{current_user.first_name} {current_user.last_name}"
+    db.close()  # The statement is read on its own connection; don't hold this one while streaming
+    
+    lines = iter_statement_lines(worker_id, start_date, end_date)
+    filename = f"earnings_{start_date.isoformat()}_{end_date.isoformat()}.{file_format}"
+    if file_format == "pdf":
+        body, media_type = statement_pdf(lines, worker_name, start_date, end_date), "application/pdf"
+    else:
+        body, media_type = statement_csv(lines), "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/{post_id}", response_model=JobPostResponse)
 def get_job_post(
     post_id: int,
@@ -395,7 +478,7 @@ def update_job_post(
     post_id: int,
     job_update: JobPostUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Update a job post (owner only)"""
     
@@ -421,6 +504,7 @@ def update_job_post(
     
     if job_update.status:
         post.status = ForumPostStatus(job_update.status)
+        on_job_status_changed(db, post)
     
     # Update JSON description with new job details
     if any([job_update.description, job_update.house_type, job_update.cleaning_type, 
@@ -464,7 +548,7 @@ def update_job_post(
 def delete_job_post(
     post_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Soft delete a job post (owner only)"""
     
@@ -494,7 +578,7 @@ def delete_job_post(
 def apply_to_job(
     post_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Apply to a job post (housekeepers only)"""
     
@@ -552,55 +636,52 @@ def apply_to_job(
     import json
     
     try:
-        # Get job details for contract
-        job_details = json.loads(post.content) if post.content else {}
-        contract_terms = {
-            "job_title": post.title,
-            "job_type": job_details.get("job_type"),
-            "location": job_details.get("location"),
-            "description": job_details.get("description"),
-            "start_date": job_details.get("start_date"),
-            "end_date": job_details.get("end_date"),
-            "budget": job_details.get("budget"),
-            "payment_schedule": job_details.get("payment_schedule"),
-            "employer_name": "Employer"  # Will be populated from user data later
-        }
+        with db.begin_nested():  # savepoint: a failure here must not abort the route's transaction
+            # Get job details for contract
+            job_details = json.loads(post.content) if post.content else {}
+            contract_terms = {
+                "job_title": post.title,
+                "job_type": job_details.get("job_type"),
+                "location": job_details.get("location"),
+                "description": job_details.get("description"),
+                "start_date": job_details.get("start_date"),
+                "end_date": job_details.get("end_date"),
+                "budget": job_details.get("budget"),
+                "payment_schedule": job_details.get("payment_schedule"),
+                "employer_name": "Employer"  # Will be populated from user data later
+            }
         
-        contract = Contract(
-            post_id=post_id,
-            employer_id=post.employer_id,  # Get from the job post
-            worker_id=worker_record.worker_id,
-            contract_terms=json.dumps(contract_terms),  # Convert dict to JSON string
-            worker_accepted=1,  # 1 = accepted (integer, not boolean)
-            employer_accepted=0  # 0 = pending
-        )
+            contract = Contract(
+                post_id=post_id,
+                employer_id=post.employer_id,  # Get from the job post
+                worker_id=worker_record.worker_id,
+                contract_terms=json.dumps(contract_terms),  # Convert dict to JSON string
+                worker_accepted=1,  # 1 = accepted (integer, not boolean)
+                employer_accepted=0  # 0 = pending
+            )
         
-        db.add(contract)
+            db.add(contract)
     except Exception as e:
         print(f"Warning: Could not create contract: {e}")
         import traceback
         traceback.print_exc()
     
+    # Notify employer about new application (written in the same commit)
+    employer = db.query(Employer).filter(Employer.employer_id == post.employer_id).first()
+    if employer:
+        worker_name = f"{current_user.first_name} {current_user.last_name}"
+        notify_job_application(
+            db=db,
+            employer_user_id=employer.user_id,
+            worker_name=worker_name,
+            job_title=post.title,
+            post_id=post_id,
+            commit=False
+        )
+    
     db.commit()
     db.refresh(interest)
     
-    # Notify employer about new application
-    try:
-        employer = db.query(Employer).filter(Employer.employer_id == post.employer_id).first()
-        if employer:
-            employer_user = db.query(User).filter(User.id == employer.user_id).first()
-            if employer_user:
-                worker_name = f"{current_user.first_name} {current_user.last_name}"
-                notify_job_application(
-                    db=db,
-                    employer_user_id=employer_user.id,
-                    worker_name=worker_name,
-                    job_title=post.title,
-                    post_id=post_id
-                )
-    except Exception as e:
-        print(f"Warning: Could not send notification: {e}")
-    
     return {
         "message": "Application submitted successfully",
         "interest_id": interest.interest_id,
@@ -692,7 +773,7 @@ def update_applicant_status(
     interest_id: int,
     status_update: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Reject an applicant (owner only). Accepting is done via start-job endpoint."""
     
@@ -732,20 +813,19 @@ def update_applicant_status(
         )
     
     application.status = InterestStatus.REJECTED
-    db.commit()
     
-    # Notify worker about rejection
-    try:
-        worker = db.query(Worker).filter(Worker.worker_id == application.worker_id).first()
-        if worker:
-            notify_application_rejected(
-                db=db,
-                worker_user_id=worker.user_id,
-                job_title=post.title,
-                post_id=post_id
-            )
-    except Exception as e:
-        print(f"Warning: Could not send rejection notification: {e}")
+    # Notify worker about rejection (written in the same commit)
+    worker = db.query(Worker).filter(Worker.worker_id == application.worker_id).first()
+    if worker:
+        notify_application_rejected(
+            db=db,
+            worker_user_id=worker.user_id,
+            job_title=post.title,
+            post_id=post_id,
+            commit=False
+        )
+    
+    db.commit()
     
     return {
         "message": "Applicant rejected",
@@ -764,7 +844,7 @@ def start_job(
     post_id: int,
     request: StartJobRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Start a job by accepting selected applicants and transitioning to ONGOING status"""
     
@@ -810,6 +890,7 @@ def start_job(
     
     # Accept all selected applicants
     accepted_workers = []
+    accepted_user_ids = []
     for interest_id in request.selected_applicants:
         application = db.query(InterestCheck).filter(
             InterestCheck.interest_id == interest_id,
@@ -831,33 +912,25 @@ def start_job(
         worker_name = f"{worker_user.first_name} {worker_user.last_name}" if worker_user else "Worker"
         accepted_workers.append(worker_name)
         
-        # Notify worker that they've been accepted
         if worker_user:
-            try:
-                notify_application_accepted(
-                    db=db,
-                    worker_user_id=worker_user.id,
-                    job_title=post.title,
-                    post_id=post_id
-                )
-            except Exception as e:
-                print(f"Warning: Could not send acceptance notification: {e}")
+            accepted_user_ids.append(worker_user.id)
             
             # Auto-create conversation for job owner and accepted worker
             try:
-                existing_conv = db.query(Conversation).filter(
-                    Conversation.job_id == post_id,
-                    Conversation.participant_ids.contains([current_user.id, worker_user.id])
-                ).first()
+                with db.begin_nested():  # savepoint: a failure here must not abort the route's transaction
+                    existing_conv = db.query(Conversation).filter(
+                        Conversation.job_id == post_id,
+                        Conversation.participant_ids.contains([current_user.id, worker_user.id])
+                    ).first()
                 
-                if not existing_conv:
-                    # Create conversation with owner and this worker as participants
-                    conversation = Conversation(
-                        job_id=post_id,
-                        participant_ids=[current_user.id, worker_user.id],
-                        status='active'
-                    )
-                    db.add(conversation)
+                    if not existing_conv:
+                        # Create conversation with owner and this worker as participants
+                        conversation = Conversation(
+                            job_id=post_id,
+                            participant_ids=[current_user.id, worker_user.id],
+                            status='active'
+                        )
+                        db.add(conversation)
             except Exception as e:
                 print(f"Warning: Could not create conversation: {e}")
         
@@ -879,116 +952,126 @@ def start_job(
         
         if is_actually_longterm:
             try:
-                payment_schedule_data = job_details.get('payment_schedule')
+                with db.begin_nested():  # savepoint: a failure here must not abort the route's transaction
+                    payment_schedule_data = job_details.get('payment_schedule')
                 
-                # Find the contract for this worker (already queried above)
-                if contract and payment_schedule_data:
-                    from app.models_v2.payment import PaymentSchedule, PaymentStatus
-                    from datetime import datetime, timedelta
+                    # Find the contract for this worker (already queried above)
+                    if contract and payment_schedule_data:
+                        from app.models_v2.payment import PaymentSchedule, PaymentStatus
+                        from datetime import datetime, timedelta
                     
-                    start_date = datetime.strptime(job_details.get('start_date'), '%Y-%m-%d') if job_details.get('start_date') else datetime.now()
-                    end_date = datetime.strptime(job_details.get('end_date'), '%Y-%m-%d') if job_details.get('end_date') else (datetime.now() + timedelta(days=365))
+                        start_date = datetime.strptime(job_details.get('start_date'), '%Y-%m-%d') if job_details.get('start_date') else datetime.now()
+                        end_date = datetime.strptime(job_details.get('end_date'), '%Y-%m-%d') if job_details.get('end_date') else (datetime.now() + timedelta(days=365))
                     
-                    payment_amount = float(payment_schedule_data.get('payment_amount', job_details.get('budget', 0)))
-                    frequency = payment_schedule_data.get('frequency', 'monthly')
-                    payment_dates = payment_schedule_data.get('payment_dates', ['15', '30'])
+                        payment_amount = float(payment_schedule_data.get('payment_amount', job_details.get('budget', 0)))
+                        frequency = payment_schedule_data.get('frequency', 'monthly')
+                        payment_dates = payment_schedule_data.get('payment_dates', ['15', '30'])
                     
-                    payments_created = 0
-                    created_dates = set()  # Track created dates to prevent duplicates
+                        payments_created = 0
+                        created_dates = set()  # Track created dates to prevent duplicates
                     
-                    if frequency == 'monthly':
-                        # Generate all payment dates between start and end
-                        current_month = start_date.replace(day=1)
-                        while current_month <= end_date:
-                            for day_str in payment_dates:
-                                try:
-                                    day = int(day_str)
-                                    # Handle months with fewer days
+                        if frequency == 'monthly':
+                            # Generate all payment dates between start and end
+                            current_month = start_date.replace(day=1)
+                            while current_month <= end_date:
+                                for day_str in payment_dates:
                                     try:
-                                        payment_date = current_month.replace(day=min(day, 28))
-                                    except ValueError:
-                                        payment_date = current_month.replace(day=28)
+                                        day = int(day_str)
+                                        # Handle months with fewer days
+                                        try:
+                                            payment_date = current_month.replace(day=min(day, 28))
+                                        except ValueError:
+                                            payment_date = current_month.replace(day=28)
                                     
-                                    date_str = payment_date.strftime('%Y-%m-%d')
+                                        date_str = payment_date.strftime('%Y-%m-%d')
                                     
-                                    # Only create if within range AND not already created
-                                    if start_date <= payment_date <= end_date and date_str not in created_dates:
-                                        schedule = PaymentSchedule(
-                                            contract_id=contract.contract_id,
-                                            worker_id=application.worker_id,
-                                            worker_name=worker_name,
-                                            due_date=date_str,
-                                            amount=payment_amount,
-                                            status=PaymentStatus.PENDING
-                                        )
-                                        db.add(schedule)
-                                        created_dates.add(date_str)
-                                        payments_created += 1
-                                except ValueError:
-                                    pass
+                                        # Only create if within range AND not already created
+                                        if start_date <= payment_date <= end_date and date_str not in created_dates:
+                                            schedule = PaymentSchedule(
+                                                contract_id=contract.contract_id,
+                                                worker_id=application.worker_id,
+                                                worker_name=worker_name,
+                                                due_date=date_str,
+                                                amount=payment_amount,
+                                                status=PaymentStatus.PENDING
+                                            )
+                                            db.add(schedule)
+                                            created_dates.add(date_str)
+                                            payments_created += 1
+                                    except ValueError:
+                                        pass
                             
-                            # Move to next month
-                            if current_month.month == 12:
-                                current_month = current_month.replace(year=current_month.year + 1, month=1, day=1)
-                            else:
-                                current_month = current_month.replace(month=current_month.month + 1, day=1)
+                                # Move to next month
+                                if current_month.month == 12:
+                                    current_month = current_month.replace(year=current_month.year + 1, month=1, day=1)
+                                else:
+                                    current_month = current_month.replace(month=current_month.month + 1, day=1)
                     
-                    elif frequency == 'weekly':
-                        current_date = start_date
-                        while current_date <= end_date:
-                            date_str = current_date.strftime('%Y-%m-%d')
-                            if date_str not in created_dates:
-                                schedule = PaymentSchedule(
-                                    contract_id=contract.contract_id,
-                                    worker_id=application.worker_id,
-                                    worker_name=worker_name,
-                                    due_date=date_str,
-                                    amount=payment_amount,
-                                    status=PaymentStatus.PENDING
-                                )
-                                db.add(schedule)
-                                created_dates.add(date_str)
-                                payments_created += 1
-                            current_date += timedelta(days=7)
+                        elif frequency == 'weekly':
+                            current_date = start_date
+                            while current_date <= end_date:
+                                date_str = current_date.strftime('%Y-%m-%d')
+                                if date_str not in created_dates:
+                                    schedule = PaymentSchedule(
+                                        contract_id=contract.contract_id,
+                                        worker_id=application.worker_id,
+                                        worker_name=worker_name,
+                                        due_date=date_str,
+                                        amount=payment_amount,
+                                        status=PaymentStatus.PENDING
+                                    )
+                                    db.add(schedule)
+                                    created_dates.add(date_str)
+                                    payments_created += 1
+                                current_date += timedelta(days=7)
                     
-                    elif frequency == 'biweekly':
-                        current_date = start_date
-                        while current_date <= end_date:
-                            date_str = current_date.strftime('%Y-%m-%d')
-                            if date_str not in created_dates:
-                                schedule = PaymentSchedule(
-                                    contract_id=contract.contract_id,
-                                    worker_id=application.worker_id,
-                                    worker_name=worker_name,
-                                    due_date=date_str,
-                                    amount=payment_amount,
-                                    status=PaymentStatus.PENDING
-                                )
-                                db.add(schedule)
-                                created_dates.add(date_str)
-                                payments_created += 1
-                            current_date += timedelta(days=14)
+                        elif frequency == 'biweekly':
+                            current_date = start_date
+                            while current_date <= end_date:
+                                date_str = current_date.strftime('%Y-%m-%d')
+                                if date_str not in created_dates:
+                                    schedule = PaymentSchedule(
+                                        contract_id=contract.contract_id,
+                                        worker_id=application.worker_id,
+                                        worker_name=worker_name,
+                                        due_date=date_str,
+                                        amount=payment_amount,
+                                        status=PaymentStatus.PENDING
+                                    )
+                                    db.add(schedule)
+                                    created_dates.add(date_str)
+                                    payments_created += 1
+                                current_date += timedelta(days=14)
                     
-                    else:
-                        # One-time or custom - single payment at end
-                        date_str = end_date.strftime('%Y-%m-%d')
-                        schedule = PaymentSchedule(
-                            contract_id=contract.contract_id,
-                            worker_id=application.worker_id,
-                            worker_name=worker_name,
-                            due_date=date_str,
-                            amount=payment_amount,
-                            status=PaymentStatus.PENDING
-                        )
-                        db.add(schedule)
-                        payments_created += 1
+                        else:
+                            # One-time or custom - single payment at end
+                            date_str = end_date.strftime('%Y-%m-%d')
+                            schedule = PaymentSchedule(
+                                contract_id=contract.contract_id,
+                                worker_id=application.worker_id,
+                                worker_name=worker_name,
+                                due_date=date_str,
+                                amount=payment_amount,
+                                status=PaymentStatus.PENDING
+                            )
+                            db.add(schedule)
+                            payments_created += 1
                     
-                    print(f"DEBUG: Created {payments_created} payment schedules for {worker_name}")
+                        print(f"DEBUG: Created {payments_created} payment schedules for {worker_name}")
             except Exception as e:
                 print(f"ERROR creating payment schedule for {worker_name}: {e}")
                 import traceback
                 traceback.print_exc()
     
+    # Notify all accepted workers in one INSERT (committed with the job start)
+    notify_applications_accepted(
+        db=db,
+        worker_user_ids=accepted_user_ids,
+        job_title=post.title,
+        post_id=post_id,
+        commit=False
+    )
+    
     # Transition job to ONGOING
     post.status = ForumPostStatus.ONGOING
     db.commit()
@@ -1006,7 +1089,7 @@ def update_job_status(
     post_id: int,
     new_status: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Update job status (owner only). Allowed transitions: open->cancelled, ongoing->completed"""
     
@@ -1052,6 +1135,7 @@ def update_job_status(
     
     # Update status
     post.status = ForumPostStatus(new_status)
+    on_job_status_changed(db, post)
     db.commit()
     
     return {
@@ -1074,7 +1158,7 @@ def submit_job_completion(
     post_id: int,
     completion_data: JobCompletionRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Housekeeper submits proof of job completion
     
@@ -1159,20 +1243,21 @@ def submit_job_completion(
     if post.status == ForumPostStatus.ONGOING:
         post.status = ForumPostStatus.PENDING_COMPLETION
     
-    db.commit()
-    
-    # Send notification to owner about job completion submission
+    # Send notification to owner about job completion submission (same commit)
     employer = db.query(Employer).filter(Employer.employer_id == post.employer_id).first()
     if employer:
         worker_name = f"{current_user.first_name} {current_user.last_name}"
         notify_completion_submitted(
             db=db,
-            owner_user_id=employer.user_id,
+            employer_user_id=employer.user_id,
             worker_name=worker_name,
             job_title=post.title,
-            post_id=post_id
+            post_id=post_id,
+            commit=False
         )
     
+    db.commit()
+    
     return {
         "message": "Job completion submitted successfully. Waiting for owner approval.",
         "post_id": post_id,
@@ -1186,7 +1271,7 @@ def approve_job_completion(
     post_id: int,
     contract_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Owner approves job completion for a specific worker or all workers
     
@@ -1237,7 +1322,6 @@ def approve_job_completion(
         
         # Mark this contract as completed (but not paid yet for short-term)
         contract.status = ContractStatus.COMPLETED
-        db.commit()
         
         # Send notification to worker that their completion was approved
         worker = db.query(Worker).filter(Worker.worker_id == contract.worker_id).first()
@@ -1246,17 +1330,22 @@ def approve_job_completion(
                 db=db,
                 worker_user_id=worker.user_id,
                 job_title=post.title,
-                post_id=post_id
+                post_id=post_id,
+                commit=False
             )
         
         # Check if ALL contracts are now completed
+        db.flush()
         all_contracts = db.query(Contract).filter(Contract.post_id == post_id).all()
         all_completed = all(c.status == ContractStatus.COMPLETED for c in all_contracts)
         
         if all_completed:
             post.status = ForumPostStatus.COMPLETED
             post.completed_at = func.now()
-            db.commit()
+            on_job_status_changed(db, post)
+        
+        # Contract, job status and notification in one commit
+        db.commit()
         
         return {
             "message": "Worker completion approved!",
@@ -1273,15 +1362,20 @@ def approve_job_completion(
         
         for contract in contracts:
             contract.status = ContractStatus.COMPLETED
-            # Send notification to each worker
-            worker = db.query(Worker).filter(Worker.worker_id == contract.worker_id).first()
-            if worker:
-                notify_completion_approved(
-                    db=db,
-                    worker_user_id=worker.user_id,
-                    job_title=post.title,
-                    post_id=post_id
-                )
+        
+        # Send one notification to each worker (single query, single INSERT)
+        worker_user_ids = [
+            user_id for (user_id,) in db.query(Worker.user_id).filter(
+                Worker.worker_id.in_([c.worker_id for c in contracts])
+            ).all()
+        ] if contracts else []
+        notify_completions_approved(
+            db=db,
+            worker_user_ids=worker_user_ids,
+            job_title=post.title,
+            post_id=post_id,
+            commit=False
+        )
         
         # Check if ALL contracts are now completed
         all_contracts = db.query(Contract).filter(Contract.post_id == post_id).all()
@@ -1290,6 +1384,7 @@ def approve_job_completion(
         if all_completed:
             post.status = ForumPostStatus.COMPLETED
             post.completed_at = func.now()
+            on_job_status_changed(db, post)
         
         db.commit()
         
@@ -1395,7 +1490,7 @@ def record_short_term_payment(
     post_id: int,
     payment_data: ShortTermPaymentRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Record payment for a short-term job (owner only)
     
@@ -1468,6 +1563,11 @@ def record_short_term_payment(
         confirmed_at=func.now()
     )
     db.add(transaction)
+    db.flush()
+    record_payment_event(
+        db, LedgerEntryType.RECORDED, contract.contract_id, payment_data.amount,
+        worker_id=contract.worker_id, schedule_id=payment.schedule_id, transaction_id=transaction.transaction_id
+    )
     
     # For short-term jobs, check if ALL workers are now paid
     # If so, mark job as completed
@@ -1477,8 +1577,7 @@ def record_short_term_payment(
     if all_paid:
         post.status = ForumPostStatus.COMPLETED
         post.completed_at = func.now()
-    
-    db.commit()
+        on_job_status_changed(db, post)
     
     # Send notification to worker about payment (for short-term, owner records payment directly)
     if worker and worker_user:
@@ -1487,9 +1586,12 @@ def record_short_term_payment(
             worker_user_id=worker_user.id,
             job_title=post.title,
             amount=payment_data.amount,
-            post_id=post_id
+            post_id=post_id,
+            commit=False
         )
     
+    db.commit()
+    
     return {
         "message": f"Payment to {worker_name} recorded successfully",
         "post_id": post_id,
@@ -1514,7 +1616,7 @@ def report_unpaid_job(
     post_id: int,
     report_data: ReportUnpaidRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Housekeeper reports that owner hasn't paid for the job"""
     from app.models_v2.report import Report, ReportType, ReportStatus
@@ -1596,7 +1698,7 @@ def report_non_performance(
     post_id: int,
     report_data: ReportNonPerformanceRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Owner reports that housekeeper didn't perform the job properly"""
     from app.models_v2.report import Report, ReportType, ReportStatus
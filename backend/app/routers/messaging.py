@@ -1,25 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
-from pydantic import BaseModel
+from sqlalchemy import func, and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.security import get_current_user
 from app.models_v2.user import User
 from app.models_v2.conversation import Conversation, Message
 from app.models_v2.direct_hire import DirectHire, DirectHireStatus
 from app.models_v2.forum import ForumPost
+from app.serialization import model_list_response
+from app.services.conversation_summary import record_deletion, record_message, record_reads, unread_count_for
+from app.services.message_search import search_messages
+from app.services.user_names import UNKNOWN_USER_NAME, resolve_user_names
 
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 100
+MAX_BATCH_MESSAGES = 50
+
 
 # ============== SCHEMAS ==============
 
 class MessageCreate(BaseModel):
     content: str
     message_type: str = "text"
+    client_message_id: Optional[str] = Field(default=None, max_length=64)  # e.g. a UUID; makes retries safe
+
+
+class MessageBatchCreate(BaseModel):
+    messages: List[MessageCreate] = Field(..., min_length=1, max_length=MAX_BATCH_MESSAGES)  # Oldest first
 
 
 class MessageResponse(BaseModel):
@@ -63,34 +77,78 @@ class ConversationDetailResponse(BaseModel):
     participant_ids: List[int]
     participant_names: List[str]
     can_send_messages: bool
-    messages: List[MessageResponse]
+    messages: List[MessageResponse]  # Oldest first, at most `limit` of them
+    has_more: bool = False           # Older messages exist
+    next_before: Optional[int] = None  # Pass as `before` to load the previous page
+
+
+class MessageSearchHit(BaseModel):
+    message_id: int
+    conversation_id: int
+    sender_id: int
+    sender_name: str
+    snippet: str  # HTML-escaped excerpt with matches wrapped in <mark>
+    sent_at: str
+
+
+class MessageSearchResponse(BaseModel):
+    results: List[MessageSearchHit]  # Best matches first
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page
 
 
 # ============== HELPER FUNCTIONS ==============
 
+def conversation_title(conv: Conversation, hire_id: Optional[int], job_id: Optional[int], job_title: Optional[str]) -> str:
+    """Title from the conversation's hire/job (ids are None when the hire/job doesn't exist)"""
+    if conv.title:
+        return conv.title
+    if hire_id:
+        return f"Direct Hire #{hire_id}"
+    if job_id:
+        return job_title or f"Job #{job_id}"
+    return "Conversation"
+
+
 def get_conversation_title(conv: Conversation, db: Session) -> str:
     """Generate a title for the conversation based on job/hire"""
     if conv.title:
         return conv.title
-    
-    if conv.hire_id:
-        hire = db.query(DirectHire).filter(DirectHire.hire_id == conv.hire_id).first()
-        if hire:
-            return f"Direct Hire #{hire.hire_id}"
-    
-    if conv.job_id:
-        job = db.query(ForumPost).filter(ForumPost.post_id == conv.job_id).first()
-        if job:
-            return job.title or f"Job #{job.post_id}"
-    
-    return "Conversation"
+    hire_id = db.query(DirectHire.hire_id).filter(DirectHire.hire_id == conv.hire_id).scalar() if conv.hire_id else None
+    job = db.query(ForumPost.post_id, ForumPost.title).filter(ForumPost.post_id == conv.job_id).first() if conv.job_id else None
+    return conversation_title(conv, hire_id, job.post_id if job else None, job.title if job else None)
 
 
 def get_participant_names(participant_ids: List[int], db: Session) -> List[str]:
     """Get names for all participants"""
-    users = db.query(User).filter(User.id.in_(participant_ids)).all()
-    user_map = {u.id: f"{u.first_name} {u.last_name}" for u in users}
-    return [user_map.get(pid, "Unknown") for pid in participant_ids]
+    user_map = resolve_user_names(db, participant_ids)
+    return [user_map.get(pid, UNKNOWN_USER_NAME) for pid in participant_ids]
+
+
+def mark_messages_read(db: Session, conv: Conversation, reader_id: int, message_ids=None) -> int:
+    """Mark messages from the other participants as read with one UPDATE
+    
+    Also lowers the conversation's unread counters by what was marked.
+    
+    Args:
+        message_ids: Optional - only these messages (list or subquery); default all
+    
+    Returns:
+        Number of messages marked
+    """
+    statement = update(Message).where(
+        Message.conversation_id == conv.conversation_id,
+        Message.sender_id != reader_id,
+        Message.read_at.is_(None),
+        Message.deleted_at.is_(None)
+    )
+    if message_ids is not None:
+        statement = statement.where(Message.message_id.in_(message_ids))
+    sender_ids = db.execute(
+        statement.values(read_at=func.now()).returning(Message.sender_id),
+        execution_options={"synchronize_session": False}
+    ).scalars().all()
+    record_reads(db, conv, sender_ids)
+    return len(sender_ids)
 
 
 def can_send_messages(conv: Conversation) -> bool:
@@ -98,32 +156,86 @@ def can_send_messages(conv: Conversation) -> bool:
     return conv.status == 'active'
 
 
-def check_conversation_status(conv: Conversation, db: Session):
-    """Update conversation status based on job/hire status"""
-    if conv.status == 'archived':
-        return
+def get_sendable_conversation(conversation_id: int, user_id: int, db: Session) -> Conversation:
+    """Load a conversation the user may post in, or raise the matching HTTP error"""
+    conversation = db.query(Conversation).filter(
+        Conversation.conversation_id == conversation_id
+    ).first()
     
-    should_be_read_only = False
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
     
-    if conv.hire_id:
-        hire = db.query(DirectHire).filter(DirectHire.hire_id == conv.hire_id).first()
-        if hire and hire.status in [DirectHireStatus.PAID, DirectHireStatus.CANCELLED]:
-            # Check if 7 days have passed since completion
-            if hire.paid_at:
-                days_since = (datetime.utcnow() - hire.paid_at).days
-                if days_since > 7:
-                    should_be_read_only = True
-            elif hire.status == DirectHireStatus.CANCELLED:
-                should_be_read_only = True
+    if user_id not in conversation.participant_ids:
+        raise HTTPException(status_code=403, detail="Not a participant in this conversation")
     
-    if conv.job_id:
-        job = db.query(ForumPost).filter(ForumPost.post_id == conv.job_id).first()
-        if job and job.status in ['completed', 'cancelled', 'closed']:
-            should_be_read_only = True
+    if not can_send_messages(conversation):
+        raise HTTPException(status_code=400, detail="This conversation is read-only")
     
-    if should_be_read_only and conv.status == 'active':
-        conv.status = 'read_only'
-        db.commit()
+    return conversation
+
+
+def insert_messages(db: Session, conv: Conversation, sender_id: int, items: List[MessageCreate]) -> list:
+    """Store messages, skipping ones already sent with the same client_message_id
+    
+    One multi-row INSERT ... ON CONFLICT DO NOTHING, one lookup for the duplicates and
+    one conversation summary UPDATE, on the route's transactional session; the caller
+    commits.
+    
+    Returns:
+        A message row per item, in order (the original row for retried items)
+    """
+    contents = [item.content.strip() for item in items]
+    if not all(contents):
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    messages = Message.__table__
+    columns = [c for c in messages.c if c.name != "search_vector"]
+    rows, seen_keys = [], set()
+    for item, content in zip(items, contents):
+        if item.client_message_id is not None:
+            if item.client_message_id in seen_keys:
+                continue
+            seen_keys.add(item.client_message_id)
+        rows.append({
+            "conversation_id": conv.conversation_id,
+            "sender_id": sender_id,
+            "content": content,
+            "message_type": item.message_type,
+            "client_message_id": item.client_message_id,
+        })
+    
+    inserted = db.execute(
+        pg_insert(messages).values(rows)
+        .on_conflict_do_nothing(
+            index_elements=[messages.c.sender_id, messages.c.client_message_id],
+            index_where=messages.c.client_message_id.isnot(None)
+        )
+        .returning(*columns)
+    ).all()
+    inserted.sort(key=lambda row: row.message_id)
+    
+    # Retried items: return what was stored the first time
+    by_key = {row.client_message_id: row for row in inserted if row.client_message_id is not None}
+    retried = [key for key in seen_keys if key not in by_key]
+    if retried:
+        for row in db.execute(
+            select(*columns).where(
+                messages.c.sender_id == sender_id,
+                messages.c.client_message_id.in_(retried)
+            )
+        ):
+            if row.conversation_id != conv.conversation_id:
+                raise HTTPException(status_code=409, detail="client_message_id already used in another conversation")
+            by_key[row.client_message_id] = row
+    
+    if inserted:
+        record_message(db, conv, inserted[-1], count=len(inserted))
+    
+    without_key = iter(row for row in inserted if row.client_message_id is None)
+    return [
+        by_key[item.client_message_id] if item.client_message_id is not None else next(without_key)
+        for item in items
+    ]
 
 
 # ============== ENDPOINTS ==============
@@ -132,7 +244,7 @@ def check_conversation_status(conv: Conversation, db: Session):
 def create_or_get_conversation(
     data: ConversationCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Create a new conversation or get existing one for a job/hire"""
     
@@ -235,6 +347,10 @@ def create_or_get_conversation(
     )
     db.add(system_message)
     db.commit()
+    db.refresh(system_message)
+    record_message(db, conversation, system_message)
+    db.commit()
+    db.refresh(conversation)
     
     return conversation_to_response(conversation, current_user.id, db)
 
@@ -247,27 +363,48 @@ def get_my_conversations(
 ):
     """Get all conversations for the current user"""
     
-    # Find conversations where user is a participant
-    conversations = db.query(Conversation).filter(
+    # Conversations where user is a participant, with their hire/job for the title
+    query = db.query(Conversation, DirectHire.hire_id, ForumPost.post_id, ForumPost.title).outerjoin(
+        DirectHire, DirectHire.hire_id == Conversation.hire_id
+    ).outerjoin(
+        ForumPost, ForumPost.post_id == Conversation.job_id
+    ).filter(
         Conversation.participant_ids.contains([current_user.id])
-    ).order_by(Conversation.updated_at.desc()).all()
+    )
     
     # Filter by status if provided
-    if status:
-        valid_statuses = ['active', 'read_only', 'archived']
-        if status in valid_statuses:
-            conversations = [c for c in conversations if c.status == status]
-    
-    return [conversation_to_response(c, current_user.id, db) for c in conversations]
+    if status in ('active', 'read_only', 'archived'):
+        query = query.filter(Conversation.status == status)
+    
+    rows = query.order_by(Conversation.updated_at.desc()).all()
+    
+    # Warm the name cache for every participant at once; the per-conversation
+    # lookups below are then cache hits
+    resolve_user_names(db, {pid for row in rows for pid in row.Conversation.participant_ids})
+    
+    return model_list_response(
+        [
+            conversation_to_response(
+                conv, current_user.id, db, title=conversation_title(conv, hire_id, job_id, job_title)
+            )
+            for conv, hire_id, job_id, job_title in rows
+        ],
+        ConversationResponse
+    )
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationDetailResponse)
 def get_conversation(
     conversation_id: int,
+    before: Optional[int] = None,  # message_id cursor: only messages older than this
+    limit: int = Query(default=DEFAULT_MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get a specific conversation with messages"""
+    """Get a specific conversation with its latest messages
+    
+    Returns the newest `limit` messages; scroll back by passing `next_before` as `before`.
+    """
     
     conversation = db.query(Conversation).filter(
         Conversation.conversation_id == conversation_id
@@ -279,27 +416,27 @@ def get_conversation(
     if current_user.id not in conversation.participant_ids:
         raise HTTPException(status_code=403, detail="Not a participant in this conversation")
     
-    # Check and update status
-    check_conversation_status(conversation, db)
+    # Opening the conversation marks everything read (one UPDATE). Done before loading
+    # the page so the messages below already carry their read_at.
+    if before is None:
+        if mark_messages_read(db, conversation, current_user.id):
+            db.commit()
     
-    # Get messages
-    messages = db.query(Message).filter(
+    # Newest page first (message_id follows send order), one extra row to detect more
+    query = db.query(Message).filter(
         Message.conversation_id == conversation_id,
         Message.deleted_at.is_(None)
-    ).order_by(Message.sent_at.asc()).all()
+    )
+    if before is not None:
+        query = query.filter(Message.message_id < before)
+    page = query.order_by(Message.message_id.desc()).limit(limit + 1).all()
     
-    # Mark messages as read
-    unread_messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id,
-        Message.sender_id != current_user.id,
-        Message.read_at.is_(None)
-    ).all()
+    has_more = len(page) > limit
+    messages = list(reversed(page[:limit]))
     
-    for msg in unread_messages:
-        msg.read_at = func.now()
-    db.commit()
-    
-    participant_names = get_participant_names(conversation.participant_ids, db)
+    # Participants and senders (normally the same people) in one lookup
+    names = resolve_user_names(db, list(conversation.participant_ids) + [m.sender_id for m in messages])
+    participant_names = [names.get(pid, UNKNOWN_USER_NAME) for pid in conversation.participant_ids]
     
     return ConversationDetailResponse(
         conversation_id=conversation.conversation_id,
@@ -310,7 +447,9 @@ def get_conversation(
         participant_ids=conversation.participant_ids,
         participant_names=participant_names,
         can_send_messages=can_send_messages(conversation),
-        messages=[message_to_response(m, current_user.id, db) for m in messages]
+        messages=[message_to_response(m, current_user.id, db, names) for m in messages],
+        has_more=has_more,
+        next_before=messages[0].message_id if has_more else None
     )
 
 
@@ -319,45 +458,39 @@ def send_message(
     conversation_id: int,
     message_data: MessageCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
-    """Send a message in a conversation"""
-    
-    conversation = db.query(Conversation).filter(
-        Conversation.conversation_id == conversation_id
-    ).first()
+    """Send a message in a conversation
     
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    Resending with the same client_message_id returns the original message.
+    """
     
-    if current_user.id not in conversation.participant_ids:
-        raise HTTPException(status_code=403, detail="Not a participant in this conversation")
-    
-    # Check status
-    check_conversation_status(conversation, db)
-    
-    if not can_send_messages(conversation):
-        raise HTTPException(status_code=400, detail="This conversation is read-only")
-    
-    if not message_data.content.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty")
-    
-    message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        content=message_data.content.strip(),
-        message_type=message_data.message_type
-    )
+    conversation = get_sendable_conversation(conversation_id, current_user.id, db)
+    [message] = insert_messages(db, conversation, current_user.id, [message_data])
+    db.commit()
     
-    db.add(message)
+    return message_to_response(message, current_user.id, db)
+
+
+@router.post("/conversations/{conversation_id}/messages/batch", response_model=List[MessageResponse])
+def send_messages_batch(
+    conversation_id: int,
+    batch: MessageBatchCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_transactional_db)
+):
+    """Send several messages (e.g. queued while offline) in one request and one transaction
     
-    # Update conversation timestamp
-    conversation.updated_at = func.now()
+    Returns the stored messages in the order given. Items whose client_message_id
+    was already sent are not stored again.
+    """
     
+    conversation = get_sendable_conversation(conversation_id, current_user.id, db)
+    messages = insert_messages(db, conversation, current_user.id, batch.messages)
     db.commit()
-    db.refresh(message)
+    names = resolve_user_names(db, [current_user.id])
     
-    return message_to_response(message, current_user.id, db)
+    return [message_to_response(m, current_user.id, db, names) for m in messages]
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
@@ -392,15 +525,54 @@ def get_messages(
         except ValueError:
             pass
     
-    messages = query.order_by(Message.sent_at.asc()).limit(limit).all()
+    query = query.order_by(Message.sent_at.asc()).limit(limit)
     
-    # Mark as read
-    for msg in messages:
-        if msg.sender_id != current_user.id and not msg.read_at:
-            msg.read_at = func.now()
-    db.commit()
+    # Mark this window as read with one UPDATE before loading it, so the loaded
+    # messages aren't expired by the commit
+    window_ids = query.with_entities(Message.message_id).scalar_subquery()
+    if mark_messages_read(db, conversation, current_user.id, window_ids):
+        db.commit()
+    
+    messages = query.all()
+    names = resolve_user_names(db, [m.sender_id for m in messages])
     
-    return [message_to_response(m, current_user.id, db) for m in messages]
+    return [message_to_response(m, current_user.id, db, names) for m in messages]
+
+
+@router.get("/search", response_model=MessageSearchResponse)
+def search_my_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search messages in the current user's conversations
+    
+    Supports quoted phrases, OR and -exclusions. Page with `next_cursor`.
+    """
+    
+    try:
+        hits, next_cursor = search_messages(db, current_user.id, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    names = resolve_user_names(db, [hit.sender_id for hit in hits])
+    
+    return MessageSearchResponse(
+        results=[
+            MessageSearchHit(
+                message_id=hit.message_id,
+                conversation_id=hit.conversation_id,
+                sender_id=hit.sender_id,
+                sender_name=names.get(hit.sender_id, UNKNOWN_USER_NAME),
+                snippet=hit.snippet,
+                sent_at=hit.sent_at.isoformat() if hit.sent_at else ""
+            )
+            for hit in hits
+        ],
+        next_cursor=next_cursor
+    )
 
 
 @router.get("/unread-count")
@@ -410,20 +582,13 @@ def get_unread_count(
 ):
     """Get total unread message count for the user"""
     
-    # Get conversations user is part of
-    conversations = db.query(Conversation).filter(
+    # Sum the user's counter over their conversations
+    own_count = Conversation.unread_counts[
+        func.array_position(Conversation.participant_ids, current_user.id)
+    ]
+    total_unread = db.query(func.coalesce(func.sum(own_count), 0)).filter(
         Conversation.participant_ids.contains([current_user.id])
-    ).all()
-    
-    total_unread = 0
-    for conv in conversations:
-        unread = db.query(Message).filter(
-            Message.conversation_id == conv.conversation_id,
-            Message.sender_id != current_user.id,
-            Message.read_at.is_(None),
-            Message.deleted_at.is_(None)
-        ).count()
-        total_unread += unread
+    ).scalar()
     
     return {"unread_count": total_unread}
 
@@ -432,7 +597,7 @@ def get_unread_count(
 def delete_message(
     message_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Soft delete a message (only sender can delete)"""
     
@@ -444,6 +609,12 @@ def delete_message(
     if message.sender_id != current_user.id:
         raise HTTPException(status_code=403, detail="Can only delete your own messages")
     
+    if message.deleted_at is None:
+        conversation = db.query(Conversation).filter(
+            Conversation.conversation_id == message.conversation_id
+        ).first()
+        record_deletion(db, conversation, message)
+    
     message.deleted_at = func.now()
     message.content = "[Message deleted]"
     db.commit()
@@ -453,8 +624,13 @@ def delete_message(
 
 # ============== RESPONSE BUILDERS ==============
 
-def conversation_to_response(conv: Conversation, current_user_id: int, db: Session) -> ConversationResponse:
-    """Convert conversation to response"""
+def conversation_to_response(
+    conv: Conversation, current_user_id: int, db: Session, title: Optional[str] = None
+) -> ConversationResponse:
+    """Convert conversation to response
+    
+    Pass `title` (from conversation_title) when converting a list of conversations.
+    """
     
     participant_names = get_participant_names(conv.participant_ids, db)
     
@@ -465,41 +641,33 @@ def conversation_to_response(conv: Conversation, current_user_id: int, db: Sessi
             other_names.append(participant_names[i])
     other_participant_name = ", ".join(other_names) if other_names else "Unknown"
     
-    # Get last message
-    last_message = db.query(Message).filter(
-        Message.conversation_id == conv.conversation_id,
-        Message.deleted_at.is_(None)
-    ).order_by(Message.sent_at.desc()).first()
-    
-    # Count unread
-    unread_count = db.query(Message).filter(
-        Message.conversation_id == conv.conversation_id,
-        Message.sender_id != current_user_id,
-        Message.read_at.is_(None),
-        Message.deleted_at.is_(None)
-    ).count()
-    
     return ConversationResponse(
         conversation_id=conv.conversation_id,
         job_id=conv.job_id,
         hire_id=conv.hire_id,
-        title=get_conversation_title(conv, db),
+        title=title if title is not None else get_conversation_title(conv, db),
         status=conv.status if isinstance(conv.status, str) else conv.status.value,
         participant_ids=conv.participant_ids,
         participant_names=participant_names,
         other_participant_name=other_participant_name,
-        last_message=last_message.content if last_message else None,
-        last_message_time=last_message.sent_at.isoformat() if last_message and last_message.sent_at else None,
-        unread_count=unread_count,
+        last_message=conv.last_message_preview,
+        last_message_time=conv.last_message_at.isoformat() if conv.last_message_at else None,
+        unread_count=unread_count_for(conv, current_user_id),
         created_at=conv.created_at.isoformat() if conv.created_at else ""
     )
 
 
-def message_to_response(msg: Message, current_user_id: int, db: Session) -> MessageResponse:
-    """Convert message to response"""
+def message_to_response(
+    msg: Message, current_user_id: int, db: Session, names: Optional[Dict[int, str]] = None
+) -> MessageResponse:
+    """Convert message to response
+    
+    Pass `names` (from resolve_user_names) when converting a list of messages.
+    """
     
-    sender = db.query(User).filter(User.id == msg.sender_id).first()
-    sender_name = f"{sender.first_name} {sender.last_name}" if sender else "Unknown"
+    if names is None:
+        names = resolve_user_names(db, [msg.sender_id])
+    sender_name = names.get(msg.sender_id, UNKNOWN_USER_NAME)
     
     return MessageResponse(
         message_id=msg.message_id,
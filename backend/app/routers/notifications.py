@@ -1,14 +1,30 @@
 """Notification router - API endpoints for notifications"""
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime
-from app.db import get_db
+from datetime import datetime, time
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
-from app.models_v2.notification import Notification, NotificationType
+from app.models_v2.notification import DigestFrequency, Notification, NotificationPreference, NotificationType
+from app.models_v2.push_subscription import PushDelivery, PushSubscription
+from app.config import settings
 from app.security import get_current_user
+from app.services.notification_service import (
+    decrement_unread_count,
+    get_unread_count,
+    increment_unread_counts
+)
+from app.services.notification_preferences import MANDATORY_TYPES, invalidate_preferences
+from app.services.notification_stream import subscribe
+from app.services.web_push import web_push_enabled
+
+STREAM_KEEPALIVE_SECONDS = 25
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -23,6 +39,7 @@ class NotificationResponse(BaseModel):
     reference_type: Optional[str]
     reference_id: Optional[int]
     is_read: bool
+    group_count: int = 1  # > 1 for digests that merge several events
     created_at: str
 
     class Config:
@@ -34,6 +51,24 @@ class NotificationCountResponse(BaseModel):
     total_count: int
 
 
+class NotificationPreferences(BaseModel):
+    muted_types: List[NotificationType] = []
+    quiet_hours_start: Optional[time] = None  # local time, e.g. "22:00"
+    quiet_hours_end: Optional[time] = None    # may be earlier than start (spans midnight)
+    digest_frequency: DigestFrequency = DigestFrequency.HOURLY
+
+
+class PushSubscriptionKeys(BaseModel):
+    p256dh: str
+    auth: str
+
+
+class PushSubscriptionCreate(BaseModel):
+    """PushSubscription.toJSON() from the browser"""
+    endpoint: str
+    keys: PushSubscriptionKeys
+
+
 # ============== HELPER FUNCTION ==============
 
 def create_notification(
@@ -55,6 +90,7 @@ def create_notification(
         reference_id=reference_id
     )
     db.add(notification)
+    increment_unread_counts(db, {user_id: 1})
     db.commit()
     db.refresh(notification)
     return notification
@@ -87,6 +123,7 @@ def get_notifications(
             reference_type=n.reference_type,
             reference_id=n.reference_id,
             is_read=n.is_read,
+            group_count=n.group_count,
             created_at=n.created_at.isoformat() if n.created_at else ""
         )
         for n in notifications
@@ -99,10 +136,8 @@ def get_notification_count(
     db: Session = Depends(get_db)
 ):
     """Get notification counts"""
-    unread_count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).count()
+    # Unread count comes from the per-user counter; the total stays small thanks to retention
+    unread_count = get_unread_count(db, current_user.id)
     
     total_count = db.query(Notification).filter(
         Notification.user_id == current_user.id
@@ -114,11 +149,154 @@ def get_notification_count(
     )
 
 
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Live notifications as Server-Sent Events (one `notification` event per new notification)"""
+    user_id = current_user.id
+    db.close()  # Don't hold a pooled connection for the life of the stream
+    
+    async def events():
+        async with subscribe(user_id) as queue:
+            while not await request.is_disconnected():
+                try:
+                    notification = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(notification)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/preferences", response_model=NotificationPreferences)
+def get_notification_preferences(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the user's notification preferences"""
+    prefs = db.query(NotificationPreference).filter(
+        NotificationPreference.user_id == current_user.id
+    ).first()
+    
+    if not prefs:
+        return NotificationPreferences()
+    
+    return NotificationPreferences(
+        muted_types=prefs.muted_types or [],
+        quiet_hours_start=prefs.quiet_hours_start,
+        quiet_hours_end=prefs.quiet_hours_end,
+        digest_frequency=prefs.digest_frequency
+    )
+
+
+@router.put("/preferences", response_model=NotificationPreferences)
+def update_notification_preferences(
+    preferences: NotificationPreferences,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_transactional_db)
+):
+    """Save the user's notification preferences"""
+    if (preferences.quiet_hours_start is None) != (preferences.quiet_hours_end is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Set both quiet_hours_start and quiet_hours_end, or neither"
+        )
+    
+    mandatory = [t.value for t in preferences.muted_types if t in MANDATORY_TYPES]
+    if mandatory:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"These notifications can't be muted: {', '.join(mandatory)}"
+        )
+    
+    prefs = db.query(NotificationPreference).filter(
+        NotificationPreference.user_id == current_user.id
+    ).first()
+    if not prefs:
+        prefs = NotificationPreference(user_id=current_user.id)
+        db.add(prefs)
+    
+    prefs.muted_types = sorted({t.value for t in preferences.muted_types})
+    prefs.quiet_hours_start = preferences.quiet_hours_start
+    prefs.quiet_hours_end = preferences.quiet_hours_end
+    prefs.digest_frequency = preferences.digest_frequency.value
+    db.commit()
+    invalidate_preferences(current_user.id)
+    
+    return preferences
+
+
+@router.get("/push/public-key")
+def get_push_public_key():
+    """VAPID public key for pushManager.subscribe({applicationServerKey})"""
+    if not web_push_enabled() or not settings.vapid_public_key:
+        raise HTTPException(status_code=404, detail="Push notifications are not configured")
+    return {"public_key": settings.vapid_public_key}
+
+
+@router.post("/push/subscriptions", status_code=status.HTTP_201_CREATED)
+def subscribe_to_push(
+    subscription: PushSubscriptionCreate,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_transactional_db)
+):
+    """Register this browser/device for push notifications"""
+    if not web_push_enabled():
+        raise HTTPException(status_code=404, detail="Push notifications are not configured")
+    
+    existing = db.query(PushSubscription).filter(
+        PushSubscription.endpoint == subscription.endpoint
+    ).first()
+    if not existing:
+        existing = PushSubscription(endpoint=subscription.endpoint)
+        db.add(existing)
+    elif existing.user_id != current_user.id:
+        # A browser may be re-subscribed by a different user after logging in again;
+        # pushes still queued for the previous user must not reach this device
+        db.execute(delete(PushDelivery).where(PushDelivery.subscription_id == existing.subscription_id))
+    
+    existing.user_id = current_user.id
+    existing.p256dh = subscription.keys.p256dh
+    existing.auth = subscription.keys.auth
+    existing.user_agent = (request.headers.get("user-agent") or "")[:255] or None
+    db.commit()
+    
+    return {"message": "Subscribed to push notifications", "subscription_id": existing.subscription_id}
+
+
+@router.delete("/push/subscriptions")
+def unsubscribe_from_push(
+    endpoint: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_transactional_db)
+):
+    """Stop push notifications to a browser/device"""
+    deleted = db.query(PushSubscription).filter(
+        PushSubscription.endpoint == endpoint,
+        PushSubscription.user_id == current_user.id
+    ).delete()
+    db.commit()
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    
+    return {"message": "Unsubscribed from push notifications"}
+
+
 @router.post("/{notification_id}/read")
 def mark_as_read(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Mark a notification as read"""
     notification = db.query(Notification).filter(
@@ -129,9 +307,11 @@ def mark_as_read(
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    notification.is_read = True
-    notification.read_at = func.now()
-    db.commit()
+    if not notification.is_read:
+        notification.is_read = True
+        notification.read_at = func.now()
+        decrement_unread_count(db, current_user.id)
+        db.commit()
     
     return {"message": "Notification marked as read"}
 
@@ -139,16 +319,17 @@ def mark_as_read(
 @router.post("/read-all")
 def mark_all_as_read(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Mark all notifications as read"""
-    db.query(Notification).filter(
+    marked = db.query(Notification).filter(
         Notification.user_id == current_user.id,
         Notification.is_read == False
     ).update({
         "is_read": True,
         "read_at": func.now()
-    })
+    }, synchronize_session=False)
+    decrement_unread_count(db, current_user.id, marked)
     db.commit()
     
     return {"message": "All notifications marked as read"}
@@ -158,7 +339,7 @@ def mark_all_as_read(
 def delete_notification(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Delete a notification"""
     notification = db.query(Notification).filter(
@@ -169,6 +350,8 @@ def delete_notification(
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
+    if not notification.is_read:
+        decrement_unread_count(db, current_user.id)
     db.delete(notification)
     db.commit()
     
@@ -178,12 +361,15 @@ def delete_notification(
 @router.delete("/")
 def clear_all_notifications(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Delete all notifications for user"""
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).delete()
+    deleted = db.execute(
+        delete(Notification)
+        .where(Notification.user_id == current_user.id)
+        .returning(Notification.is_read)
+    ).scalars().all()
+    decrement_unread_count(db, current_user.id, sum(1 for is_read in deleted if not is_read))
     db.commit()
     
     return {"message": "All notifications cleared"}
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
 from app.models_v2.worker_employer import Worker
 from app.models_v2.package import WorkerPackage
@@ -64,7 +64,7 @@ def get_worker_for_user(user_id: int, db: Session) -> Worker:
 def create_package(
     package_data: PackageCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Create a new service package (housekeeper only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -127,7 +127,7 @@ def update_package(
     package_id: int,
     package_data: PackageUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Update a package (owner only)"""
     worker = get_worker_for_user(current_user.id, db)
@@ -176,7 +176,7 @@ def update_package(
 def delete_package(
     package_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Delete a package (owner only)"""
     worker = get_worker_for_user(current_user.id, db)
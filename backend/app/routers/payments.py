@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.db import get_db
-from app.models_v2.payment import PaymentSchedule, PaymentTransaction, PaymentStatus, PaymentFrequency
+from app.db import get_db, get_transactional_db
+from app.models_v2.payment import PaymentSchedule, PaymentTransaction, PaymentStatus, PaymentFrequency, LedgerEntryType
 from app.models_v2.user import User
 from app.routers.auth import get_current_user
+from app.serialization import model_list_response
+from app.services.conversation_status import on_job_status_changed
 from app.services.notification_service import notify_payment_sent, notify_payment_received
+from app.services.payment_ledger import record_payment_event
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/jobs", tags=["payments"])
 
+MAX_PAYMENTS_PAGE_SIZE = 500
+
 
 # Pydantic schemas
 class PaymentTransactionResponse(BaseModel):
@@ -138,79 +145,113 @@ def generate_payment_transactions(
 @router.get("/{job_id}/payments", response_model=List[PaymentTransactionResponse])
 async def get_payments_for_owner(
     job_id: int,
+    worker_id: Optional[int] = None,
+    group_by: str = Query(default="due_date", pattern="^(due_date|worker)$"),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAYMENTS_PAGE_SIZE),
+    offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all payment schedules for a job (owner view) - grouped by worker"""
+    """Get all payment schedules for a job (owner view) - grouped by worker
+    
+    Sorted by due date then worker (or, with group_by=worker, by worker then due
+    date). Pass limit/offset to page; X-Total-Count has the full count.
+    """
     from app.routers.jobs import ForumPost
     from app.models_v2.contract import Contract
-    from app.models_v2.worker_employer import Worker
+    from app.models_v2.worker_employer import Employer
     
-    # Verify job exists and user is the owner
-    job = db.query(ForumPost).filter(ForumPost.post_id == job_id).first()
-    if not job:
+    # Verify job exists and user is the owner (one query)
+    owner = db.query(ForumPost.post_id, Employer.user_id).outerjoin(
+        Employer, Employer.employer_id == ForumPost.employer_id
+    ).filter(ForumPost.post_id == job_id).first()
+    if not owner:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    # Get employer to check ownership
-    from app.models_v2.worker_employer import Employer
-    employer = db.query(Employer).filter(Employer.employer_id == job.employer_id).first()
-    if not employer or employer.user_id != current_user.id:
+    if owner.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view payments for this job")
     
-    # Get ALL contracts for this job (one per worker)
-    contracts = db.query(Contract).filter(Contract.post_id == job_id).all()
-    if not contracts:
-        return []
-    
-    # Get all payment schedules for all contracts
-    all_schedules = []
-    for contract in contracts:
-        schedules = db.query(PaymentSchedule).filter(
-            PaymentSchedule.contract_id == contract.contract_id
-        ).all()
-        
-        for s in schedules:
-            all_schedules.append(s)
-    
-    if not all_schedules:
-        return []
-    
-    # Check for overdue payments
-    today = datetime.now().date()
-    for schedule in all_schedules:
-        due_date = datetime.strptime(schedule.due_date, '%Y-%m-%d').date() if isinstance(schedule.due_date, str) else schedule.due_date
-        if schedule.status == PaymentStatus.PENDING and due_date < today:
-            schedule.status = PaymentStatus.OVERDUE
+    of_job = [Contract.post_id == job_id]
+    if worker_id is not None:
+        of_job.append(PaymentSchedule.worker_id == worker_id)
+    
+    # Check for overdue payments (one UPDATE)
+    today = datetime.now().date().isoformat()
+    db.execute(
+        update(PaymentSchedule)
+        .where(
+            PaymentSchedule.contract_id == Contract.contract_id,
+            PaymentSchedule.status == PaymentStatus.PENDING,
+            PaymentSchedule.due_date < today,
+            *of_job
+        )
+        .values(status=PaymentStatus.OVERDUE)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
     
-    # Format response - return schedules as payment entries
-    result = []
-    for s in all_schedules:
-        # Get associated transaction if any
-        transaction = db.query(PaymentTransaction).filter(
-            PaymentTransaction.schedule_id == s.schedule_id
-        ).first()
-        
-        result.append(PaymentTransactionResponse(
-            transaction_id=transaction.transaction_id if transaction else s.schedule_id,  # Use schedule_id as fallback
-            schedule_id=s.schedule_id,
-            due_date=s.due_date if isinstance(s.due_date, str) else s.due_date.strftime('%Y-%m-%d'),
-            amount=float(s.amount) if s.amount else 0,
-            status=s.status.value if hasattr(s.status, 'value') else str(s.status),
-            payment_proof_url=transaction.proof_url if transaction else None,
-            payment_method=transaction.payment_method if transaction else None,
-            reference_number=transaction.reference_number if transaction else None,
-            sent_at=transaction.sent_at.isoformat() if transaction and transaction.sent_at else None,
-            confirmed_at=transaction.confirmed_at.isoformat() if transaction and transaction.confirmed_at else None,
-            dispute_reason=transaction.dispute_reason if transaction else None,
-            worker_id=s.worker_id,
-            worker_name=s.worker_name or "Worker"
-        ))
+    # Schedules with their transaction (if any), sorted and paged by the database
+    worker_name = func.coalesce(PaymentSchedule.worker_name, "Worker")
+    if group_by == "worker":
+        order = [worker_name, PaymentSchedule.worker_id, PaymentSchedule.due_date, PaymentSchedule.schedule_id]
+    else:
+        order = [PaymentSchedule.due_date, worker_name, PaymentSchedule.schedule_id]
+    query = db.query(
+        PaymentSchedule.schedule_id,
+        PaymentSchedule.due_date,
+        PaymentSchedule.amount,
+        PaymentSchedule.status,
+        PaymentSchedule.worker_id,
+        worker_name.label("worker_name"),
+        PaymentTransaction.transaction_id,
+        PaymentTransaction.proof_url,
+        PaymentTransaction.payment_method,
+        PaymentTransaction.reference_number,
+        PaymentTransaction.sent_at,
+        PaymentTransaction.confirmed_at,
+        PaymentTransaction.dispute_reason,
+        func.count().over().label("total_count")
+    ).join(
+        Contract, Contract.contract_id == PaymentSchedule.contract_id
+    ).outerjoin(
+        PaymentTransaction, PaymentTransaction.schedule_id == PaymentSchedule.schedule_id
+    ).filter(*of_job).order_by(*order).offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = query.all()
     
-    # Sort by due date, then by worker name
-    result.sort(key=lambda t: (t.due_date, t.worker_name or ""))
+    # Format response - return schedules as payment entries
+    result = [
+        PaymentTransactionResponse(
+            transaction_id=row.transaction_id or row.schedule_id,  # Use schedule_id as fallback
+            schedule_id=row.schedule_id,
+            due_date=row.due_date,
+            amount=float(row.amount) if row.amount else 0,
+            status=row.status.value if hasattr(row.status, 'value') else str(row.status),
+            payment_proof_url=row.proof_url,
+            payment_method=row.payment_method,
+            reference_number=row.reference_number,
+            sent_at=row.sent_at.isoformat() if row.sent_at else None,
+            confirmed_at=row.confirmed_at.isoformat() if row.confirmed_at else None,
+            dispute_reason=row.dispute_reason,
+            worker_id=row.worker_id,
+            worker_name=row.worker_name
+        )
+        for row in rows
+    ]
+    
+    if rows:
+        total_count = rows[0].total_count
+    elif offset:
+        # Page past the end: the window count has no row to ride on
+        total_count = db.query(func.count(PaymentSchedule.schedule_id)).join(
+            Contract, Contract.contract_id == PaymentSchedule.contract_id
+        ).filter(*of_job).scalar()
+    else:
+        total_count = 0
     
-    return result
+    response = model_list_response(result, PaymentTransactionResponse)
+    response.headers["X-Total-Count"] = str(total_count)
+    return response
 
 
 @router.get("/{job_id}/my-payments", response_model=List[PaymentTransactionResponse])
@@ -299,12 +340,33 @@ async def get_my_payments(
     return result
 
 
+def _transition_status(db: Session, transaction: PaymentTransaction, from_statuses, to_status, **values) -> bool:
+    """Move a transaction to `to_status` only if it is still in one of `from_statuses`
+
+    The status check and the write are one UPDATE, so of two concurrent or retried
+    requests only one gets a row back - only that one may append to the ledger.
+    The transaction's status is reloaded on next access either way.
+    """
+    changed = db.execute(
+        update(PaymentTransaction)
+        .where(
+            PaymentTransaction.transaction_id == transaction.transaction_id,
+            PaymentTransaction.status.in_(from_statuses)
+        )
+        .values(status=to_status, **values)
+        .returning(PaymentTransaction.transaction_id)
+        .execution_options(synchronize_session=False)
+    ).first() is not None
+    db.expire(transaction, ["status", *values])
+    return changed
+
+
 @router.put("/{job_id}/payments/{schedule_id}/mark-sent")
 async def mark_payment_as_sent(
     job_id: int,
     schedule_id: int,
     data: MarkAsSentRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Mark payment as sent with proof (owner only)
@@ -336,6 +398,9 @@ async def mark_payment_as_sent(
         PaymentTransaction.schedule_id == schedule_id
     ).first()
     
+    if transaction and transaction.status == PaymentStatus.CONFIRMED:
+        raise HTTPException(status_code=400, detail="Payment has already been confirmed")
+    
     if not transaction:
         # Create a new transaction
         transaction = PaymentTransaction(
@@ -348,9 +413,19 @@ async def mark_payment_as_sent(
             sent_at=datetime.now()
         )
         db.add(transaction)
+        try:
+            db.flush()  # schedule_id is unique, so a concurrent first send fails here
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Payment has already been marked as sent")
+        newly_sent = True
     else:
         # Update existing transaction
-        transaction.status = PaymentStatus.SENT
+        newly_sent = _transition_status(
+            db, transaction, [PaymentStatus.PENDING, PaymentStatus.DISPUTED, PaymentStatus.OVERDUE], PaymentStatus.SENT
+        )
+        if not newly_sent and transaction.status != PaymentStatus.SENT:
+            raise HTTPException(status_code=400, detail="Payment has already been confirmed")
         transaction.proof_url = data.payment_proof_url
         transaction.payment_method = data.payment_method
         transaction.reference_number = data.reference_number
@@ -359,7 +434,11 @@ async def mark_payment_as_sent(
     # Also update the schedule status
     schedule.status = PaymentStatus.SENT
     
-    db.commit()
+    if newly_sent:
+        record_payment_event(
+            db, LedgerEntryType.SENT, schedule.contract_id, transaction.amount_paid,
+            worker_id=schedule.worker_id, schedule_id=schedule_id, transaction_id=transaction.transaction_id
+        )
     
     # Send notification to worker about payment sent
     from app.models_v2.worker_employer import Worker
@@ -371,9 +450,12 @@ async def mark_payment_as_sent(
                 worker_user_id=worker.user_id,
                 job_title=job.title,
                 amount=float(schedule.amount) if schedule.amount else 0,
-                post_id=job_id
+                post_id=job_id,
+                commit=False
             )
     
+    db.commit()
+    
     return {"message": "Payment marked as sent successfully"}
 
 
@@ -381,7 +463,7 @@ async def mark_payment_as_sent(
 async def confirm_payment_received(
     job_id: int,
     identifier: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Confirm payment received (housekeeper only)
@@ -431,11 +513,18 @@ async def confirm_payment_received(
         raise HTTPException(status_code=400, detail="Payment has not been marked as sent")
     
     # Update transaction and schedule status
-    transaction.status = PaymentStatus.CONFIRMED
-    transaction.confirmed_at = datetime.now()
+    if not _transition_status(
+        db, transaction, [PaymentStatus.SENT], PaymentStatus.CONFIRMED, confirmed_at=datetime.now()
+    ):
+        # Confirmed (or disputed) by a concurrent request since we read it
+        if transaction.status == PaymentStatus.CONFIRMED:
+            return {"message": "Payment already confirmed", "job_completed": False}
+        raise HTTPException(status_code=400, detail="Payment has not been marked as sent")
     schedule.status = PaymentStatus.CONFIRMED
-    
-    db.commit()
+    record_payment_event(
+        db, LedgerEntryType.CONFIRMED, schedule.contract_id, transaction.amount_paid,
+        worker_id=schedule.worker_id, schedule_id=schedule.schedule_id, transaction_id=transaction.transaction_id
+    )
     
     # Send notification to owner about payment received by worker
     from app.models_v2.worker_employer import Employer
@@ -447,12 +536,15 @@ async def confirm_payment_received(
             employer_user_id=employer.user_id,
             worker_name=worker_name,
             job_title=job.title,
-            post_id=job_id
+            post_id=job_id,
+            commit=False
         )
     
     # Check if job should auto-complete (long-term jobs only)
     # Condition: ALL payments for ALL workers are confirmed
+    job_completed = False
     if job.is_longterm:
+        db.flush()
         # Check if all payment schedules are confirmed
         all_schedules = db.query(PaymentSchedule).join(Contract).filter(
             Contract.post_id == job_id
@@ -463,20 +555,22 @@ async def confirm_payment_received(
         if all_confirmed:
             job.status = ForumPostStatus.COMPLETED
             job.completed_at = datetime.now()
+            on_job_status_changed(db, job)
             
             # Mark all contracts as completed
             from app.models_v2.contract import ContractStatus
             contracts = db.query(Contract).filter(Contract.post_id == job_id).all()
             for contract in contracts:
                 contract.status = ContractStatus.COMPLETED
-            
-            db.commit()
-            
-            return {
-                "message": "Payment confirmed! Job has been completed.",
-                "job_completed": True
-            }
+            job_completed = True
+    
+    db.commit()
     
+    if job_completed:
+        return {
+            "message": "Payment confirmed! Job has been completed.",
+            "job_completed": True
+        }
     return {"message": "Payment confirmed successfully", "job_completed": False}
 
 
@@ -485,7 +579,7 @@ async def report_payment_issue(
     job_id: int,
     transaction_id: int,
     data: ReportIssueRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_transactional_db),
     current_user: User = Depends(get_current_user)
 ):
     """Report issue with payment (housekeeper only)"""
@@ -504,8 +598,18 @@ async def report_payment_issue(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    # Only a sent payment can be disputed; a confirmed one is already counted as earned
+    if not _transition_status(db, transaction, [PaymentStatus.SENT], PaymentStatus.DISPUTED):
+        raise HTTPException(status_code=400, detail="Only payments marked as sent can be disputed")
+    
+    # A disputed payment no longer counts as awaiting confirmation
+    schedule = transaction.schedule
+    record_payment_event(
+        db, LedgerEntryType.DISPUTED, schedule.contract_id, transaction.amount_paid,
+        worker_id=schedule.worker_id, schedule_id=schedule.schedule_id, transaction_id=transaction.transaction_id
+    )
+    
     # Update transaction
-    transaction.status = PaymentStatus.DISPUTED
     transaction.dispute_reason = data.dispute_reason
     
     db.commit()
@@ -5,7 +5,7 @@ from sqlalchemy import func
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
 from app.models_v2.rating import Rating
 from app.models_v2.worker_employer import Worker
@@ -51,7 +51,7 @@ class RatingSummary(BaseModel):
 def create_rating(
     rating_data: RatingCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Submit a rating for a user (after job completion)"""
     
@@ -214,7 +214,7 @@ def check_if_rated(
 def delete_rating(
     rating_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Delete a rating (only the rater can delete their own rating)"""
     
@@ -8,7 +8,7 @@ from datetime import datetime
 from pydantic import BaseModel
 import json
 
-from app.db import get_db
+from app.db import get_db, get_transactional_db
 from app.models_v2.user import User
 from app.models_v2.report import Report, ReportType, ReportStatus
 from app.models_v2.forum import ForumPost
@@ -48,7 +48,7 @@ class ReportResponse(BaseModel):
 def create_report(
     report_data: CreateReportRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Create a new report (for housekeepers or owners)"""
     
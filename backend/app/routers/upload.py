@@ -1,53 +1,180 @@
 """
 File upload endpoints for images and documents
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Optional
-import os
-import uuid
-from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import logging
 from pathlib import Path
 
-from app.db import get_db
+from app.db import get_transactional_db
 from app.models_v2.user import User
 from app.security import get_current_user
+from app.services.image_service import PROCESSABLE_IMAGE_TYPES, process_image, rendition_urls
+from app.services.storage_backends import get_storage
+from app.services.upload_storage import (
+    commit_blob,
+    content_url,
+    direct_upload_key,
+    extension_for,
+    record_blob,
+    sniff_extension,
+    temp_upload_path,
+)
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# Create uploads directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 # Allowed file types
 ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 ALLOWED_DOCUMENT_TYPES = {"image/jpeg", "image/png", "application/pdf", "image/gif", "image/webp"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILES_PER_BATCH = 10
+BATCH_UPLOAD_CONCURRENCY = 4  # files written in parallel per /multiple request
+UPLOAD_CHUNK_SIZE = 256 * 1024  # 256KB per read/write
+UPLOAD_FAILED_ERROR = "Upload failed. Please try again"
+
+logger = logging.getLogger(__name__)
+
+
+class PresignRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_FILE_SIZE while streaming"""
+    pass
+
+
+class UploadFailedError(Exception):
+    """Raised when a stored upload could not be recorded; nothing is left behind"""
+    pass
+
+
+class BlobMissingError(UploadFailedError):
+    """Raised when deduplicated content's stored blob has been removed meanwhile"""
+    pass
+
+
+def _write_chunk(out, chunk: bytes, hasher=None):
+    out.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def save_upload_file(file: UploadFile, destination: Path, max_size: int = MAX_FILE_SIZE, hasher=None) -> int:
+    """Stream an upload to disk in chunks, aborting as soon as it exceeds max_size
+    
+    Reads and writes happen in the threadpool so the event loop is never blocked,
+    and at most one chunk is held in memory at a time. A partially written file is
+    removed if the limit is exceeded. If a hashlib object is given it is fed every
+    chunk as it is written.
+    
+    Returns:
+        Number of bytes written
+    """
+    # Reject early when the multipart part already tells us the size
+    if file.size is not None and file.size > max_size:
+        raise FileTooLargeError()
+    
+    out = await run_in_threadpool(open, destination, "wb")
+    total = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_size:
+                raise FileTooLargeError()
+            await run_in_threadpool(_write_chunk, out, chunk, hasher)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        destination.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(out.close)
+    return total
 
 
-def generate_unique_filename(original_filename: str) -> str:
-    """Generate a unique filename with timestamp and UUID"""
-    ext = Path(original_filename).suffix.lower()
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = uuid.uuid4().hex[:8]
-    return f"{timestamp}_{unique_id}{ext}"
+async def write_upload(file: UploadFile) -> Tuple[str, str, int, bool]:
+    """Stream an upload into content-addressed storage (no database work)
+    
+    Returns:
+        (sha256 digest, storage path relative to the uploads root, size in bytes,
+        True if the content is new)
+    """
+    temp_path = temp_upload_path()
+    hasher = hashlib.sha256()
+    size = await save_upload_file(file, temp_path, hasher=hasher)
+    
+    digest = hasher.hexdigest()
+    ext = await run_in_threadpool(sniff_extension, temp_path) or extension_for(file.content_type, file.filename)
+    try:
+        relpath, is_new = await run_in_threadpool(commit_blob, temp_path, digest, ext, file.content_type)
+    finally:
+        temp_path.unlink(missing_ok=True)  # already moved (or removed) unless storing failed
+    return digest, relpath, size, is_new
+
+
+async def store_upload(file: UploadFile, db: Session) -> Tuple[str, int, bool]:
+    """Stream an upload into content-addressed storage and record the blob
+    
+    Returns:
+        (storage path relative to the uploads root, size in bytes, True if the content is new)
+    """
+    digest, relpath, size, is_new = await write_upload(file)
+    try:
+        canonical = await run_in_threadpool(record_blob, db, digest, relpath, size, file.content_type)
+    except Exception as e:
+        # Don't leave a blob this request created in storage without a stored_files row
+        logger.exception("Failed to record upload %s", file.filename)
+        await run_in_threadpool(db.rollback)
+        if is_new:
+            await run_in_threadpool(get_storage().delete, relpath)
+        raise UploadFailedError() from e
+    return await use_canonical_path(relpath, canonical, is_new), size, is_new and canonical == relpath
+
+
+async def use_canonical_path(relpath: str, canonical: str, is_new: bool) -> str:
+    """Serve a blob from its recorded path; a copy just written elsewhere (content that
+    was first stored under another extension) is removed
+    
+    Raises BlobMissingError if an existing blob was swept as an orphan while this
+    upload was deduplicated against it.
+    """
+    storage = get_storage()
+    if canonical == relpath and is_new:
+        return canonical
+    if is_new:
+        await run_in_threadpool(storage.delete, relpath)
+    if not await run_in_threadpool(storage.exists, canonical):
+        raise BlobMissingError(canonical)
+    return canonical
 
 
 @router.post("/image")
 async def upload_image(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     category: str = "general",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Upload an image file (for job posts, proof of completion, etc.)
     
     Args:
         file: The image file to upload
-        category: Category for organization (job, completion, payment, profile, document)
+        category: Category for organization (job, completion, payment, profile, document).
+            Files are stored by content hash, so this is echoed back but not part of the path.
     
     Returns:
-        URL to access the uploaded image
+        URL to access the uploaded image, plus WebP rendition URLs (large, medium,
+        thumb) that are generated in the background after the response is sent
     """
     
     # Validate file type
@@ -57,34 +184,35 @@ async def upload_image(
             detail=f"File type not allowed. Allowed types: JPEG, PNG, GIF, WebP"
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
+    # Stream into content-addressed storage, enforcing the size limit as we go
+    try:
+        relpath, size, is_new = await store_upload(file, db)
+    except FileTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File too large. Maximum size is 10MB"
         )
+    except UploadFailedError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=UPLOAD_FAILED_ERROR)
     
-    # Create category subdirectory
-    category_dir = UPLOAD_DIR / category
-    category_dir.mkdir(exist_ok=True)
-    
-    # Generate unique filename
-    filename = generate_unique_filename(file.filename or "image.jpg")
-    file_path = category_dir / filename
+    url = content_url(relpath)
+    filename = Path(relpath).name
     
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Resize/recompress in the process pool once the response has gone out.
+    # Duplicate content is checked too: its renditions may never have been made.
+    renditions = {}
+    if file.content_type in PROCESSABLE_IMAGE_TYPES:
+        background_tasks.add_task(process_image, relpath)
+        renditions = rendition_urls(url.rsplit("/", 1)[0], filename)
     
     # Return URL (relative path that can be served by the static file server)
     return {
-        "url": f"/uploads/{category}/{filename}",
+        "url": url,
         "filename": filename,
-        "size": len(content),
-        "content_type": file.content_type
+        "size": size,
+        "content_type": file.content_type,
+        "category": category,
+        "renditions": renditions
     }
 
 
@@ -93,7 +221,7 @@ async def upload_document(
     file: UploadFile = File(...),
     document_type: str = "id",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Upload a document file (for registration documents, IDs, etc.)
     
@@ -112,33 +240,22 @@ async def upload_document(
             detail=f"File type not allowed. Allowed types: JPEG, PNG, GIF, WebP, PDF"
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
+    # Stream into content-addressed storage, enforcing the size limit as we go
+    try:
+        relpath, size, is_new = await store_upload(file, db)
+    except FileTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File too large. Maximum size is 10MB"
         )
-    
-    # Create user-specific subdirectory for documents
-    user_dir = UPLOAD_DIR / "documents" / str(current_user.id)
-    user_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    filename = generate_unique_filename(file.filename or "document.jpg")
-    file_path = user_dir / filename
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
+    except UploadFailedError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=UPLOAD_FAILED_ERROR)
     
     # Return URL
     return {
-        "url": f"/uploads/documents/{current_user.id}/{filename}",
-        "filename": filename,
-        "size": len(content),
+        "url": content_url(relpath),
+        "filename": Path(relpath).name,
+        "size": size,
         "content_type": file.content_type,
         "document_type": document_type
     }
@@ -146,57 +263,156 @@ async def upload_document(
 
 @router.post("/multiple")
 async def upload_multiple_images(
+    background_tasks: BackgroundTasks,
     files: list[UploadFile] = File(...),
     category: str = "general",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_transactional_db)
 ):
     """Upload multiple image files at once
     
+    The whole batch is validated first, then valid files are written in parallel
+    (at most BATCH_UPLOAD_CONCURRENCY at a time), so a batch takes roughly as long
+    as its slowest file.
+    
     Args:
         files: List of image files to upload
         category: Category for organization
     
     Returns:
-        List of URLs for uploaded images
+        `files`: per-file status in request order ("uploaded" or "rejected" with an error),
+        `uploaded`: the successfully uploaded files, `count`: how many were uploaded
     """
     
-    if len(files) > 10:
+    if len(files) > MAX_FILES_PER_BATCH:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Maximum 10 files can be uploaded at once"
+            detail=f"Maximum {MAX_FILES_PER_BATCH} files can be uploaded at once"
         )
     
-    results = []
-    
+    # Validate the whole batch before touching storage
+    statuses = []
     for file in files:
-        # Validate file type
+        error = None
         if file.content_type not in ALLOWED_IMAGE_TYPES:
-            continue  # Skip invalid files
-        
-        # Read file content
-        content = await file.read()
+            error = "File type not allowed. Allowed types: JPEG, PNG, GIF, WebP"
+        elif file.size is not None and file.size > MAX_FILE_SIZE:
+            error = "File too large. Maximum size is 10MB"
+        statuses.append({
+            "original_filename": file.filename,
+            "status": "rejected" if error else "pending",
+            "error": error
+        })
+    
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    
+    async def write_one(file: UploadFile):
+        """(write_upload result, None) or (None, error message) - never raises"""
+        async with semaphore:
+            try:
+                return await write_upload(file), None
+            except FileTooLargeError:
+                return None, "File too large. Maximum size is 10MB"
+            except Exception:
+                logger.exception("Failed to store upload %s", file.filename)
+                return None, UPLOAD_FAILED_ERROR
+    
+    pending = [i for i, entry in enumerate(statuses) if entry["status"] == "pending"]
+    written = await asyncio.gather(*(write_one(files[i]) for i in pending))
+    
+    stored = {}
+    for i, (result, error) in zip(pending, written):
+        if error:
+            statuses[i].update(status="rejected", error=error)
+        else:
+            stored[i] = result
+    
+    # Record all blobs in one transaction. If that fails, remove the blobs this
+    # request created so none are left in storage without a stored_files row.
+    if stored:
+        def record_blobs():
+            canonical = {
+                i: record_blob(db, digest, relpath, size, files[i].content_type, commit=False)
+                for i, (digest, relpath, size, is_new) in stored.items()
+            }
+            db.commit()
+            return canonical
         
-        # Skip files that are too large
-        if len(content) > MAX_FILE_SIZE:
+        try:
+            canonical = await run_in_threadpool(record_blobs)
+        except Exception:
+            logger.exception("Failed to record %d uploaded files", len(stored))
+            await run_in_threadpool(db.rollback)
+            storage = get_storage()
+            for i, (digest, relpath, size, is_new) in stored.items():
+                if is_new:
+                    await run_in_threadpool(storage.delete, relpath)
+                statuses[i].update(status="rejected", error=UPLOAD_FAILED_ERROR)
+            stored = {}
+    
+    for i, (digest, relpath, size, is_new) in stored.items():
+        try:
+            relpath = await use_canonical_path(relpath, canonical[i], is_new)
+        except BlobMissingError:
+            statuses[i].update(status="rejected", error=UPLOAD_FAILED_ERROR)
             continue
+        url = content_url(relpath)
+        filename = Path(relpath).name
         
-        # Create category subdirectory
-        category_dir = UPLOAD_DIR / category
-        category_dir.mkdir(exist_ok=True)
-        
-        # Generate unique filename
-        filename = generate_unique_filename(file.filename or "image.jpg")
-        file_path = category_dir / filename
+        renditions = {}
+        if files[i].content_type in PROCESSABLE_IMAGE_TYPES:
+            background_tasks.add_task(process_image, relpath)
+            renditions = rendition_urls(url.rsplit("/", 1)[0], filename)
         
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        results.append({
-            "url": f"/uploads/{category}/{filename}",
-            "filename": filename,
-            "size": len(content)
-        })
+        statuses[i].update(
+            status="uploaded",
+            url=url,
+            filename=filename,
+            size=size,
+            renditions=renditions
+        )
     
-    return {"uploaded": results, "count": len(results)}
+    uploaded = [
+        {key: entry[key] for key in ("url", "filename", "size", "renditions")}
+        for entry in statuses if entry["status"] == "uploaded"
+    ]
+    return {"files": statuses, "uploaded": uploaded, "count": len(uploaded)}
+
+
+@router.post("/presign")
+def presign_direct_upload(
+    data: PresignRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Get a presigned URL to upload a file straight to object storage
+    
+    Large files (e.g. completion-proof videos) skip the API workers entirely. The
+    client POSTs the file to `upload_url` with `fields` as form data, then uses
+    `url` wherever the file is referenced. Only available with the S3 backend.
+    """
+    if data.content_type not in ALLOWED_DOCUMENT_TYPES | ALLOWED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed types: JPEG, PNG, GIF, WebP, PDF"
+        )
+    
+    if data.size <= 0 or data.size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum size is 10MB"
+        )
+    
+    storage = get_storage()
+    key = direct_upload_key(extension_for(data.content_type, data.filename))
+    presigned = storage.presigned_upload(key, data.content_type, MAX_FILE_SIZE)
+    if presigned is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Direct uploads are not available with the current storage backend. Use /upload/image or /upload/document."
+        )
+    
+    return {
+        **presigned,
+        "key": key,
+        "url": storage.url(key)
+    }
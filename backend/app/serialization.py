@@ -0,0 +1,44 @@
+"""
+JSON serialization helpers for API responses
+
+FastAPI normally validates a returned object against `response_model` and then runs
+it through `jsonable_encoder` + the stdlib JSON encoder. For large list endpoints
+that build the response models themselves this work is redundant, so these helpers
+dump already-built Pydantic models straight to JSON bytes with pydantic-core.
+"""
+from functools import lru_cache
+from typing import List, Sequence, Type
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to the stdlib encoder
+    orjson = None
+
+
+def get_default_response_class() -> Type[Response]:
+    """ORJSONResponse when enabled in settings and orjson is installed, else JSONResponse"""
+    if settings.orjson_responses and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def model_list_response(items: Sequence[BaseModel], model: Type[BaseModel]) -> Response:
+    """Serialize a list of already-built response models without re-validating them
+
+    The endpoint should keep `response_model=List[model]` so the OpenAPI schema
+    stays the same - FastAPI skips response validation when a Response is returned.
+    """
+    return Response(
+        content=_list_adapter(model).dump_json(list(items)),
+        media_type="application/json",
+    )
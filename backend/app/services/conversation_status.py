@@ -0,0 +1,68 @@
+"""Conversation status - Makes conversations read-only when their job or hire ends
+
+Status changes are driven by the job/hire events instead of being re-derived on
+every read:
+
+- job completed or cancelled: its conversations become read-only right away
+- direct hire cancelled: read-only right away
+- direct hire paid: stays open for READ_ONLY_AFTER_PAID_DAYS so both sides can
+  wrap up, then the scheduled sweeper makes it read-only
+
+The sweeper also re-applies the immediate rules, which catches any status change
+made without going through the hooks below.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.db import transactional_connection
+from app.models_v2.conversation import Conversation
+from app.models_v2.direct_hire import DirectHire, DirectHireStatus
+from app.models_v2.forum import ForumPost, ForumPostStatus
+
+READ_ONLY_AFTER_PAID_DAYS = 7
+CLOSED_JOB_STATUSES = (ForumPostStatus.COMPLETED, ForumPostStatus.CANCELLED)
+
+
+def _make_read_only(*criteria):
+    return (
+        update(Conversation)
+        .where(Conversation.status == 'active', *criteria)
+        .values(status='read_only')
+        .execution_options(synchronize_session=False)
+    )
+
+
+def on_job_status_changed(db: Session, post: ForumPost):
+    """Call after changing a job's status (same transaction; the caller commits)"""
+    if post.status in CLOSED_JOB_STATUSES:
+        db.execute(_make_read_only(Conversation.job_id == post.post_id))
+
+
+def on_hire_status_changed(db: Session, hire: DirectHire):
+    """Call after changing a direct hire's status (same transaction; the caller commits)"""
+    if hire.status == DirectHireStatus.CANCELLED:
+        db.execute(_make_read_only(Conversation.hire_id == hire.hire_id))
+
+
+def sweep_conversation_status() -> int:
+    """Make conversations read-only once their job/hire has ended (scheduled)
+
+    Returns:
+        Number of conversations changed
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=READ_ONLY_AFTER_PAID_DAYS)
+    with transactional_connection() as conn, conn.begin():
+        hires = conn.execute(_make_read_only(
+            Conversation.hire_id == DirectHire.hire_id,
+            or_(
+                DirectHire.status == DirectHireStatus.CANCELLED,
+                (DirectHire.status == DirectHireStatus.PAID) & (DirectHire.paid_at < cutoff),
+            ),
+        )).rowcount
+        jobs = conn.execute(_make_read_only(
+            Conversation.job_id == ForumPost.post_id,
+            ForumPost.status.in_(CLOSED_JOB_STATUSES),
+        )).rowcount
+    return hires + jobs
@@ -0,0 +1,109 @@
+"""Conversation summaries - Denormalized last message and per-participant unread counts
+
+The inbox shows each conversation's last message and the viewer's unread count.
+Instead of querying messages for every conversation, these live on the
+conversations row and are kept current when messages are sent, deleted or read:
+
+- last_message_id / last_message_preview / last_message_at: newest non-deleted message
+- unread_counts[i]: unread messages for participant_ids[i] (messages from someone else
+  with read_at unset, same rule as before)
+
+Counter changes are applied relative to the stored value in a single UPDATE, so
+concurrent senders and readers don't overwrite each other.
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.models_v2.conversation import Conversation, Message
+
+MESSAGE_PREVIEW_LENGTH = 200
+
+# New unread_counts: stored count + delta, per participant position, never below 0
+_ADJUSTED_COUNTS = """
+    ARRAY(
+        SELECT GREATEST(COALESCE(unread_counts[i], 0) + (:deltas)[i], 0)
+        FROM generate_subscripts(participant_ids, 1) AS i
+        ORDER BY i
+    )
+"""
+
+_ADJUST_UNREAD = text(f"""
+    UPDATE conversations
+    SET unread_counts = {_ADJUSTED_COUNTS}
+    WHERE conversation_id = :conversation_id
+""").bindparams(bindparam("deltas", type_=ARRAY(Integer)))
+
+_RECORD_MESSAGE = text(f"""
+    UPDATE conversations
+    SET last_message_id = :message_id,
+        last_message_preview = :preview,
+        last_message_at = :sent_at,
+        unread_counts = {_ADJUSTED_COUNTS},
+        updated_at = NOW()
+    WHERE conversation_id = :conversation_id
+""").bindparams(bindparam("deltas", type_=ARRAY(Integer)))
+
+
+def message_preview(content: str) -> str:
+    if len(content) <= MESSAGE_PREVIEW_LENGTH:
+        return content
+    return content[:MESSAGE_PREVIEW_LENGTH - 1].rstrip() + "…"
+
+
+def unread_count_for(conv: Conversation, user_id: int) -> int:
+    """The user's unread count from the conversation row"""
+    try:
+        position = conv.participant_ids.index(user_id)
+    except ValueError:
+        return 0
+    counts = conv.unread_counts or []
+    return counts[position] if position < len(counts) else 0
+
+
+def _deltas(conv: Conversation, per_user: Dict[int, int]) -> list:
+    return [per_user.get(pid, 0) for pid in conv.participant_ids]
+
+
+def record_message(db: Session, conv: Conversation, message: Message, count: int = 1):
+    """Messages were sent: make `message` (the newest) the last message and count
+    all `count` of them unread for the other participants (Session or Connection)"""
+    db.execute(_RECORD_MESSAGE, {
+        "conversation_id": conv.conversation_id,
+        "message_id": message.message_id,
+        "preview": message_preview(message.content),
+        "sent_at": message.sent_at,
+        "deltas": _deltas(conv, {pid: count for pid in conv.participant_ids if pid != message.sender_id}),
+    })
+
+
+def record_reads(db: Session, conv: Conversation, sender_ids: Iterable[int]):
+    """Messages from these senders were marked read
+
+    read_at is per message, so a read message stops counting for every participant
+    other than its sender.
+    """
+    sender_ids = list(sender_ids)
+    if not sender_ids:
+        return
+    per_user = {pid: -sum(1 for s in sender_ids if s != pid) for pid in conv.participant_ids}
+    db.execute(_ADJUST_UNREAD, {"conversation_id": conv.conversation_id, "deltas": _deltas(conv, per_user)})
+
+
+def record_deletion(db: Session, conv: Conversation, message: Message):
+    """A message was soft-deleted: uncount it if unread and move last_message back if needed"""
+    if message.read_at is None:
+        per_user = {pid: -1 for pid in conv.participant_ids if pid != message.sender_id}
+        db.execute(_ADJUST_UNREAD, {"conversation_id": conv.conversation_id, "deltas": _deltas(conv, per_user)})
+
+    if conv.last_message_id == message.message_id:
+        previous = db.query(Message).filter(
+            Message.conversation_id == conv.conversation_id,
+            Message.deleted_at.is_(None),
+            Message.message_id != message.message_id
+        ).order_by(Message.message_id.desc()).first()
+        conv.last_message_id = previous.message_id if previous else None
+        conv.last_message_preview = message_preview(previous.content) if previous else None
+        conv.last_message_at = previous.sent_at if previous else None
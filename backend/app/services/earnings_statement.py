@@ -0,0 +1,171 @@
+"""Earnings statements - A housekeeper's received payments for a date range
+
+One statement covers both kinds of income:
+
+- job payments: confirmed payment_transactions of the worker's contracts (long-term
+  schedules and recorded short-term payments), dated by when they were confirmed
+- direct hires: paid direct_hires, dated by paid_at
+
+Both are read with a single UNION ALL query through a server-side cursor and
+written out row by row (CSV or PDF), so memory use doesn't grow with the number
+of payments. Dates are in the app's local time (settings.statement_timezone).
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterator, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, literal, select, union_all
+
+from app.config import settings
+from app.db import transactional_connection
+from app.models_v2.contract import Contract
+from app.models_v2.direct_hire import DirectHire, DirectHireStatus
+from app.models_v2.forum import ForumPost
+from app.models_v2.payment import PaymentSchedule, PaymentStatus, PaymentTransaction
+from app.models_v2.user import User
+from app.models_v2.worker_employer import Employer
+from app.pdf import stream_text_pdf
+
+STATEMENT_FETCH_SIZE = 500  # rows per server-side cursor fetch
+CSV_CHUNK_ROWS = 200        # rows per streamed CSV chunk
+
+CSV_COLUMNS = ["date", "source", "reference_id", "description", "employer",
+               "payment_method", "reference_number", "amount"]
+
+
+class StatementLine(NamedTuple):
+    paid_at: datetime
+    source: str  # "job" or "direct_hire"
+    reference_id: int  # transaction_id or hire_id
+    description: str
+    employer: str
+    payment_method: Optional[str]
+    reference_number: Optional[str]
+    amount: Decimal
+
+
+def _bounds(start: date, end: date):
+    """[start 00:00, day after end 00:00) in local time"""
+    tz = ZoneInfo(settings.statement_timezone)
+    return datetime.combine(start, time.min, tz), datetime.combine(end + timedelta(days=1), time.min, tz)
+
+
+def _statement_query(worker_id: int, start: date, end: date):
+    since, until = _bounds(start, end)
+    employer_name = (User.first_name + literal(" ") + User.last_name).label("employer")
+
+    paid_at = func.coalesce(PaymentTransaction.confirmed_at, PaymentTransaction.sent_at)
+    job_payments = (
+        select(
+            paid_at.label("paid_at"),
+            literal("job").label("source"),
+            PaymentTransaction.transaction_id.label("reference_id"),
+            ForumPost.title.label("description"),
+            employer_name,
+            PaymentTransaction.payment_method,
+            PaymentTransaction.reference_number,
+            PaymentTransaction.amount_paid.label("amount"),
+        )
+        .select_from(PaymentTransaction)
+        .join(PaymentSchedule, PaymentSchedule.schedule_id == PaymentTransaction.schedule_id)
+        .join(Contract, Contract.contract_id == PaymentSchedule.contract_id)
+        .join(ForumPost, ForumPost.post_id == Contract.post_id)
+        .join(Employer, Employer.employer_id == Contract.employer_id)
+        .join(User, User.id == Employer.user_id)
+        .where(
+            Contract.worker_id == worker_id,
+            PaymentTransaction.status == PaymentStatus.CONFIRMED,
+            paid_at >= since,
+            paid_at < until,
+        )
+    )
+    direct_hires = (
+        select(
+            DirectHire.paid_at.label("paid_at"),
+            literal("direct_hire").label("source"),
+            DirectHire.hire_id.label("reference_id"),
+            (literal("Direct hire on ") + func.to_char(DirectHire.scheduled_date, "YYYY-MM-DD")).label("description"),
+            employer_name,
+            DirectHire.payment_method,
+            DirectHire.reference_number,
+            DirectHire.total_amount.label("amount"),
+        )
+        .join(Employer, Employer.employer_id == DirectHire.employer_id)
+        .join(User, User.id == Employer.user_id)
+        .where(
+            DirectHire.worker_id == worker_id,
+            DirectHire.status == DirectHireStatus.PAID,
+            DirectHire.paid_at >= since,
+            DirectHire.paid_at < until,
+        )
+    )
+    statement = union_all(job_payments, direct_hires).subquery()
+    return select(statement).order_by(statement.c.paid_at, statement.c.source, statement.c.reference_id)
+
+
+def iter_statement_lines(worker_id: int, start: date, end: date) -> Iterator[StatementLine]:
+    """Statement lines in date order, fetched STATEMENT_FETCH_SIZE rows at a time
+
+    psycopg2 server-side (named) cursors need an open transaction, hence the
+    transactional connection; the connection is returned when iteration ends.
+    """
+    with transactional_connection() as conn, conn.begin():
+        result = conn.execution_options(yield_per=STATEMENT_FETCH_SIZE).execute(
+            _statement_query(worker_id, start, end)
+        )
+        for row in result:
+            yield StatementLine(*row)
+
+
+def _local_date(value: datetime) -> str:
+    return value.astimezone(ZoneInfo(settings.statement_timezone)).date().isoformat()
+
+
+def statement_csv(lines: Iterator[StatementLine]) -> Iterator[str]:
+    """CSV of the lines with a closing total row, in chunks of CSV_CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    total, count = Decimal(0), 0
+    for line in lines:
+        writer.writerow([
+            _local_date(line.paid_at), line.source, line.reference_id, line.description, line.employer,
+            line.payment_method or "", line.reference_number or "", f"{line.amount:.2f}",
+        ])
+        total += line.amount
+        count += 1
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    writer.writerow(["total", "", count, "", "", "", "", f"{total:.2f}"])
+    yield buffer.getvalue()
+
+
+def _statement_text(lines: Iterator[StatementLine], worker_name: str, start: date, end: date) -> Iterator[str]:
+    yield "EARNINGS STATEMENT"
+    yield f"{worker_name}"
+    yield f"Period: {start.isoformat()} to {end.isoformat()}"
+    yield ""
+    yield f"{'Date':<10}  {'Source':<11}  {'Description':<32}  {'Employer':<24}  {'Amount (PHP)':>15}"
+    yield "-" * 100
+    total, count = Decimal(0), 0
+    for line in lines:
+        yield (
+            f"{_local_date(line.paid_at):<10}  {line.source:<11}  {line.description[:32]:<32}  "
+            f"{line.employer[:24]:<24}  {line.amount:>15,.2f}"
+        )
+        total += line.amount
+        count += 1
+    yield "-" * 100
+    yield f"{f'{count} payment(s)':<85}  {total:>13,.2f}"
+
+
+def statement_pdf(lines: Iterator[StatementLine], worker_name: str, start: date, end: date) -> Iterator[bytes]:
+    return stream_text_pdf(
+        _statement_text(lines, worker_name, start, end),
+        title=f"Earnings statement {start.isoformat()} to {end.isoformat()}"
+    )
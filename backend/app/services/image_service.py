@@ -0,0 +1,141 @@
+"""Image service - Resize, recompress and thumbnail uploaded images off the request path"""
+import asyncio
+import logging
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.services.storage_backends import get_storage
+
+# Image types we generate renditions for (GIFs are left as-is to keep animation)
+PROCESSABLE_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+# name -> (max width/height, fixed crop?)
+RENDITIONS = {
+    "large": (1600, False),
+    "medium": (800, False),
+    "thumb": (256, True),
+}
+WEBP_QUALITY = 80
+MAX_WORKERS = 2
+RENDER_ATTEMPTS = 2  # a failed render is retried once before giving up
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Lazily create the shared process pool
+
+    Workers are spawned, not forked: forking the threaded server would copy its
+    locks (and open connections) in whatever state other threads left them.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the process pool (called on app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def rendition_filename(filename: str, rendition: str) -> str:
+    """Filename for a rendition of an uploaded image, e.g. abc.jpg -> abc_thumb.webp"""
+    return f"{Path(filename).stem}_{rendition}.webp"
+
+
+def rendition_urls(base_url: str, filename: str) -> Dict[str, str]:
+    """URLs of every rendition, known up front so the upload response can include them"""
+    return {name: f"{base_url}/{rendition_filename(filename, name)}" for name in RENDITIONS}
+
+
+def rendition_key(key: str, rendition: str) -> str:
+    """Storage key of a rendition, stored next to the original"""
+    directory, _, filename = key.rpartition("/")
+    name = rendition_filename(filename, rendition)
+    return f"{directory}/{name}" if directory else name
+
+
+def generate_renditions(source_path: str, output_dir: str) -> Dict[str, str]:
+    """Write WebP renditions of the source image into output_dir (runs in a worker process)
+
+    EXIF orientation is applied and all metadata (EXIF/GPS/ICC) is dropped because
+    the pixels are re-encoded from scratch.
+    """
+    source = Path(source_path)
+    written = {}
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+        for name, (size, crop) in RENDITIONS.items():
+            if crop:
+                rendition = ImageOps.fit(img, (size, size), Image.LANCZOS)
+            else:
+                rendition = img.copy()
+                rendition.thumbnail((size, size), Image.LANCZOS)  # never upscales
+
+            target = Path(output_dir) / rendition_filename(source.name, name)
+            rendition.save(target, "WEBP", quality=WEBP_QUALITY, method=4)
+            written[name] = str(target)
+    return written
+
+
+def _store_renditions(key: str, written: Dict[str, str]):
+    # Renditions are published whole, never half-written
+    storage = get_storage()
+    for name, path in written.items():
+        storage.put_file(Path(path), rendition_key(key, name), "image/webp")
+
+
+async def _render_and_store(key: str):
+    """Fetch the original, render in the process pool and store the renditions
+
+    Storage I/O runs in the threadpool; the render itself is awaited, so no thread
+    is held while the worker process is busy.
+    """
+    tmp_root = Path(settings.upload_tmp_dir)
+    tmp_root.mkdir(parents=True, exist_ok=True)
+    source_file = get_storage().local_file(key)
+    source = await run_in_threadpool(source_file.__enter__)
+    try:
+        with tempfile.TemporaryDirectory(dir=tmp_root) as output_dir:
+            written = await asyncio.wrap_future(get_pool().submit(generate_renditions, str(source), output_dir))
+            await run_in_threadpool(_store_renditions, key, written)
+    finally:
+        await run_in_threadpool(source_file.__exit__, None, None, None)
+
+
+def _missing_renditions(key: str) -> bool:
+    storage = get_storage()
+    return not all(storage.exists(rendition_key(key, name)) for name in RENDITIONS)
+
+
+async def process_image(key: str):
+    """Generate renditions for a stored image unless they all exist already
+
+    Safe to schedule for every upload of the same content: a duplicate of a blob
+    first stored through /upload/document, or whose earlier render failed, gets its
+    renditions here. Failures are logged, not raised.
+    """
+    for attempt in range(1, RENDER_ATTEMPTS + 1):
+        try:
+            if await run_in_threadpool(_missing_renditions, key):
+                await _render_and_store(key)
+            return
+        except Exception:
+            logger.exception("Failed to process image %s (attempt %d of %d)", key, attempt, RENDER_ATTEMPTS)
@@ -0,0 +1,165 @@
+"""Job progress - Date progress and a per-contract payment/check-in snapshot
+
+The progress screens need the job's date range plus, for one contract, its payment
+dates, next payment, earned/pending totals, overdue schedules and check-ins.
+contract_snapshot() computes all of that in a single query: the earned total is
+the contract's running balance, every other figure is a correlated aggregate over
+payment_schedules, payment_transactions or checkins, so nothing is loaded row by
+row or sorted in Python.
+"""
+import json
+from datetime import date, datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app.models_v2.contract import Contract
+from app.models_v2.forum import ForumPost
+from app.models_v2.payment import CheckIn, ContractBalance, PaymentSchedule, PaymentStatus, PaymentTransaction
+
+DEFAULT_JOB_DAYS = 30
+RECENT_CHECKIN_COUNT = 5
+
+
+class DateProgress(NamedTuple):
+    start_date: date
+    end_date: date
+    days_elapsed: int
+    days_remaining: int
+    total_days: int
+    progress_percentage: float
+
+
+class ContractSnapshot(NamedTuple):
+    contract_id: int
+    payment_dates: List[str]          # Due dates of schedules with a transaction, ascending
+    upcoming_payment: Optional[dict]  # {"date", "amount"} of the next pending/sent transaction
+    total_earned: float               # Confirmed/recorded payments (contract balance)
+    pending_amount: float             # Pending schedules
+    overdue_payments: List[dict]      # Pending schedules past due: {"schedule_id", "amount", "due_date"}
+    recent_checkins: List[dict]       # Newest first: {"checkin_id", "check_in_date"}
+    total_checkins: int
+
+
+def job_date_range(job: ForumPost, today: date) -> Tuple[date, date]:
+    """Start/end from the job's JSON details (today + DEFAULT_JOB_DAYS if missing)"""
+    try:
+        details = json.loads(job.content) if job.content else {}
+        start, end = details.get('start_date'), details.get('end_date')
+        if start and end:
+            return datetime.strptime(start, '%Y-%m-%d').date(), datetime.strptime(end, '%Y-%m-%d').date()
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return today, today + timedelta(days=DEFAULT_JOB_DAYS)
+
+
+def date_progress(job: ForumPost, today: date) -> DateProgress:
+    start_date, end_date = job_date_range(job, today)
+    total_days = (end_date - start_date).days + 1
+    days_elapsed = max(0, (today - start_date).days)
+    return DateProgress(
+        start_date=start_date,
+        end_date=end_date,
+        days_elapsed=days_elapsed,
+        days_remaining=max(0, (end_date - today).days),
+        total_days=total_days,
+        progress_percentage=round(min(100, (days_elapsed / total_days * 100) if total_days > 0 else 0), 1),
+    )
+
+
+def _snapshot_query(today: date):
+    """Snapshot columns for the contract in the outer FROM (due dates are YYYY-MM-DD strings)"""
+    today_str = today.isoformat()
+    of_contract = PaymentSchedule.contract_id == Contract.contract_id
+    schedules_with_transaction = PaymentSchedule.__table__.join(
+        PaymentTransaction.__table__, PaymentTransaction.schedule_id == PaymentSchedule.schedule_id
+    )
+
+    def schedule_total(status: PaymentStatus):
+        return (
+            select(func.coalesce(func.sum(PaymentSchedule.amount), 0))
+            .where(of_contract, PaymentSchedule.status == status)
+            .scalar_subquery()
+        )
+
+    payment_dates = (
+        select(func.array_agg(aggregate_order_by(PaymentSchedule.due_date, PaymentSchedule.due_date)))
+        .select_from(schedules_with_transaction)
+        .where(of_contract)
+        .scalar_subquery()
+    )
+    upcoming_payment = (
+        select(func.json_build_object(
+            literal('date'), PaymentSchedule.due_date, literal('amount'), PaymentSchedule.amount
+        ))
+        .select_from(schedules_with_transaction)
+        .where(
+            of_contract,
+            PaymentSchedule.due_date >= today_str,
+            PaymentTransaction.status.in_([PaymentStatus.PENDING, PaymentStatus.SENT])
+        )
+        .order_by(PaymentSchedule.due_date)
+        .limit(1)
+        .scalar_subquery()
+    )
+    overdue_payments = (
+        select(func.json_agg(aggregate_order_by(
+            func.json_build_object(
+                literal('schedule_id'), PaymentSchedule.schedule_id,
+                literal('amount'), PaymentSchedule.amount,
+                literal('due_date'), PaymentSchedule.due_date,
+            ),
+            PaymentSchedule.due_date,
+        )))
+        .where(of_contract, PaymentSchedule.status == PaymentStatus.PENDING, PaymentSchedule.due_date < today_str)
+        .scalar_subquery()
+    )
+    # Newest check-ins: ordered array sliced to the first few
+    newest_checkins = func.array_agg(aggregate_order_by(
+        func.json_build_object(literal('checkin_id'), CheckIn.checkin_id, literal('check_in_date'), CheckIn.check_in_date),
+        CheckIn.created_at.desc(),
+    ))
+    recent_checkins = (
+        select(func.array_to_json(newest_checkins[1:RECENT_CHECKIN_COUNT]))
+        .where(CheckIn.contract_id == Contract.contract_id)
+        .scalar_subquery()
+    )
+    total_earned = func.coalesce(
+        select(ContractBalance.earned_amount)
+        .where(ContractBalance.contract_id == Contract.contract_id)
+        .scalar_subquery(),
+        0
+    )
+    total_checkins = select(func.count()).where(CheckIn.contract_id == Contract.contract_id).scalar_subquery()
+
+    return select(
+        Contract.contract_id,
+        payment_dates.label("payment_dates"),
+        upcoming_payment.label("upcoming_payment"),
+        total_earned.label("total_earned"),
+        schedule_total(PaymentStatus.PENDING).label("pending_amount"),
+        overdue_payments.label("overdue_payments"),
+        recent_checkins.label("recent_checkins"),
+        total_checkins.label("total_checkins"),
+    )
+
+
+def contract_snapshot(db: Session, today: date, *criteria) -> Optional[ContractSnapshot]:
+    """Snapshot of the first contract matching `criteria` (one query), None if there is none"""
+    row = db.execute(
+        _snapshot_query(today).where(*criteria).order_by(Contract.contract_id).limit(1)
+    ).first()
+    if row is None:
+        return None
+    return ContractSnapshot(
+        contract_id=row.contract_id,
+        payment_dates=list(row.payment_dates or []),
+        upcoming_payment=row.upcoming_payment,
+        total_earned=float(row.total_earned),
+        pending_amount=float(row.pending_amount),
+        overdue_payments=row.overdue_payments or [],
+        recent_checkins=row.recent_checkins or [],
+        total_checkins=row.total_checkins,
+    )
@@ -0,0 +1,93 @@
+"""Message search - Full-text search over the conversations a user takes part in
+
+messages.search_vector is a stored generated tsvector with a GIN index. One query
+finds, ranks and pages the matches; snippets are built with ts_headline only for
+the rows on the page.
+
+Results are ordered by (rank, message_id) descending. The cursor is the last
+row's pair, so later pages stay stable while new messages arrive.
+"""
+import html
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Float, cast, func, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models_v2.conversation import Conversation, Message
+
+SEARCH_CONFIG = "simple"  # no stemming: chats mix English and Filipino
+SNIPPET_OPTIONS = "StartSel=\x02, StopSel=\x03, MaxWords=20, MinWords=6, MaxFragments=2, FragmentDelimiter= … "
+
+
+class SearchHit(NamedTuple):
+    message_id: int
+    conversation_id: int
+    sender_id: int
+    sent_at: object
+    snippet: str
+
+
+def encode_cursor(rank: float, message_id: int) -> str:
+    return f"{rank!r}:{message_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Raises ValueError for a malformed cursor"""
+    rank, message_id = cursor.split(":")
+    return float(rank), int(message_id)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape the message text, then turn the match markers into <mark> tags"""
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+def search_messages(
+    db: Session, user_id: int, terms: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[SearchHit], Optional[str]]:
+    """Search the user's messages
+
+    Returns:
+        (hits, next_cursor) - next_cursor is None on the last page
+    """
+    query = func.websearch_to_tsquery(literal(SEARCH_CONFIG), terms)
+    rank = func.ts_rank(Message.search_vector, query).label("rank")
+
+    matches = (
+        select(Message.message_id, rank)
+        .join(Conversation, Conversation.conversation_id == Message.conversation_id)
+        .where(
+            Conversation.participant_ids.contains([user_id]),
+            Message.deleted_at.is_(None),
+            Message.search_vector.op("@@")(query),
+        )
+    )
+    if cursor is not None:
+        after_rank, after_id = decode_cursor(cursor)
+        matches = matches.where(
+            tuple_(rank, Message.message_id) < tuple_(cast(after_rank, Float(24)), after_id)
+        )
+    page = matches.order_by(rank.desc(), Message.message_id.desc()).limit(limit + 1).subquery()
+
+    # Headlines only for the page, not for every match
+    rows = db.execute(
+        select(
+            Message.message_id,
+            Message.conversation_id,
+            Message.sender_id,
+            Message.sent_at,
+            page.c.rank,
+            func.ts_headline(literal(SEARCH_CONFIG), Message.content, query, literal(SNIPPET_OPTIONS)).label("snippet"),
+        )
+        .join(page, page.c.message_id == Message.message_id)
+        .order_by(page.c.rank.desc(), Message.message_id.desc())
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    hits = [
+        SearchHit(row.message_id, row.conversation_id, row.sender_id, row.sent_at, _highlight(row.snippet))
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].rank, rows[-1].message_id) if has_more else None
+    return hits, next_cursor
@@ -0,0 +1,114 @@
+"""Notification digests - Coalesce repeated notifications into one row with a counter
+
+Notifications of the types in settings.notification_digest_types that share a
+recipient, type and reference (e.g. every application to the same job) are merged
+by the outbox relay: if the recipient already has an unread notification for the
+same thing from within their digest window, that row is updated in place
+(group_count += n, latest message, moved to the top) instead of a new row being
+written. Events in the same relay batch are merged before that. The window comes
+from the user's digest frequency preference (default
+settings.notification_digest_window_minutes); "immediate" turns merging off.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.models_v2.notification import Notification, NotificationType
+
+_notifications = Notification.__table__
+
+
+def digest_types() -> set:
+    return {NotificationType(t) for t in settings.notification_digest_types}
+
+
+def digest_message(message: str, group_count: int) -> str:
+    """Message of a digest row: the latest event plus how many more it stands for"""
+    if group_count <= 1:
+        return message
+    return f"{message} (+{group_count - 1} more)"
+
+
+def _digest_key(row: dict) -> Tuple:
+    return (row["user_id"], row["type"], row["reference_type"], row["reference_id"])
+
+
+def coalesce(conn, rows: List[dict], windows: Dict[int, int], returning) -> Tuple[List[dict], list]:
+    """Merge coalescible notification rows into digests
+
+    Args:
+        conn: Connection inside the relay's transaction
+        rows: Notification rows to deliver, oldest first
+        windows: Digest window in minutes per recipient (0 = don't merge)
+        returning: Columns to return for digests updated in place
+
+    Returns:
+        (rows still to insert, digest rows updated in place)
+    """
+    types = digest_types()
+    passthrough = []
+    groups: Dict[Tuple, dict] = {}
+    for row in rows:
+        if row["type"] not in types or row["reference_id"] is None or not windows.get(row["user_id"]):
+            passthrough.append(row)
+            continue
+        key = _digest_key(row)
+        group = groups.get(key)
+        count = group["group_count"] + 1 if group else 1
+        groups[key] = {**row, "group_count": count}  # latest event wins
+
+    if not groups:
+        return passthrough, []
+
+    # Unread digests inside the widest window, newest first - lock them so concurrent relays queue up
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(minutes=max(windows[key[0]] for key in groups))
+    existing = conn.execute(
+        select(
+            _notifications.c.notification_id,
+            _notifications.c.user_id,
+            _notifications.c.type,
+            _notifications.c.reference_type,
+            _notifications.c.reference_id,
+            _notifications.c.group_count,
+            _notifications.c.created_at,
+        )
+        .where(
+            _notifications.c.is_read == False,
+            _notifications.c.type.in_(list({key[1] for key in groups})),
+            _notifications.c.user_id.in_(list({key[0] for key in groups})),
+            _notifications.c.created_at >= since,
+        )
+        .order_by(_notifications.c.created_at.desc())
+        .with_for_update()
+    ).all()
+
+    targets = {}
+    for digest in existing:
+        key = (digest.user_id, digest.type, digest.reference_type, digest.reference_id)
+        if key in groups and key not in targets:
+            if digest.created_at >= now - timedelta(minutes=windows[digest.user_id]):
+                targets[key] = digest
+
+    updated = []
+    for key, group in groups.items():
+        digest = targets.get(key)
+        if digest is None:
+            passthrough.append({**group, "message": digest_message(group["message"], group["group_count"])})
+            continue
+        group_count = digest.group_count + group["group_count"]
+        updated.append(conn.execute(
+            update(_notifications)
+            .where(_notifications.c.notification_id == digest.notification_id)
+            .values(
+                title=group["title"],
+                message=digest_message(group["message"], group_count),
+                group_count=group_count,
+                created_at=group["created_at"],
+            )
+            .returning(*returning)
+        ).one())
+
+    return passthrough, updated
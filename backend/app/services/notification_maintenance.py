@@ -0,0 +1,120 @@
+"""Notification maintenance - Retention, archival and unread counter reconciliation
+
+Read notifications older than settings.notification_retention_days are moved to
+notifications_archive (or deleted outright with notification_retention_action =
+"delete"). Each batch is its own short transaction and claims rows with
+FOR UPDATE SKIP LOCKED, so the job never holds long locks and several API workers
+can run it at once. Unread notifications are never touched.
+
+The per-user unread counters are then reconciled against the notifications table,
+which repairs any drift from requests that failed half-way.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import transactional_connection
+
+MAX_BATCHES_PER_RUN = 100
+RECONCILE_LOCK_ID = 4036  # pg advisory lock key for counter reconciliation
+
+_ARCHIVE_BATCH = text("""
+    WITH expired AS (
+        SELECT notification_id FROM notifications
+        WHERE is_read = TRUE AND created_at < :cutoff
+        ORDER BY notification_id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        DELETE FROM notifications n
+        USING expired e
+        WHERE n.notification_id = e.notification_id
+        RETURNING n.notification_id, n.user_id, n.type, n.title, n.message,
+                  n.reference_type, n.reference_id, n.group_count, n.read_at, n.created_at
+    ), archived AS (
+        INSERT INTO notifications_archive
+            (notification_id, user_id, type, title, message, reference_type, reference_id, group_count, read_at, created_at)
+        SELECT * FROM moved
+        ON CONFLICT (notification_id) DO NOTHING
+    )
+    SELECT COUNT(*) FROM moved
+""")
+
+_DELETE_BATCH = text("""
+    DELETE FROM notifications
+    WHERE notification_id IN (
+        SELECT notification_id FROM notifications
+        WHERE is_read = TRUE AND created_at < :cutoff
+        ORDER BY notification_id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+_RECONCILE_COUNTERS = (
+    text("""
+        INSERT INTO notification_counters (user_id, unread_count)
+        SELECT user_id, COUNT(*) FROM notifications WHERE is_read = FALSE GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET unread_count = EXCLUDED.unread_count,
+            updated_at = NOW()
+        WHERE notification_counters.unread_count <> EXCLUDED.unread_count
+    """),
+    text("""
+        UPDATE notification_counters c
+        SET unread_count = 0,
+            updated_at = NOW()
+        WHERE c.unread_count <> 0
+          AND NOT EXISTS (
+              SELECT 1 FROM notifications n WHERE n.user_id = c.user_id AND n.is_read = FALSE
+          )
+    """),
+)
+
+
+def expire_read_notifications(retention_days: int = None, batch_size: int = None) -> int:
+    """Archive (or delete) expired read notifications in batches
+
+    Returns:
+        Number of notifications removed from the notifications table
+    """
+    retention_days = retention_days or settings.notification_retention_days
+    batch_size = batch_size or settings.notification_maintenance_batch_size
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    archive = settings.notification_retention_action != "delete"
+
+    removed = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        params = {"cutoff": cutoff, "batch_size": batch_size}
+        with transactional_connection() as conn, conn.begin():
+            if archive:
+                count = conn.execute(_ARCHIVE_BATCH, params).scalar()
+            else:
+                count = conn.execute(_DELETE_BATCH, params).rowcount
+        removed += count
+        if count < batch_size:
+            break
+    return removed
+
+
+def reconcile_unread_counters() -> int:
+    """Recompute every user's unread counter from the notifications table
+
+    Returns:
+        Number of counters corrected (0 if another worker is already reconciling)
+    """
+    with transactional_connection() as conn, conn.begin():
+        locked = conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": RECONCILE_LOCK_ID}).scalar()
+        if not locked:
+            return 0
+        return sum(conn.execute(statement).rowcount for statement in _RECONCILE_COUNTERS)
+
+
+def run_notification_maintenance() -> dict:
+    """One full maintenance pass (scheduled on app startup)"""
+    removed = expire_read_notifications()
+    corrected = reconcile_unread_counters()
+    if not removed and not corrected:
+        return {}
+    return {"expired": removed, "counters_corrected": corrected}
@@ -0,0 +1,229 @@
+"""Notification outbox relay - Delivers queued notifications in batches
+
+notify_user() only writes a row to notification_outbox inside the caller's
+transaction. This relay runs in the background, claims a batch of outbox rows
+(FOR UPDATE SKIP LOCKED, so several API workers can run it side by side), inserts
+them into notifications with one multi-row INSERT and deletes them from the outbox,
+all in a single transaction. If delivery fails the rows stay in the outbox and are
+retried, so nothing is lost; a row that fails MAX_DELIVERY_ATTEMPTS times is left
+there dead-lettered (attempts and last_error set) and logged as an error. Repeated notifications are merged into digest rows
+on the way (see app.services.notification_digest). Each delivered batch is sent
+to the live notification streams of every API process with one NOTIFY statement
+in the same transaction, and queued for Web Push, except for users who are in
+their quiet hours.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select, update
+
+from app.config import settings
+from app.db import transactional_connection
+from app.models_v2.notification import Notification, NotificationOutbox
+from app.services.notification_digest import coalesce
+from app.services.notification_preferences import digest_window_minutes, get_preferences_many, in_quiet_hours
+from app.services.notification_service import increment_unread_counts
+from app.services.notification_stream import notify_streams
+from app.services.web_push import enqueue_pushes, web_push_enabled
+
+logger = logging.getLogger(__name__)
+
+MAX_DELIVERY_ATTEMPTS = 5
+
+_outbox = NotificationOutbox.__table__
+_notifications = Notification.__table__
+_delivered_columns = (
+    _notifications.c.notification_id,
+    _notifications.c.user_id,
+    _notifications.c.type,
+    _notifications.c.title,
+    _notifications.c.message,
+    _notifications.c.reference_type,
+    _notifications.c.reference_id,
+    _notifications.c.is_read,
+    _notifications.c.group_count,
+    _notifications.c.created_at,
+)
+_relay_task: Optional[asyncio.Task] = None
+
+
+def _to_notification_rows(rows) -> List[dict]:
+    return [
+        {
+            "user_id": row.user_id,
+            "type": row.type,
+            "title": row.title,
+            "message": row.message,
+            "reference_type": row.reference_type,
+            "reference_id": row.reference_id,
+            "is_read": False,
+            "group_count": 1,
+            "created_at": row.created_at,  # keep the time of the original event
+        }
+        for row in sorted(rows, key=lambda r: r.outbox_id)
+    ]
+
+
+def _serialize(row) -> dict:
+    """A delivered notification in the shape of NotificationResponse (plus user_id)"""
+    return {
+        "notification_id": row.notification_id,
+        "user_id": row.user_id,
+        "type": row.type.value,
+        "title": row.title,
+        "message": row.message,
+        "reference_type": row.reference_type,
+        "reference_id": row.reference_id,
+        "is_read": row.is_read,
+        "group_count": row.group_count,
+        "created_at": row.created_at.isoformat() if row.created_at else "",
+    }
+
+
+def _insert_notifications(conn, rows) -> List[dict]:
+    """Deliver outbox rows: merge digests, insert the rest with one multi-row INSERT,
+    bump the unread counters and queue Web Push and live stream events
+
+    Returns:
+        The notifications sent to live streams
+    """
+    prefs = get_preferences_many(conn, (row.user_id for row in rows))
+    windows = {user_id: digest_window_minutes(p) for user_id, p in prefs.items()}
+
+    to_insert, merged = coalesce(conn, _to_notification_rows(rows), windows, _delivered_columns)
+    inserted = []
+    if to_insert:
+        inserted = conn.execute(insert(_notifications).returning(*_delivered_columns), to_insert).all()
+    # Merged digests were already unread, so only new rows count
+    increment_unread_counts(conn, Counter(row.user_id for row in inserted))
+
+    quiet = {user_id for user_id, p in prefs.items() if in_quiet_hours(p)}
+    to_push = [_serialize(row) for row in inserted + merged if row.user_id not in quiet]
+    if web_push_enabled():
+        enqueue_pushes(conn, to_push)
+    notify_streams(conn, to_push)
+    return to_push
+
+
+def _claim_query(batch_size: int):
+    return (
+        select(_outbox.c.outbox_id)
+        .where(_outbox.c.attempts < MAX_DELIVERY_ATTEMPTS)
+        .order_by(_outbox.c.outbox_id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def relay_batch(batch_size: int = None) -> Tuple[int, List[dict]]:
+    """Deliver one batch of outbox rows
+
+    Returns:
+        (number of outbox rows delivered, notifications to push to live streams)
+    """
+    batch_size = batch_size or settings.notification_outbox_batch_size
+    try:
+        with transactional_connection() as conn:
+            with conn.begin():
+                claimed = conn.execute(
+                    delete(_outbox)
+                    .where(_outbox.c.outbox_id.in_(_claim_query(batch_size).scalar_subquery()))
+                    .returning(*_outbox.c)
+                ).all()
+                if not claimed:
+                    return 0, []
+                return len(claimed), _insert_notifications(conn, claimed)
+    except Exception:
+        logger.exception("Notification outbox batch failed, retrying rows one by one")
+        return _relay_individually(batch_size)
+
+
+def _relay_individually(batch_size: int) -> Tuple[int, List[dict]]:
+    """Fallback after a failed batch: deliver rows one at a time, recording failures
+
+    Each row is locked (FOR UPDATE SKIP LOCKED), delivered and deleted in its own
+    transaction, so a row is only ever handled by one relay. Delivery runs in a
+    savepoint; if it fails, the failed attempt is recorded in the same transaction.
+    """
+    delivered = 0
+    to_push = []
+    with transactional_connection() as conn:
+        outbox_ids = conn.execute(
+            select(_outbox.c.outbox_id)
+            .where(_outbox.c.attempts < MAX_DELIVERY_ATTEMPTS)
+            .order_by(_outbox.c.outbox_id)
+            .limit(batch_size)
+        ).scalars().all()
+
+    for outbox_id in outbox_ids:
+        with transactional_connection() as conn, conn.begin():
+            row = conn.execute(
+                select(*_outbox.c)
+                .where(_outbox.c.outbox_id == outbox_id, _outbox.c.attempts < MAX_DELIVERY_ATTEMPTS)
+                .with_for_update(skip_locked=True)
+            ).first()
+            if row is None:
+                continue  # delivered or claimed by another relay in the meantime
+            try:
+                with conn.begin_nested():
+                    pushed = _insert_notifications(conn, [row])
+                    conn.execute(delete(_outbox).where(_outbox.c.outbox_id == outbox_id))
+            except Exception as e:
+                _record_failure(conn, row, e)
+                continue
+        to_push.extend(pushed)
+        delivered += 1
+    return delivered, to_push
+
+
+def _record_failure(conn, row, error: Exception):
+    """Count a failed delivery; a row that runs out of attempts is dead-lettered
+    (kept in the outbox, never claimed again) and reported"""
+    attempts = row.attempts + 1
+    conn.execute(
+        update(_outbox)
+        .where(_outbox.c.outbox_id == row.outbox_id)
+        .values(attempts=attempts, last_error=str(error)[:1000])
+    )
+    if attempts >= MAX_DELIVERY_ATTEMPTS:
+        logger.error(
+            "Outbox notification %s for user %s dead-lettered after %d attempts: %s",
+            row.outbox_id, row.user_id, attempts, error
+        )
+    else:
+        logger.warning("Could not deliver outbox notification %s: %s", row.outbox_id, error)
+
+
+async def run_outbox_relay():
+    """Background loop: drain the outbox, then sleep until the next poll"""
+    batch_size = settings.notification_outbox_batch_size
+    while True:
+        try:
+            delivered, _ = await run_in_threadpool(relay_batch, batch_size)
+        except Exception:
+            logger.exception("Notification outbox relay error")
+            delivered = 0
+        if delivered < batch_size:
+            await asyncio.sleep(settings.notification_outbox_interval)
+
+
+def start_outbox_relay():
+    """Start the relay task (called on app startup)"""
+    global _relay_task
+    if settings.notification_outbox_enabled and _relay_task is None:
+        _relay_task = asyncio.create_task(run_outbox_relay())
+
+
+async def stop_outbox_relay():
+    """Stop the relay task (called on app shutdown)"""
+    global _relay_task
+    if _relay_task is not None:
+        _relay_task.cancel()
+        try:
+            await _relay_task
+        except asyncio.CancelledError:
+            pass
+        _relay_task = None
@@ -0,0 +1,111 @@
+"""Notification preferences - Per-user opt-outs, quiet hours and digest frequency
+
+Preferences are checked on every notify_* call, so lookups go through a small
+per-process cache (PREFERENCE_CACHE_TTL seconds). Looking up many users at once
+(notify_many, the outbox relay) costs at most one query for the users that aren't
+cached. Saving preferences invalidates this process's entry; other workers pick the
+change up when theirs expires.
+
+- Muted types are never written.
+- Quiet hours only hold back live/push delivery; the notification is still listed.
+- Digest frequency sets how long repeated notifications are merged into one digest.
+"""
+from datetime import datetime, time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+
+from app.cache import TTLCache
+from app.config import settings
+from app.models_v2.notification import DigestFrequency, NotificationPreference, NotificationType
+
+PREFERENCE_CACHE_TTL = 60  # seconds
+PREFERENCE_CACHE_SIZE = 10000
+
+# Always delivered, whatever the user muted
+MANDATORY_TYPES = {NotificationType.SYSTEM}
+
+DIGEST_WINDOWS = {
+    DigestFrequency.IMMEDIATE: 0,
+    DigestFrequency.HOURLY: 60,
+    DigestFrequency.DAILY: 24 * 60,
+}
+
+_preferences = NotificationPreference.__table__
+
+
+class Preferences(NamedTuple):
+    muted_types: FrozenSet[str] = frozenset()
+    quiet_hours_start: Optional[time] = None
+    quiet_hours_end: Optional[time] = None
+    digest_frequency: Optional[DigestFrequency] = None  # None = server default
+
+
+DEFAULT_PREFERENCES = Preferences()
+
+_cache = TTLCache(maxsize=PREFERENCE_CACHE_SIZE, ttl=PREFERENCE_CACHE_TTL)
+
+
+def invalidate_preferences(user_id: int):
+    """Drop a user's cached preferences (call after saving them)"""
+    _cache.invalidate(user_id)
+
+
+def _from_row(row) -> Preferences:
+    return Preferences(
+        muted_types=frozenset(row.muted_types or ()),
+        quiet_hours_start=row.quiet_hours_start,
+        quiet_hours_end=row.quiet_hours_end,
+        digest_frequency=DigestFrequency(row.digest_frequency) if row.digest_frequency else None,
+    )
+
+
+def get_preferences_many(conn, user_ids: Iterable[int]) -> Dict[int, Preferences]:
+    """Preferences of several users with at most one query (Session or Connection)"""
+    result, missing = _cache.get_many(user_ids)
+    if missing:
+        rows = conn.execute(select(_preferences).where(_preferences.c.user_id.in_(missing))).all()
+        found = {row.user_id: _from_row(row) for row in rows}
+        for user_id in missing:
+            prefs = found.get(user_id, DEFAULT_PREFERENCES)
+            _cache.set(user_id, prefs)
+            result[user_id] = prefs
+    return result
+
+
+def get_preferences(conn, user_id: int) -> Preferences:
+    return get_preferences_many(conn, [user_id])[user_id]
+
+
+def allows(prefs: Preferences, notification_type: NotificationType) -> bool:
+    """Whether the user wants notifications of this type at all"""
+    return notification_type in MANDATORY_TYPES or notification_type.value not in prefs.muted_types
+
+
+def in_quiet_hours(prefs: Preferences, now: datetime = None) -> bool:
+    """Whether it is currently inside the user's quiet hours (may span midnight)"""
+    start, end = prefs.quiet_hours_start, prefs.quiet_hours_end
+    if start is None or end is None or start == end:
+        return False
+    now = now or datetime.now(ZoneInfo(settings.notification_timezone))
+    current = now.time().replace(tzinfo=None)
+    if start < end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def digest_window_minutes(prefs: Preferences) -> int:
+    """How long repeated notifications are merged into one digest for this user"""
+    if prefs.digest_frequency is None:
+        return settings.notification_digest_window_minutes
+    return DIGEST_WINDOWS[prefs.digest_frequency]
+
+
+def filter_recipients(conn, user_ids: Iterable[int], notification_type: NotificationType) -> List[int]:
+    """The users (in order, without duplicates) who want this type of notification"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if notification_type in MANDATORY_TYPES:
+        return user_ids
+    prefs = get_preferences_many(conn, user_ids)
+    return [user_id for user_id in user_ids if allows(prefs[user_id], notification_type)]
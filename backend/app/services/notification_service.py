@@ -1,6 +1,17 @@
-"""Notification service - Helper functions to create notifications from other modules"""
+"""Notification service - Helper functions to create notifications from other modules
+
+Notifications are written to the notification_outbox table as part of the caller's
+transaction (pass commit=False and let the router's own commit persist them together
+with the state change). The outbox relay in app.services.notification_outbox moves
+them into the notifications table in batches. Users' notification preferences are
+checked first: notifications of a type the user muted are not written at all.
+"""
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from app.models_v2.notification import Notification, NotificationType
+from app.models_v2.notification import NotificationCounter, NotificationOutbox, NotificationType
+from app.services.notification_preferences import filter_recipients
 
 
 def notify_user(
@@ -12,9 +23,9 @@ def notify_user(
     reference_type: str = None,
     reference_id: int = None,
     commit: bool = True
-) -> Notification:
+) -> Optional[NotificationOutbox]:
     """
-    Create and store a notification for a user.
+    Queue a notification for a user through the transactional outbox.
     
     Args:
         db: Database session
@@ -24,33 +35,131 @@ def notify_user(
         message: Detailed message
         reference_type: Optional - type of related entity ('job', 'direct_hire', etc.)
         reference_id: Optional - ID of the related entity
+        commit: Whether to commit immediately (default True). Pass False to write the
+            notification in the same transaction as the caller's changes.
+    
+    Returns:
+        The queued NotificationOutbox entry, or None if the user muted this type
+    """
+    entry = None
+    if filter_recipients(db, [user_id], notification_type):
+        entry = NotificationOutbox(
+            user_id=user_id,
+            type=notification_type,
+            title=title,
+            message=message,
+            reference_type=reference_type,
+            reference_id=reference_id
+        )
+        db.add(entry)
+    
+    # Commit even when nothing was queued - callers may rely on it for their own changes
+    if commit:
+        db.commit()
+    
+    return entry
+
+
+def notify_many(
+    db: Session,
+    user_ids: Iterable[int],
+    notification_type: NotificationType,
+    title: str,
+    message: str,
+    reference_type: str = None,
+    reference_id: int = None,
+    params: Optional[Dict[int, dict]] = None,
+    commit: bool = True
+) -> int:
+    """
+    Queue one notification for each of several users with a single multi-row INSERT.
+    
+    Args:
+        db: Database session
+        user_ids: The users to notify (duplicates are notified once, users who muted
+            this type are skipped)
+        notification_type: Type of notification (from NotificationType enum)
+        title: Short title, may contain {placeholders} filled from params
+        message: Detailed message, may contain {placeholders} filled from params
+        reference_type: Optional - type of related entity ('job', 'direct_hire', etc.)
+        reference_id: Optional - ID of the related entity
+        params: Optional - per-user values for the title/message placeholders
         commit: Whether to commit immediately (default True)
     
     Returns:
-        The created Notification object
+        Number of notifications queued
     """
-    notification = Notification(
-        user_id=user_id,
-        type=notification_type,
-        title=title,
-        message=message,
-        reference_type=reference_type,
-        reference_id=reference_id
-    )
-    db.add(notification)
+    rows = []
+    for user_id in filter_recipients(db, user_ids, notification_type):
+        values = params.get(user_id) if params else None
+        rows.append({
+            "user_id": user_id,
+            "type": notification_type,
+            "title": title.format(**values) if values else title,
+            "message": message.format(**values) if values else message,
+            "reference_type": reference_type,
+            "reference_id": reference_id,
+        })
+    
+    if rows:
+        db.execute(insert(NotificationOutbox), rows)
     
     if commit:
         db.commit()
-        db.refresh(notification)
     
-    return notification
+    return len(rows)
+
+
+# ============== UNREAD COUNTERS ==============
+
+_counters = NotificationCounter.__table__
+
+
+def increment_unread_counts(conn, counts: Dict[int, int]) -> None:
+    """Add newly delivered notifications to their users' unread counters (one statement)
+
+    Works with a Session or a Connection. Rows are written in user_id order so
+    concurrent relays can't deadlock on each other.
+    """
+    if not counts:
+        return
+    stmt = pg_insert(_counters).values([
+        {"user_id": user_id, "unread_count": counts[user_id]}
+        for user_id in sorted(counts)
+    ])
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[_counters.c.user_id],
+        set_={
+            "unread_count": _counters.c.unread_count + stmt.excluded.unread_count,
+            "updated_at": func.now(),
+        }
+    ))
+
+
+def decrement_unread_count(db: Session, user_id: int, amount: int = 1) -> None:
+    """Take notifications that were read or deleted off a user's unread counter"""
+    if amount <= 0:
+        return
+    db.execute(
+        update(_counters)
+        .where(_counters.c.user_id == user_id)
+        .values(unread_count=func.greatest(_counters.c.unread_count - amount, 0), updated_at=func.now())
+    )
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """A user's unread notification count, without scanning notifications"""
+    count = db.query(NotificationCounter.unread_count).filter(
+        NotificationCounter.user_id == user_id
+    ).scalar()
+    return count or 0
 
 
 # ============== CONVENIENCE FUNCTIONS ==============
 
 # Flow 1: Job/Contract Notifications
 
-def notify_job_application(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int):
+def notify_job_application(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int, commit: bool = True):
     """Notify employer when a worker applies to their job"""
     return notify_user(
         db=db,
@@ -59,24 +168,31 @@ def notify_job_application(db: Session, employer_user_id: int, worker_name: str,
         title="New Job Application",
         message=f"{worker_name} applied to your job: {job_title}",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_application_accepted(db: Session, worker_user_id: int, job_title: str, post_id: int):
+def notify_application_accepted(db: Session, worker_user_id: int, job_title: str, post_id: int, commit: bool = True):
     """Notify worker when their application is accepted"""
-    return notify_user(
+    return notify_applications_accepted(db, [worker_user_id], job_title, post_id, commit=commit)
+
+
+def notify_applications_accepted(db: Session, worker_user_ids: Iterable[int], job_title: str, post_id: int, commit: bool = True):
+    """Notify every worker accepted for a job at once"""
+    return notify_many(
         db=db,
-        user_id=worker_user_id,
+        user_ids=worker_user_ids,
         notification_type=NotificationType.APPLICATION_ACCEPTED,
         title="Application Accepted! 🎉",
         message=f"Your application for '{job_title}' has been accepted!",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_application_rejected(db: Session, worker_user_id: int, job_title: str, post_id: int):
+def notify_application_rejected(db: Session, worker_user_id: int, job_title: str, post_id: int, commit: bool = True):
     """Notify worker when their application is rejected"""
     return notify_user(
         db=db,
@@ -85,11 +201,12 @@ def notify_application_rejected(db: Session, worker_user_id: int, job_title: str
         title="Application Update",
         message=f"Your application for '{job_title}' was not selected.",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_completion_submitted(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int):
+def notify_completion_submitted(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int, commit: bool = True):
     """Notify employer when a worker submits completion proof"""
     return notify_user(
         db=db,
@@ -98,24 +215,31 @@ def notify_completion_submitted(db: Session, employer_user_id: int, worker_name:
         title="Completion Proof Submitted 📋",
         message=f"{worker_name} has submitted completion proof for '{job_title}'. Please review.",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_completion_approved(db: Session, worker_user_id: int, job_title: str, post_id: int):
+def notify_completion_approved(db: Session, worker_user_id: int, job_title: str, post_id: int, commit: bool = True):
     """Notify worker when their completion is approved"""
-    return notify_user(
+    return notify_completions_approved(db, [worker_user_id], job_title, post_id, commit=commit)
+
+
+def notify_completions_approved(db: Session, worker_user_ids: Iterable[int], job_title: str, post_id: int, commit: bool = True):
+    """Notify every worker whose completion was approved at once"""
+    return notify_many(
         db=db,
-        user_id=worker_user_id,
+        user_ids=worker_user_ids,
         notification_type=NotificationType.COMPLETION_APPROVED,
         title="Work Approved! ✅",
         message=f"Your work on '{job_title}' has been approved!",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_payment_sent(db: Session, worker_user_id: int, job_title: str, amount: float, post_id: int):
+def notify_payment_sent(db: Session, worker_user_id: int, job_title: str, amount: float, post_id: int, commit: bool = True):
     """Notify worker when employer sends payment"""
     return notify_user(
         db=db,
@@ -124,11 +248,12 @@ def notify_payment_sent(db: Session, worker_user_id: int, job_title: str, amount
         title="Payment Sent! 💰",
         message=f"Payment of ₱{amount:,.2f} for '{job_title}' has been sent.",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_payment_received(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int):
+def notify_payment_received(db: Session, employer_user_id: int, worker_name: str, job_title: str, post_id: int, commit: bool = True):
     """Notify employer when worker confirms payment"""
     return notify_user(
         db=db,
@@ -137,11 +262,12 @@ def notify_payment_received(db: Session, employer_user_id: int, worker_name: str
         title="Payment Confirmed ✓",
         message=f"{worker_name} confirmed payment for '{job_title}'.",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
-def notify_payment_due(db: Session, employer_user_id: int, worker_name: str, job_title: str, amount: float, post_id: int):
+def notify_payment_due(db: Session, employer_user_id: int, worker_name: str, job_title: str, amount: float, post_id: int, commit: bool = True):
     """Notify employer about upcoming payment due"""
     return notify_user(
         db=db,
@@ -150,13 +276,14 @@ def notify_payment_due(db: Session, employer_user_id: int, worker_name: str, job
         title="Payment Due Soon 📅",
         message=f"Payment of ₱{amount:,.2f} to {worker_name} for '{job_title}' is due.",
         reference_type="job",
-        reference_id=post_id
+        reference_id=post_id,
+        commit=commit
     )
 
 
 # Flow 2: Direct Hire Notifications
 
-def notify_direct_hire_request(db: Session, worker_user_id: int, employer_name: str, hire_id: int):
+def notify_direct_hire_request(db: Session, worker_user_id: int, employer_name: str, hire_id: int, commit: bool = True):
     """Notify worker of new direct hire request"""
     return notify_user(
         db=db,
@@ -165,11 +292,12 @@ def notify_direct_hire_request(db: Session, worker_user_id: int, employer_name:
         title="New Booking Request! 📬",
         message=f"{employer_name} wants to book your services.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_accepted(db: Session, employer_user_id: int, worker_name: str, hire_id: int):
+def notify_direct_hire_accepted(db: Session, employer_user_id: int, worker_name: str, hire_id: int, commit: bool = True):
     """Notify employer when worker accepts hire"""
     return notify_user(
         db=db,
@@ -178,11 +306,12 @@ def notify_direct_hire_accepted(db: Session, employer_user_id: int, worker_name:
         title="Booking Accepted! ✅",
         message=f"{worker_name} accepted your booking request.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_rejected(db: Session, employer_user_id: int, worker_name: str, hire_id: int):
+def notify_direct_hire_rejected(db: Session, employer_user_id: int, worker_name: str, hire_id: int, commit: bool = True):
     """Notify employer when worker rejects hire"""
     return notify_user(
         db=db,
@@ -191,11 +320,12 @@ def notify_direct_hire_rejected(db: Session, employer_user_id: int, worker_name:
         title="Booking Declined",
         message=f"{worker_name} declined your booking request.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_started(db: Session, employer_user_id: int, worker_name: str, hire_id: int):
+def notify_direct_hire_started(db: Session, employer_user_id: int, worker_name: str, hire_id: int, commit: bool = True):
     """Notify employer when worker starts the job"""
     return notify_user(
         db=db,
@@ -204,11 +334,12 @@ def notify_direct_hire_started(db: Session, employer_user_id: int, worker_name:
         title="Work Started! 🔄",
         message=f"{worker_name} has started working on your booking.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_completed(db: Session, employer_user_id: int, worker_name: str, hire_id: int):
+def notify_direct_hire_completed(db: Session, employer_user_id: int, worker_name: str, hire_id: int, commit: bool = True):
     """Notify employer when worker submits completion"""
     return notify_user(
         db=db,
@@ -217,11 +348,12 @@ def notify_direct_hire_completed(db: Session, employer_user_id: int, worker_name
         title="Work Completed! 📋",
         message=f"{worker_name} has completed the job and submitted proof. Please review.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_approved(db: Session, worker_user_id: int, employer_name: str, hire_id: int):
+def notify_direct_hire_approved(db: Session, worker_user_id: int, employer_name: str, hire_id: int, commit: bool = True):
     """Notify worker when employer approves completion"""
     return notify_user(
         db=db,
@@ -230,11 +362,12 @@ def notify_direct_hire_approved(db: Session, worker_user_id: int, employer_name:
         title="Work Approved! ✅",
         message=f"{employer_name} approved your completed work.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
 
 
-def notify_direct_hire_paid(db: Session, worker_user_id: int, employer_name: str, amount: float, hire_id: int):
+def notify_direct_hire_paid(db: Session, worker_user_id: int, employer_name: str, amount: float, hire_id: int, commit: bool = True):
     """Notify worker when payment is confirmed"""
     return notify_user(
         db=db,
@@ -243,5 +376,6 @@ def notify_direct_hire_paid(db: Session, worker_user_id: int, employer_name: str
         title="Payment Received! 💰",
         message=f"Payment of ₱{amount:,.2f} from {employer_name} has been confirmed.",
         reference_type="direct_hire",
-        reference_id=hire_id
+        reference_id=hire_id,
+        commit=commit
     )
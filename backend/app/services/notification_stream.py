@@ -0,0 +1,186 @@
+"""Notification stream - Pushes newly delivered notifications to connected clients
+
+Each API process keeps the live subscriptions of its own clients: one bounded
+asyncio.Queue per open /notifications/stream connection. Delivered notifications
+reach every process through Postgres NOTIFY:
+
+- the outbox relay calls notify_streams() inside its delivery transaction, so the
+  event is only sent if the notifications are committed
+- every process runs a listener (start_listener) that LISTENs on STREAM_CHANNEL
+  and hands each payload to publish_many() for its own subscribers
+
+LISTEN needs a session-level connection, which pgbouncer in transaction mode
+doesn't provide, so the listener connects to settings.notification_listen_url
+(a direct or session-pooled URL) when it is set. A client whose queue is full,
+or that was connected while the listener was reconnecting, just misses live
+events; it still gets everything from GET /notifications.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM_QUEUE_SIZE = 100
+STREAM_CHANNEL = "notification_stream"
+MAX_PAYLOAD_BYTES = 7900  # Postgres NOTIFY payloads must stay under 8000 bytes
+LISTENER_RETRY_SECONDS = 5
+
+_subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+
+@asynccontextmanager
+async def subscribe(user_id: int) -> AsyncIterator[asyncio.Queue]:
+    """Register a live stream for a user for the duration of the block"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    _subscribers[user_id].add(queue)
+    try:
+        yield queue
+    finally:
+        queues = _subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del _subscribers[user_id]
+
+
+def publish_many(notifications: Iterable[dict]) -> int:
+    """Fan a batch of notifications out to every connected stream of their recipients
+
+    Must be called from the event loop thread (the listener does).
+
+    Returns:
+        Number of events queued
+    """
+    queued = 0
+    for notification in notifications:
+        for queue in _subscribers.get(notification["user_id"], ()):
+            try:
+                queue.put_nowait(notification)
+                queued += 1
+            except asyncio.QueueFull:
+                pass  # Slow client - it can catch up from GET /notifications
+    return queued
+
+
+# ============== CROSS-PROCESS FAN-OUT ==============
+
+_NOTIFY = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+).bindparams(bindparam("payloads", type_=ARRAY(String)))
+
+_listener_task: Optional[asyncio.Task] = None
+
+
+def _payloads(notifications: List[dict]) -> List[str]:
+    """JSON arrays of notifications, each small enough for one NOTIFY"""
+    payloads, chunk, size = [], [], 2  # 2 = the brackets
+    for notification in notifications:
+        encoded = json.dumps(notification, separators=(",", ":"))
+        length = len(encoded.encode()) + 1  # plus a comma
+        if length + 2 > MAX_PAYLOAD_BYTES:
+            continue  # Too large to stream; the client gets it from GET /notifications
+        if chunk and size + length > MAX_PAYLOAD_BYTES:
+            payloads.append("[" + ",".join(chunk) + "]")
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += length
+    if chunk:
+        payloads.append("[" + ",".join(chunk) + "]")
+    return payloads
+
+
+def notify_streams(conn, notifications: List[dict]):
+    """Send delivered notifications to the live streams of every API process
+
+    One statement per batch; call inside the delivery transaction so the event is
+    only sent if it commits.
+    """
+    payloads = _payloads(notifications)
+    if payloads:
+        conn.execute(_NOTIFY, {"channel": STREAM_CHANNEL, "payloads": payloads})
+
+
+def _listen_dsn() -> str:
+    url = make_url(settings.notification_listen_url or settings.database_url)
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _connect_listener():
+    import psycopg2
+    import psycopg2.extensions
+
+    conn = psycopg2.connect(_listen_dsn(), connect_timeout=10)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cursor:
+        cursor.execute(f"LISTEN {STREAM_CHANNEL}")
+    return conn
+
+
+async def _listen_once():
+    """LISTEN on one connection until it fails"""
+    loop = asyncio.get_running_loop()
+    conn = await run_in_threadpool(_connect_listener)
+    failed = loop.create_future()
+
+    def on_readable():
+        try:
+            conn.poll()
+        except Exception as e:
+            if not failed.done():
+                failed.set_exception(e)
+            return
+        while conn.notifies:
+            event = conn.notifies.pop(0)
+            try:
+                publish_many(json.loads(event.payload))
+            except ValueError:
+                pass
+
+    loop.add_reader(conn.fileno(), on_readable)
+    try:
+        await failed
+    finally:
+        loop.remove_reader(conn.fileno())
+        conn.close()
+
+
+async def run_listener():
+    """Background loop: keep a LISTEN connection open, reconnecting after failures"""
+    while True:
+        try:
+            await _listen_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Notification stream listener error, reconnecting")
+        await asyncio.sleep(LISTENER_RETRY_SECONDS)
+
+
+def start_listener():
+    """Start this process's listener (called on app startup)"""
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.create_task(run_listener())
+
+
+async def stop_listener():
+    """Stop the listener (called on app shutdown)"""
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
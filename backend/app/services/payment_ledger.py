@@ -0,0 +1,168 @@
+"""Payment ledger - Append-only payment movements with running balances
+
+Every change in where a payment stands appends one payment_ledger row and applies
+the same change to that contract's and worker's balance rows:
+
+    entry       awaiting   earned
+    sent          +amount
+    confirmed     -amount  +amount
+    disputed      -amount
+    recorded               +amount   (short-term payment recorded as completed)
+
+Earnings summaries read the balance rows (one primary-key lookup). The ledger is
+the source of truth: reconcile_payment_balances() recomputes every balance from it
+(scheduled), so a request that failed between the two writes is repaired.
+
+A transaction is earned at most once: a unique index on payment_ledger allows one
+confirmed/recorded entry per transaction, and a duplicate is dropped together with
+its balance change. Callers still only append after a conditional status UPDATE.
+"""
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import transactional_connection
+from app.models_v2.contract import Contract
+from app.models_v2.payment import ContractBalance, LedgerEntryType, PaymentLedgerEntry, WorkerBalance
+
+RECONCILE_LOCK_ID = 4049  # pg advisory lock key for balance reconciliation
+
+# (awaiting, earned) multipliers per entry type
+EFFECTS: Dict[LedgerEntryType, Tuple[int, int]] = {
+    LedgerEntryType.SENT: (1, 0),
+    LedgerEntryType.CONFIRMED: (-1, 1),
+    LedgerEntryType.DISPUTED: (-1, 0),
+    LedgerEntryType.RECORDED: (0, 1),
+}
+
+_ledger = PaymentLedgerEntry.__table__
+
+
+def _effect_sum(position: int):
+    """SUM over ledger rows of their awaiting (0) or earned (1) change"""
+    return func.coalesce(func.sum(case(
+        *[(_ledger.c.entry_type == entry_type.value, effect[position]) for entry_type, effect in EFFECTS.items()],
+        else_=0
+    ) * _ledger.c.amount), 0)
+
+
+def _apply(db, model, key: dict, awaiting: Decimal, earned: Decimal):
+    table = model.__table__
+    statement = pg_insert(table).values(**key, awaiting_amount=awaiting, earned_amount=earned)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.primary_key.columns.values()[0]],
+        set_={
+            "awaiting_amount": table.c.awaiting_amount + statement.excluded.awaiting_amount,
+            "earned_amount": table.c.earned_amount + statement.excluded.earned_amount,
+            "updated_at": func.now(),
+        }
+    ))
+
+
+def record_payment_event(
+    db: Session,
+    entry_type: LedgerEntryType,
+    contract_id: int,
+    amount,
+    worker_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+    transaction_id: Optional[int] = None,
+):
+    """Append a ledger entry and update the contract's and worker's balances
+
+    Returns:
+        False if the entry duplicates an earned one for the same transaction (nothing written)
+    """
+    if worker_id is None:
+        worker_id = db.execute(
+            select(Contract.worker_id).where(Contract.contract_id == contract_id)
+        ).scalar_one()
+    amount = Decimal(str(amount or 0))
+    awaiting_sign, earned_sign = EFFECTS[entry_type]
+
+    entry_id = db.execute(pg_insert(_ledger).values(
+        contract_id=contract_id,
+        worker_id=worker_id,
+        schedule_id=schedule_id,
+        transaction_id=transaction_id,
+        entry_type=entry_type.value,
+        amount=amount,
+    ).on_conflict_do_nothing().returning(_ledger.c.entry_id)).scalar()
+    if entry_id is None:
+        return False
+    _apply(db, ContractBalance, {"contract_id": contract_id, "worker_id": worker_id},
+           awaiting_sign * amount, earned_sign * amount)
+    _apply(db, WorkerBalance, {"worker_id": worker_id}, awaiting_sign * amount, earned_sign * amount)
+    return True
+
+
+def get_worker_balance(db: Session, worker_id: int) -> Tuple[float, float]:
+    """(awaiting_amount, earned_amount) for a worker"""
+    row = db.execute(
+        select(WorkerBalance.awaiting_amount, WorkerBalance.earned_amount)
+        .where(WorkerBalance.worker_id == worker_id)
+    ).first()
+    return (float(row.awaiting_amount), float(row.earned_amount)) if row else (0.0, 0.0)
+
+
+def get_contract_balances(db: Session, contract_ids) -> Dict[int, Tuple[float, float]]:
+    """{contract_id: (awaiting_amount, earned_amount)} for several contracts in one query"""
+    contract_ids = list(contract_ids)
+    if not contract_ids:
+        return {}
+    rows = db.execute(
+        select(ContractBalance.contract_id, ContractBalance.awaiting_amount, ContractBalance.earned_amount)
+        .where(ContractBalance.contract_id.in_(contract_ids))
+    ).all()
+    return {row.contract_id: (float(row.awaiting_amount), float(row.earned_amount)) for row in rows}
+
+
+def _reconcile(conn, model, group_columns) -> int:
+    """Upsert `model` balances from ledger sums; only rows that differ are written"""
+    table = model.__table__
+    sums = (
+        select(*group_columns, _effect_sum(0).label("awaiting_amount"), _effect_sum(1).label("earned_amount"))
+        .group_by(group_columns[0])
+    )
+    statement = pg_insert(table).from_select([c.name for c in group_columns] + ["awaiting_amount", "earned_amount"], sums)
+    corrected = conn.execute(statement.on_conflict_do_update(
+        index_elements=[group_columns[0].name],
+        set_={
+            "awaiting_amount": statement.excluded.awaiting_amount,
+            "earned_amount": statement.excluded.earned_amount,
+            "updated_at": func.now(),
+        },
+        where=(table.c.awaiting_amount != statement.excluded.awaiting_amount)
+        | (table.c.earned_amount != statement.excluded.earned_amount)
+    )).rowcount
+    # Balances with no ledger rows at all (e.g. entries deleted by hand)
+    corrected += conn.execute(
+        table.update()
+        .where(
+            (table.c.awaiting_amount != 0) | (table.c.earned_amount != 0),
+            ~select(_ledger.c.entry_id).where(
+                _ledger.c[group_columns[0].name] == table.c[group_columns[0].name]
+            ).exists()
+        )
+        .values(awaiting_amount=0, earned_amount=0, updated_at=func.now())
+    ).rowcount
+    return corrected
+
+
+def reconcile_payment_balances() -> int:
+    """Recompute contract and worker balances from the ledger (scheduled)
+
+    Returns:
+        Number of balance rows corrected (0 if another worker is already reconciling)
+    """
+    with transactional_connection() as conn, conn.begin():
+        locked = conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": RECONCILE_LOCK_ID}).scalar()
+        if not locked:
+            return 0
+        return (
+            _reconcile(conn, ContractBalance, [_ledger.c.contract_id, func.max(_ledger.c.worker_id).label("worker_id")])
+            + _reconcile(conn, WorkerBalance, [_ledger.c.worker_id])
+        )
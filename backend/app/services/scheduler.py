@@ -0,0 +1,45 @@
+"""Scheduler - Runs maintenance jobs periodically in the background of the API process
+
+Jobs are plain synchronous functions; they run in the threadpool so they never
+block the event loop. Jobs that must not run concurrently across API workers take
+a database advisory lock themselves.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _run_periodically(name: str, job: Callable[[], object], interval: float, initial_delay: float):
+    await asyncio.sleep(initial_delay)
+    while True:
+        try:
+            result = await run_in_threadpool(job)
+            if result:
+                logger.info("Scheduled task %s: %s", name, result)
+        except Exception:
+            logger.exception("Scheduled task %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def schedule(name: str, job: Callable[[], object], interval: float, initial_delay: float = 0.0):
+    """Run `job` every `interval` seconds until shutdown (called on app startup)"""
+    if name not in _tasks:
+        _tasks[name] = asyncio.create_task(_run_periodically(name, job, interval, initial_delay))
+
+
+async def stop_scheduled_tasks():
+    """Cancel every scheduled task (called on app shutdown)"""
+    for task in _tasks.values():
+        task.cancel()
+    for task in _tasks.values():
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
@@ -0,0 +1,178 @@
+"""Storage backends for uploaded files
+
+Keys are paths relative to the uploads root (e.g. cas/ab/cd/<sha256>.jpg), so the same
+key works for every backend:
+
+- LocalStorage: files under settings.upload_dir, served by the /uploads mount
+- S3Storage: any S3-compatible object store (AWS S3, MinIO, ...) via boto3, with
+  presigned POSTs so clients can upload large files without going through the API
+"""
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import ContextManager, Iterator, Optional
+
+from app.config import settings
+
+
+class StorageBackend(ABC):
+    """Interface every storage backend implements"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put_file(self, local_path: Path, key: str, content_type: Optional[str] = None) -> None:
+        """Move a fully written local file into storage under `key`"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL clients use to fetch `key`"""
+
+    @abstractmethod
+    def local_file(self, key: str) -> ContextManager[Path]:
+        """Context manager yielding a local filesystem path with the contents of `key`"""
+
+    def presigned_upload(self, key: str, content_type: str, max_size: int) -> Optional[dict]:
+        """Direct-upload instructions for clients, or None if the backend can't do it"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files on the local disk, served by the /uploads static mount"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def put_file(self, local_path: Path, key: str, content_type: Optional[str] = None) -> None:
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(local_path), target)  # a rename when on the same filesystem
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def url(self, key: str) -> str:
+        return f"/uploads/{key}"
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[Path]:
+        yield self.path(key)
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible object storage (set s3_endpoint_url for MinIO or another stand-in)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        public_url: Optional[str] = None,
+        presign_expires: int = 900,
+    ):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # Path-style addressing works with MinIO and local stand-ins
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.amazonaws.com"
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, local_path: Path, key: str, content_type: Optional[str] = None) -> None:
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        if key.startswith("cas/"):
+            # Content-addressed objects never change
+            extra_args["CacheControl"] = "public, max-age=31536000, immutable"
+        self.client.upload_file(str(local_path), self.bucket, key, ExtraArgs=extra_args or None)
+        Path(local_path).unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[Path]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / Path(key).name
+            self.client.download_file(self.bucket, key, str(path))
+            yield path
+
+    def presigned_upload(self, key: str, content_type: str, max_size: int) -> Optional[dict]:
+        post = self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=self.presign_expires,
+        )
+        return {
+            "method": "POST",
+            "upload_url": post["url"],
+            "fields": post["fields"],
+            "expires_in": self.presign_expires,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_storage() -> StorageBackend:
+    """The configured storage backend (shared instance)"""
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            bucket=settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            public_url=settings.s3_public_url,
+            presign_expires=settings.s3_presign_expires,
+        )
+    return LocalStorage(Path(settings.upload_dir))
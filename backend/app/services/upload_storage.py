@@ -0,0 +1,200 @@
+"""Upload storage service - Content-addressed, deduplicated storage for uploaded files
+
+Blobs are stored once per SHA-256 digest under the key cas/<aa>/<bb>/<digest><ext>,
+sharded by the first two byte pairs of the digest so no directory grows unbounded.
+The extension comes from the file's leading bytes, not the client's Content-Type,
+and the path in stored_files is the one canonical copy of a digest.
+The stored_files table records each blob and when it was last uploaded. An upload's
+URL can be saved on any number of rows (or none), so instead of counting references
+the scheduled sweep_orphan_blobs() collects blobs that no URL column mentions and
+that haven't been uploaded again for ORPHAN_GRACE_DAYS (time for the client to save
+the URL it got back).
+Files uploaded before this existed stay where they are and keep being served from
+/uploads/<category>/... The bytes themselves live in whichever storage backend is
+configured.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import Text, delete, func, select, text, union
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import transactional_connection
+from app.models_v2.contract import Contract
+from app.models_v2.conversation import Message
+from app.models_v2.direct_hire import DirectHire
+from app.models_v2.document import UserDocument
+from app.models_v2.forum import ForumPost
+from app.models_v2.payment import CheckIn, PaymentTransaction
+from app.models_v2.report import Report
+from app.models_v2.stored_file import StoredFile
+from app.services.image_service import RENDITIONS, rendition_key
+from app.services.storage_backends import get_storage
+
+CAS_PREFIX = "cas"
+DIRECT_UPLOAD_PREFIX = "direct"
+TMP_DIR = Path(settings.upload_tmp_dir)  # Outside the served directory
+ORPHAN_GRACE_DAYS = 7
+ORPHAN_SWEEP_BATCH_SIZE = 200
+DIGEST_PATTERN = "[0-9a-f]{64}"
+
+# Columns that can hold upload URLs (or text/JSON containing them). Every blob URL
+# contains the blob's digest, renditions included.
+BLOB_REFERENCE_COLUMNS = (
+    Contract.completion_proof_url,
+    Contract.payment_proof_url,
+    DirectHire.completion_proof_url,
+    DirectHire.payment_proof_url,
+    ForumPost.completion_proof_url,
+    ForumPost.content,  # job photos are in the post's JSON content
+    PaymentTransaction.proof_url,
+    CheckIn.photo_url,
+    Report.evidence_urls,
+    UserDocument.file_path,
+    Message.content,
+)
+
+# Normalise extensions so the same bytes always map to the same path
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+}
+
+
+# Leading bytes of the accepted types
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"%PDF-", ".pdf"),
+)
+
+
+def sniff_extension(path: Path) -> Optional[str]:
+    """Extension of a known file type from its leading bytes, or None"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def extension_for(content_type: Optional[str], original_filename: Optional[str]) -> str:
+    """File extension derived from the content type, falling back to the original name"""
+    if content_type in CONTENT_TYPE_EXTENSIONS:
+        return CONTENT_TYPE_EXTENSIONS[content_type]
+    return Path(original_filename or "").suffix.lower()
+
+
+def temp_upload_path() -> Path:
+    """A fresh temporary path to stream an upload into before it is hashed"""
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    return TMP_DIR / uuid.uuid4().hex
+
+
+def content_relpath(digest: str, ext: str) -> str:
+    """Storage path of a blob relative to the uploads root"""
+    return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def direct_upload_key(ext: str) -> str:
+    """Key for a file the client uploads straight to storage (not content-addressed)"""
+    return f"{DIRECT_UPLOAD_PREFIX}/{uuid.uuid4().hex}{ext}"
+
+
+def content_url(relpath: str) -> str:
+    """Public URL for a stored blob"""
+    return get_storage().url(relpath)
+
+
+def commit_blob(temp_path: Path, digest: str, ext: str, content_type: Optional[str] = None) -> Tuple[str, bool]:
+    """Move a fully written temp file into content-addressed storage
+
+    Returns:
+        (relative storage path, True if this is the first copy of the content)
+    """
+    storage = get_storage()
+    relpath = content_relpath(digest, ext)
+    if storage.exists(relpath):
+        # Duplicate content - keep the existing blob
+        temp_path.unlink(missing_ok=True)
+        return relpath, False
+    # Local moves are atomic renames, so concurrent identical uploads are safe
+    storage.put_file(temp_path, relpath, content_type)
+    return relpath, True
+
+
+def record_blob(
+    db: Session, digest: str, relpath: str, size: int, content_type: Optional[str], commit: bool = True
+) -> str:
+    """Record an upload of a blob (insert it or touch last_referenced_at)
+
+    Returns:
+        The blob's canonical storage path - `relpath`, or the path it was first stored
+        under if the same content already has a row
+    """
+    canonical = db.execute(
+        text("""
+            INSERT INTO stored_files (sha256, storage_path, size, content_type)
+            VALUES (:sha256, :storage_path, :size, :content_type)
+            ON CONFLICT (sha256) DO UPDATE
+            SET last_referenced_at = NOW()
+            RETURNING storage_path
+        """),
+        {"sha256": digest, "storage_path": relpath, "size": size, "content_type": content_type}
+    ).scalar_one()
+    if commit:
+        db.commit()
+    return canonical
+
+
+def _referenced_digests():
+    """Every digest mentioned in a reference column (one scan per column)"""
+    return union(*[
+        select(func.regexp_matches(column, DIGEST_PATTERN, "g", type_=ARRAY(Text))[1].label("sha256"))
+        .where(column.isnot(None))
+        for column in BLOB_REFERENCE_COLUMNS
+    ])
+
+
+def sweep_orphan_blobs(batch_size: int = ORPHAN_SWEEP_BATCH_SIZE) -> int:
+    """Delete blobs (and their renditions) that nothing refers to (scheduled)
+
+    The stored_files rows stay locked while their files are deleted, so an upload
+    of the same content waits in record_blob and then finds the file gone (see
+    use_canonical_path in the upload router). If deleting a file fails the rows
+    are kept and retried next run.
+
+    Returns:
+        Number of blobs deleted
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ORPHAN_GRACE_DAYS)
+    storage = get_storage()
+    with transactional_connection() as conn, conn.begin():
+        orphans = conn.execute(
+            select(StoredFile.sha256, StoredFile.storage_path)
+            .where(
+                StoredFile.last_referenced_at < cutoff,
+                StoredFile.sha256.notin_(_referenced_digests().scalar_subquery())
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for orphan in orphans:
+            for name in RENDITIONS:
+                storage.delete(rendition_key(orphan.storage_path, name))
+            storage.delete(orphan.storage_path)
+        if orphans:
+            conn.execute(delete(StoredFile).where(StoredFile.sha256.in_([o.sha256 for o in orphans])))
+    return len(orphans)
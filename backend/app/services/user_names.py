@@ -0,0 +1,55 @@
+"""User display names - Batched "First Last" lookups with a small shared cache
+
+Message lists, conversation lists and participant lists all show user names.
+resolve_user_names() answers a whole page with at most one query for the users that
+aren't cached. Cached names expire after USER_NAME_CACHE_TTL seconds and are dropped
+as soon as a User's first/last name is changed through the ORM (this process only;
+other workers pick the change up when their entry expires).
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.models_v2.user import User
+
+USER_NAME_CACHE_TTL = 300  # seconds
+USER_NAME_CACHE_SIZE = 10000
+UNKNOWN_USER_NAME = "Unknown"
+
+_cache = TTLCache(maxsize=USER_NAME_CACHE_SIZE, ttl=USER_NAME_CACHE_TTL)
+
+
+def display_name(first_name: str, last_name: str) -> str:
+    return f"{first_name} {last_name}"
+
+
+def invalidate_user_name(user_id: int):
+    """Drop a user's cached name (call after changing it outside the ORM)"""
+    _cache.invalidate(user_id)
+
+
+def resolve_user_names(db: Session, user_ids: Iterable[int]) -> Dict[int, str]:
+    """Display names of several users with at most one query
+
+    Ids that don't match a user are left out; use .get(id, UNKNOWN_USER_NAME).
+    """
+    names, missing = _cache.get_many(user_id for user_id in user_ids if user_id is not None)
+    if missing:
+        rows = db.execute(
+            select(User.id, User.first_name, User.last_name).where(User.id.in_(missing))
+        ).all()
+        for row in rows:
+            name = display_name(row.first_name, row.last_name)
+            _cache.set(row.id, name)
+            names[row.id] = name
+    return names
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_rename(mapper, connection, target):
+    """Profile edits that change a name evict it (history is still set after flush SQL)"""
+    attrs = inspect(target).attrs
+    if attrs.first_name.history.has_changes() or attrs.last_name.history.has_changes():
+        invalidate_user_name(target.id)
@@ -0,0 +1,288 @@
+"""Web Push - Pushes new notifications to subscribed browsers and the installed PWA
+
+When the outbox relay delivers notifications it also queues one push_deliveries row
+per (notification, subscription) in the same transaction. This worker claims due
+rows in batches, sends them concurrently with VAPID-signed Web Push requests
+(pywebpush) and records the outcome:
+
+- sent: the row is deleted
+- subscription gone (404/410): the subscription and its queued pushes are deleted
+- any other failure: retried with exponential backoff, dropped after
+  MAX_PUSH_ATTEMPTS
+
+Claimed rows get their next_attempt_at pushed LEASE_SECONDS ahead, so a worker that
+dies mid-batch only delays those pushes. Any HTTP server can stand in for the push
+service (point a subscription's endpoint at it), which is how this is tested locally.
+"""
+import asyncio
+import json
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from app.config import settings
+from app.db import transactional_connection
+from app.models_v2.push_subscription import PushDelivery, PushSubscription
+
+logger = logging.getLogger(__name__)
+
+MAX_PUSH_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 120
+SEND_TIMEOUT_SECONDS = 10
+
+_subscriptions = PushSubscription.__table__
+_deliveries = PushDelivery.__table__
+_worker_task: Optional[asyncio.Task] = None
+_http_session = None
+
+
+class PushFailed(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def subscription_gone(self) -> bool:
+        return self.status_code in (404, 410)
+
+
+def web_push_enabled() -> bool:
+    return settings.web_push_enabled and bool(settings.vapid_private_key)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts` (exponential, capped, with jitter)"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def push_payload(notification: dict) -> str:
+    """What the service worker receives for a notification"""
+    return json.dumps({
+        "notification_id": notification["notification_id"],
+        "type": notification["type"],
+        "title": notification["title"],
+        "body": notification["message"],
+        "reference_type": notification["reference_type"],
+        "reference_id": notification["reference_id"],
+        "group_count": notification.get("group_count", 1),
+    })
+
+
+def enqueue_pushes(conn, notifications: List[dict]) -> int:
+    """Queue pushes for delivered notifications to all their recipients' subscriptions
+
+    Runs inside the relay's transaction: one query for the subscriptions and one
+    multi-row INSERT for the queue.
+
+    Returns:
+        Number of pushes queued
+    """
+    if not notifications:
+        return 0
+    subscriptions = conn.execute(
+        select(_subscriptions.c.subscription_id, _subscriptions.c.user_id)
+        .where(_subscriptions.c.user_id.in_(list({n["user_id"] for n in notifications})))
+    ).all()
+    if not subscriptions:
+        return 0
+
+    by_user = {}
+    for subscription in subscriptions:
+        by_user.setdefault(subscription.user_id, []).append(subscription.subscription_id)
+
+    rows = [
+        {
+            "subscription_id": subscription_id,
+            "notification_id": notification["notification_id"],
+            "payload": push_payload(notification),
+        }
+        for notification in notifications
+        for subscription_id in by_user.get(notification["user_id"], ())
+    ]
+    if rows:
+        conn.execute(insert(_deliveries), rows)
+    return len(rows)
+
+
+def _get_http_session():
+    """Shared HTTP session so pushes to the same push service reuse connections"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        _http_session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=settings.web_push_concurrency)
+        _http_session.mount("https://", adapter)
+        _http_session.mount("http://", adapter)
+    return _http_session
+
+
+def send_push(endpoint: str, p256dh: str, auth: str, payload: str) -> None:
+    """Send one encrypted, VAPID-signed push. Raises PushFailed."""
+    from pywebpush import WebPushException, webpush
+
+    try:
+        webpush(
+            subscription_info={"endpoint": endpoint, "keys": {"p256dh": p256dh, "auth": auth}},
+            data=payload,
+            vapid_private_key=settings.vapid_private_key,
+            vapid_claims={"sub": settings.vapid_subject},
+            ttl=settings.web_push_ttl,
+            timeout=SEND_TIMEOUT_SECONDS,
+            requests_session=_get_http_session(),
+        )
+    except WebPushException as e:
+        status_code = e.response.status_code if e.response is not None else None
+        raise PushFailed(str(e), status_code)
+    except Exception as e:
+        raise PushFailed(str(e))
+
+
+def _claim_due(batch_size: int) -> list:
+    """Lease a batch of due pushes (with their subscription details)"""
+    now = datetime.now(timezone.utc)
+    with transactional_connection() as conn, conn.begin():
+        due = (
+            select(_deliveries.c.delivery_id)
+            .where(_deliveries.c.next_attempt_at <= now)
+            .order_by(_deliveries.c.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        claimed = conn.execute(
+            update(_deliveries)
+            .where(_deliveries.c.delivery_id.in_(due))
+            .values(next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+            .returning(
+                _deliveries.c.delivery_id,
+                _deliveries.c.subscription_id,
+                _deliveries.c.attempts,
+                _deliveries.c.payload,
+            )
+        ).all()
+        if not claimed:
+            return []
+        subscriptions = {
+            row.subscription_id: row
+            for row in conn.execute(
+                select(_subscriptions).where(
+                    _subscriptions.c.subscription_id.in_(list({c.subscription_id for c in claimed}))
+                )
+            )
+        }
+    return [(delivery, subscriptions.get(delivery.subscription_id)) for delivery in claimed]
+
+
+def _send(item) -> Tuple[object, Optional[PushFailed]]:
+    delivery, subscription = item
+    if subscription is None:
+        return delivery, PushFailed("Subscription removed", 410)
+    try:
+        send_push(subscription.endpoint, subscription.p256dh, subscription.auth, delivery.payload)
+        return delivery, None
+    except PushFailed as e:
+        return delivery, e
+
+
+def _record_results(results) -> None:
+    """Apply a batch's outcomes in one transaction"""
+    now = datetime.now(timezone.utc)
+    sent = [d.delivery_id for d, error in results if error is None]
+    sent_subscriptions = {d.subscription_id for d, error in results if error is None}
+    gone = {d.subscription_id for d, error in results if error is not None and error.subscription_gone}
+    dropped = [
+        d.delivery_id for d, error in results
+        if error is not None and not error.subscription_gone and d.attempts + 1 >= MAX_PUSH_ATTEMPTS
+    ]
+    retries = [
+        {
+            "b_delivery_id": d.delivery_id,
+            "b_attempts": d.attempts + 1,
+            "b_next_attempt_at": now + timedelta(seconds=backoff_seconds(d.attempts + 1)),
+            "b_last_error": str(error)[:1000],
+        }
+        for d, error in results
+        if error is not None and not error.subscription_gone and d.attempts + 1 < MAX_PUSH_ATTEMPTS
+    ]
+
+    with transactional_connection() as conn, conn.begin():
+        if sent or dropped:
+            conn.execute(delete(_deliveries).where(_deliveries.c.delivery_id.in_(sent + dropped)))
+        if sent_subscriptions:
+            conn.execute(
+                update(_subscriptions)
+                .where(_subscriptions.c.subscription_id.in_(list(sent_subscriptions)))
+                .values(last_success_at=now)
+            )
+        if gone:
+            # Queued pushes go with them (ON DELETE CASCADE)
+            conn.execute(delete(_subscriptions).where(_subscriptions.c.subscription_id.in_(list(gone))))
+        if retries:
+            conn.execute(
+                update(_deliveries)
+                .where(_deliveries.c.delivery_id == bindparam("b_delivery_id"))
+                .values(
+                    attempts=bindparam("b_attempts"),
+                    next_attempt_at=bindparam("b_next_attempt_at"),
+                    last_error=bindparam("b_last_error"),
+                ),
+                retries,
+            )
+
+
+def deliver_due_pushes(batch_size: int = None) -> int:
+    """Send one batch of due pushes
+
+    Returns:
+        Number of pushes attempted
+    """
+    batch_size = batch_size or settings.web_push_batch_size
+    claimed = _claim_due(batch_size)
+    if not claimed:
+        return 0
+    with ThreadPoolExecutor(max_workers=settings.web_push_concurrency) as pool:
+        results = list(pool.map(_send, claimed))
+    _record_results(results)
+    return len(claimed)
+
+
+async def run_push_worker():
+    """Background loop: send due pushes, then sleep until the next poll"""
+    batch_size = settings.web_push_batch_size
+    while True:
+        try:
+            attempted = await run_in_threadpool(deliver_due_pushes, batch_size)
+        except Exception:
+            logger.exception("Web Push worker error")
+            attempted = 0
+        if attempted < batch_size:
+            await asyncio.sleep(settings.web_push_interval)
+
+
+def start_push_worker():
+    """Start the push worker (called on app startup)"""
+    global _worker_task
+    if web_push_enabled() and _worker_task is None:
+        _worker_task = asyncio.create_task(run_push_worker())
+
+
+async def stop_push_worker():
+    """Stop the push worker (called on app shutdown)"""
+    global _worker_task
+    if _worker_task is not None:
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except asyncio.CancelledError:
+            pass
+        _worker_task = None
@@ -0,0 +1,181 @@
+"""
+Static file serving for /uploads with long-lived caching and byte-range support
+
+Content-addressed uploads (uploads/cas/...) never change once written, so they are
+served with a far-future immutable Cache-Control. Single byte ranges are answered
+with 206 Partial Content so completion-proof videos can be seeked. When the server
+supports the ASGI zero-copy send extension the open file is handed to it
+(sendfile); otherwise the file is streamed in chunks from a worker thread.
+"""
+import os
+import typing
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Legacy uploads use unique timestamp+uuid names, but were never promised to be immutable
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+
+CONTENT_ADDRESSED_PREFIX = "cas/"
+
+
+def parse_range(range_header: str, file_size: int) -> typing.Optional[typing.Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair
+
+    Returns None for headers we don't handle (multiple ranges, other units), in
+    which case the whole file is served. Raises ValueError if unsatisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if start_str == "":
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            start = max(0, file_size - length)
+            end = file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+            end = min(end, file_size - 1)
+    except ValueError:
+        raise ValueError("Malformed range")
+
+    if start >= file_size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class UploadFileResponse(FileResponse):
+    """FileResponse that can send a byte range and uses zero-copy send when available"""
+
+    def __init__(self, *args, byte_range: typing.Optional[typing.Tuple[int, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.byte_range = byte_range
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            if self.byte_range is not None:
+                offset, end = self.byte_range
+                count = end - offset + 1
+            else:
+                offset, count = 0, self.stat_result.st_size
+
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await self._send_zerocopy(send, offset, count)
+            else:
+                await self._send_chunks(send, offset, count)
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_zerocopy(self, send: Send, offset: int, count: int) -> None:
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            await send({
+                "type": "http.response.zerocopy",
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": False,
+            })
+        finally:
+            file.close()
+
+    async def _send_chunks(self, send: Send, offset: int, count: int) -> None:
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                # File shrank underneath us - close the body cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles for user uploads: cache headers, Range requests and zero-copy sends"""
+
+    def cache_control_for(self, scope: Scope) -> str:
+        path = scope["path"].lstrip("/")
+        if path.startswith(CONTENT_ADDRESSED_PREFIX):
+            return IMMUTABLE_CACHE_CONTROL
+        return DEFAULT_CACHE_CONTROL
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        method = scope["method"]
+        request_headers = Headers(scope=scope)
+        cache_control = self.cache_control_for(scope)
+
+        response = UploadFileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, method=method
+        )
+        response.headers["cache-control"] = cache_control
+        response.headers["accept-ranges"] = "bytes"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if not range_header or status_code != 200:
+            return response
+
+        # If-Range: only honour the range if the client's copy is still current
+        if_range = request_headers.get("if-range")
+        if if_range and if_range not in (response.headers["etag"], response.headers["last-modified"]):
+            return response
+
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={
+                    "content-range": f"bytes */{stat_result.st_size}",
+                    "accept-ranges": "bytes",
+                },
+            )
+        if byte_range is None:
+            return response
+
+        response = UploadFileResponse(
+            full_path, stat_result=stat_result, method=method, byte_range=byte_range
+        )
+        response.headers["cache-control"] = cache_control
+        response.headers["accept-ranges"] = "bytes"
+        return response
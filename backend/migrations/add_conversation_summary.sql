@@ -0,0 +1,35 @@
+-- Migration: Denormalized conversation summary
+-- The inbox reads the last message and each participant's unread count from the
+-- conversations row; the API keeps them current on send, delete and mark-read.
+
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_id INTEGER;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(255);
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS unread_counts INTEGER[] NOT NULL DEFAULT '{}';
+
+-- Backfill the last message
+UPDATE conversations c
+SET last_message_id = m.message_id,
+    last_message_preview = LEFT(m.content, 200),
+    last_message_at = m.sent_at
+FROM (
+    SELECT DISTINCT ON (conversation_id) conversation_id, message_id, content, sent_at
+    FROM messages
+    WHERE deleted_at IS NULL
+    ORDER BY conversation_id, message_id DESC
+) m
+WHERE m.conversation_id = c.conversation_id;
+
+-- Backfill unread counts, one per participant in participant_ids order
+UPDATE conversations c
+SET unread_counts = ARRAY(
+    SELECT (
+        SELECT COUNT(*) FROM messages m
+        WHERE m.conversation_id = c.conversation_id
+          AND m.sender_id <> c.participant_ids[i]
+          AND m.read_at IS NULL
+          AND m.deleted_at IS NULL
+    )::INTEGER
+    FROM generate_subscripts(c.participant_ids, 1) AS i
+    ORDER BY i
+);
@@ -0,0 +1,9 @@
+-- Migration: Idempotent message sends
+-- Clients attach a client_message_id (e.g. a UUID) to each message; a retried send
+-- with the same key hits this index and returns the original message instead of a
+-- duplicate.
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS client_message_id VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_sender_client_id
+    ON messages(sender_id, client_message_id) WHERE client_message_id IS NOT NULL;
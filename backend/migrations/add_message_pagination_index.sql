@@ -0,0 +1,5 @@
+-- Migration: Message history pagination
+-- get_conversation loads the newest page per conversation by message_id and scrolls
+-- back with a message_id cursor; this index serves both without sorting.
+
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_desc ON messages(conversation_id, message_id DESC);
@@ -0,0 +1,9 @@
+-- Migration: Full-text message search
+-- GET /messages/search matches against this generated tsvector. The 'simple'
+-- configuration does no stemming, since chats mix English and Filipino.
+-- Adding a stored generated column rewrites the table, so run it off-peak.
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search ON messages USING GIN(search_vector);
@@ -0,0 +1,10 @@
+-- Migration: Notification digests
+-- Repeated notifications about the same thing (e.g. applications to one job) are
+-- merged into one row; group_count is how many events the row stands for.
+
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS group_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE notifications_archive ADD COLUMN IF NOT EXISTS group_count INTEGER NOT NULL DEFAULT 1;
+
+-- Lets the outbox relay find a user's open digest for a reference quickly
+CREATE INDEX IF NOT EXISTS idx_notifications_digest
+    ON notifications(user_id, type, reference_id, created_at DESC) WHERE is_read = FALSE;
@@ -0,0 +1,19 @@
+-- Migration: Transactional outbox for notifications
+-- Routers write notifications here in the same transaction as the state change;
+-- the outbox relay moves them into notifications in batches and deletes them here.
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    outbox_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type notification_type NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    reference_type VARCHAR(50),
+    reference_id INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,     -- failed deliveries; rows stop being retried at 5
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- The relay claims pending rows in outbox_id order
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending ON notification_outbox(outbox_id) WHERE attempts < 5;
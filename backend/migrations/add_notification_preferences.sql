@@ -0,0 +1,11 @@
+-- Migration: Per-user notification preferences
+-- Users without a row get the defaults (everything on, no quiet hours, hourly digests).
+
+CREATE TABLE IF NOT EXISTS notification_preferences (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    muted_types VARCHAR[] NOT NULL DEFAULT '{}',        -- notification_type values not to send
+    quiet_hours_start TIME,                              -- no live/push delivery between start and end
+    quiet_hours_end TIME,                                -- (local time, may span midnight)
+    digest_frequency VARCHAR(20) NOT NULL DEFAULT 'hourly',  -- immediate, hourly or daily
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
@@ -0,0 +1,31 @@
+-- Migration: Notification retention, archive and per-user unread counters
+-- Read notifications older than the retention period are moved to notifications_archive
+-- by the scheduled maintenance job; unread counts are read from notification_counters.
+
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    notification_id INTEGER PRIMARY KEY,     -- same ID the notification had
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type notification_type NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    reference_type VARCHAR(50),
+    reference_id INTEGER,
+    read_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_archive_user ON notifications_archive(user_id);
+
+CREATE TABLE IF NOT EXISTS notification_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Lets the retention job find expired read notifications without scanning unread ones
+CREATE INDEX IF NOT EXISTS idx_notifications_read_created ON notifications(created_at) WHERE is_read = TRUE;
+
+-- Backfill the counters from existing notifications
+INSERT INTO notification_counters (user_id, unread_count)
+SELECT user_id, COUNT(*) FROM notifications WHERE is_read = FALSE GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET unread_count = EXCLUDED.unread_count;
@@ -0,0 +1,65 @@
+-- Migration: Payment ledger and running balances
+-- Every payment movement (sent, confirmed, disputed, recorded) appends a
+-- payment_ledger row and adds the same amounts to contract_balances and
+-- worker_balances, so earnings summaries are a primary-key read.
+-- The backend recomputes the balances from the ledger hourly.
+
+CREATE TABLE IF NOT EXISTS payment_ledger (
+    entry_id SERIAL PRIMARY KEY,
+    contract_id INTEGER NOT NULL REFERENCES contracts(contract_id) ON DELETE CASCADE,
+    worker_id INTEGER NOT NULL REFERENCES workers(worker_id),
+    schedule_id INTEGER,
+    transaction_id INTEGER,
+    entry_type VARCHAR(20) NOT NULL,  -- 'sent', 'confirmed', 'disputed', 'recorded'
+    amount NUMERIC NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_payment_ledger_contract ON payment_ledger(contract_id);
+CREATE INDEX IF NOT EXISTS idx_payment_ledger_worker ON payment_ledger(worker_id);
+-- A transaction is earned once; sent/disputed may repeat (re-sent after a dispute)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_ledger_earned_once
+    ON payment_ledger(transaction_id) WHERE entry_type IN ('confirmed', 'recorded');
+
+CREATE TABLE IF NOT EXISTS contract_balances (
+    contract_id INTEGER PRIMARY KEY REFERENCES contracts(contract_id) ON DELETE CASCADE,
+    worker_id INTEGER NOT NULL REFERENCES workers(worker_id),
+    awaiting_amount NUMERIC NOT NULL DEFAULT 0,
+    earned_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_contract_balances_worker ON contract_balances(worker_id);
+
+CREATE TABLE IF NOT EXISTS worker_balances (
+    worker_id INTEGER PRIMARY KEY REFERENCES workers(worker_id),
+    awaiting_amount NUMERIC NOT NULL DEFAULT 0,
+    earned_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Backfill: one entry per payment that is currently sent or already confirmed.
+-- Confirmed payments are entered as 'recorded' (straight to earned), since their
+-- earlier 'sent' step was never logged.
+INSERT INTO payment_ledger (contract_id, worker_id, schedule_id, transaction_id, entry_type, amount)
+SELECT ps.contract_id, c.worker_id, ps.schedule_id, pt.transaction_id,
+       CASE UPPER(ps.status::text) WHEN 'CONFIRMED' THEN 'recorded' ELSE 'sent' END,
+       COALESCE(pt.amount_paid, ps.amount)
+FROM payment_schedules ps
+JOIN contracts c ON c.contract_id = ps.contract_id
+LEFT JOIN payment_transactions pt ON pt.schedule_id = ps.schedule_id
+WHERE UPPER(ps.status::text) IN ('SENT', 'CONFIRMED')
+  AND c.worker_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM payment_ledger);
+
+INSERT INTO contract_balances (contract_id, worker_id, awaiting_amount, earned_amount)
+SELECT contract_id, MAX(worker_id),
+       SUM(CASE entry_type WHEN 'sent' THEN amount WHEN 'confirmed' THEN -amount WHEN 'disputed' THEN -amount ELSE 0 END),
+       SUM(CASE entry_type WHEN 'confirmed' THEN amount WHEN 'recorded' THEN amount ELSE 0 END)
+FROM payment_ledger
+GROUP BY contract_id
+ON CONFLICT (contract_id) DO NOTHING;
+
+INSERT INTO worker_balances (worker_id, awaiting_amount, earned_amount)
+SELECT worker_id, SUM(awaiting_amount), SUM(earned_amount)
+FROM contract_balances
+GROUP BY worker_id
+ON CONFLICT (worker_id) DO NOTHING;
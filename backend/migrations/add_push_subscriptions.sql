@@ -0,0 +1,28 @@
+-- Migration: Web Push (VAPID) subscriptions and delivery queue
+-- The outbox relay queues one push_deliveries row per notification and subscription;
+-- the push worker sends them and retries failures with backoff.
+
+CREATE TABLE IF NOT EXISTS push_subscriptions (
+    subscription_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    endpoint TEXT NOT NULL UNIQUE,          -- push service URL for one browser/device
+    p256dh VARCHAR(255) NOT NULL,
+    auth VARCHAR(255) NOT NULL,
+    user_agent VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_success_at TIMESTAMP WITH TIME ZONE
+);
+CREATE INDEX IF NOT EXISTS idx_push_subscriptions_user ON push_subscriptions(user_id);
+
+CREATE TABLE IF NOT EXISTS push_deliveries (
+    delivery_id SERIAL PRIMARY KEY,
+    subscription_id INTEGER NOT NULL REFERENCES push_subscriptions(subscription_id) ON DELETE CASCADE,
+    notification_id INTEGER,
+    payload TEXT NOT NULL,                  -- JSON sent to the service worker
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+-- The worker claims due rows in next_attempt_at order
+CREATE INDEX IF NOT EXISTS idx_push_deliveries_due ON push_deliveries(next_attempt_at);
@@ -0,0 +1,13 @@
+-- Migration: Content-addressed upload storage
+-- One row per unique uploaded blob, keyed by SHA-256. Blobs that no URL column
+-- mentions are removed by the backend's daily orphan sweep.
+-- Files uploaded before this migration stay in uploads/<category>/ and keep working.
+
+CREATE TABLE IF NOT EXISTS stored_files (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    storage_path VARCHAR NOT NULL,          -- e.g. cas/ab/cd/<sha256>.jpg (relative to uploads/)
+    size INTEGER NOT NULL,
+    content_type VARCHAR(100),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_referenced_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
@@ -0,0 +1,116 @@
+"""CompressionMiddleware: encoding negotiation and which responses are left alone"""
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, parse_accept_encoding
+
+BODY = "casaligan " * 500  # ~5KB, well over minimum_size
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, **options)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/image")
+    def image():
+        return Response(BODY.encode(), media_type="image/png")
+
+    @app.get("/status/{code}")
+    def with_status(code: int):
+        headers = {"Content-Range": f"bytes 0-99/{len(BODY)}"} if code == 206 else None
+        return Response(BODY.encode() if code == 206 else b"", status_code=code,
+                        media_type="text/plain", headers=headers)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((BODY for _ in range(3)), media_type="text/plain")
+
+    return app
+
+
+@pytest.fixture
+def client():
+    return TestClient(_app())
+
+
+def _get(client, path, accept_encoding):
+    return client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_gzip(client):
+    response = _get(client, "/large", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.text == BODY  # httpx decodes gzip
+    assert int(response.headers["Content-Length"]) < len(BODY)
+
+
+def test_brotli_preferred(client):
+    response = _get(client, "/large", "gzip, deflate, br")
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.text == BODY
+
+
+def test_brotli_disabled_falls_back_to_gzip():
+    response = _get(TestClient(_app(enable_brotli=False)), "/large", "br, gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "identity", "gzip;q=0, br;q=0", "deflate"])
+def test_not_accepted(client, accept_encoding):
+    response = _get(client, "/large", accept_encoding)
+    assert "Content-Encoding" not in response.headers
+    assert response.text == BODY
+
+
+def test_wildcard(client):
+    assert _get(client, "/large", "*").headers["Content-Encoding"] == "br"
+    assert _get(client, "/large", "*, br;q=0").headers["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("path", ["/small", "/image"])
+def test_small_and_binary_responses_pass_through(client, path):
+    response = _get(client, path, "gzip, br")
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("code", [204, 206, 304])
+def test_skipped_status_codes_pass_through(client, code):
+    response = _get(client, f"/status/{code}", "gzip, br")
+    assert response.status_code == code
+    assert "Content-Encoding" not in response.headers
+    if code == 206:
+        assert response.content == BODY.encode()
+
+
+def test_streaming_response_is_compressed_incrementally(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw).decode() == BODY * 3
+
+
+def test_brotli_streaming(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "br"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert brotli.decompress(raw).decode() == BODY * 3
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, BR , *;q=0, x;q=bad") == {
+        "gzip": 0.5, "br": 1.0, "*": 0.0, "x": 0.0
+    }
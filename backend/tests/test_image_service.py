@@ -0,0 +1,66 @@
+"""Image renditions: alpha is kept, and rendering runs in spawned worker processes"""
+import asyncio
+
+import pytest
+from PIL import Image
+
+from app.services import image_service
+from app.services.image_service import RENDITIONS, generate_renditions, rendition_key
+from app.services.storage_backends import LocalStorage
+
+
+def _half_transparent(mode: str) -> Image.Image:
+    """Left half opaque, right half transparent"""
+    if mode == "P":  # palette with a transparent index (PNG tRNS)
+        img = Image.new("P", (40, 20), 0)
+        img.putpalette([255, 0, 0, 0, 0, 255])
+        img.paste(1, (0, 0, 20, 20))
+        return img
+    img = Image.new("RGBA", (40, 20), (255, 0, 0, 0))
+    img.paste((0, 0, 255, 255), (0, 0, 20, 20))
+    return img.convert(mode)
+
+
+@pytest.mark.parametrize("mode", ["LA", "P", "RGBA"])
+def test_transparency_is_kept(tmp_path, mode):
+    source = tmp_path / "source.png"
+    img = _half_transparent(mode)
+    img.save(source, **({"transparency": 0} if mode == "P" else {}))
+
+    written = generate_renditions(str(source), str(tmp_path))
+
+    with Image.open(written["large"]) as rendition:
+        assert rendition.mode == "RGBA"
+        assert rendition.getpixel((30, 10))[3] == 0    # transparent half stays transparent
+        assert rendition.getpixel((5, 10))[3] == 255
+
+
+def test_opaque_palette_image_becomes_rgb(tmp_path):
+    source = tmp_path / "source.png"
+    Image.new("RGB", (10, 10), "green").convert("P").save(source)
+
+    with Image.open(generate_renditions(str(source), str(tmp_path))["thumb"]) as rendition:
+        assert rendition.mode == "RGB"
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    local = LocalStorage(tmp_path / "uploads")
+    monkeypatch.setattr(image_service, "get_storage", lambda: local)
+    monkeypatch.setattr(image_service.settings, "upload_tmp_dir", str(tmp_path / "tmp"))
+    yield local
+    image_service.shutdown_pool()
+
+
+def test_process_image_renders_in_spawned_workers(storage):
+    key = "cas/ab/cd/abcd.jpg"
+    storage.path(key).parent.mkdir(parents=True)
+    Image.new("RGB", (2000, 1000), "white").save(storage.path(key), "JPEG")
+
+    asyncio.run(image_service.process_image(key))
+
+    assert image_service.get_pool()._mp_context.get_start_method() == "spawn"
+    for name, (size, crop) in RENDITIONS.items():
+        with Image.open(storage.path(rendition_key(key, name))) as rendition:
+            assert max(rendition.size) == size
+    assert storage.path(key).exists()  # the original is left in place
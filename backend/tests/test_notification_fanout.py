@@ -0,0 +1,81 @@
+"""notify_many and the live stream fan-out issue a fixed number of statements per batch"""
+import pytest
+
+from app.models_v2.notification import NotificationType
+from app.services import notification_preferences
+from app.services.notification_service import notify_many
+from app.services.notification_stream import notify_streams
+
+
+class _Result:
+    def all(self):
+        return []
+
+
+class RecordingSession:
+    """Stands in for a Session/Connection and records every statement executed"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        return _Result()
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture(autouse=True)
+def empty_preference_cache():
+    notification_preferences._cache.clear()
+    yield
+    notification_preferences._cache.clear()
+
+
+@pytest.mark.parametrize("recipients", [1, 10, 500])
+def test_notify_many_statement_count_is_constant(recipients):
+    db = RecordingSession()
+
+    queued = notify_many(
+        db,
+        range(1, recipients + 1),
+        NotificationType.JOB_APPLICATION,
+        title="Hello {name}",
+        message="Job update",
+        params={user_id: {"name": f"user{user_id}"} for user_id in range(1, recipients + 1)},
+    )
+
+    assert queued == recipients
+    # One preference lookup, one multi-row INSERT, one commit
+    assert len(db.statements) == 2
+    assert len(db.statements[1][1]) == recipients
+    assert db.commits == 1
+
+
+def test_notify_many_uses_cached_preferences():
+    db = RecordingSession()
+    notify_many(db, [1, 2, 3], NotificationType.JOB_APPLICATION, "t", "m")
+
+    db = RecordingSession()
+    notify_many(db, [1, 2, 3], NotificationType.JOB_APPLICATION, "t", "m", commit=False)
+
+    # Preferences come from the cache: only the INSERT remains
+    assert len(db.statements) == 1
+    assert db.commits == 0
+
+
+@pytest.mark.parametrize("batch_size", [1, 50, 1000])
+def test_notify_streams_is_one_statement_per_batch(batch_size):
+    conn = RecordingSession()
+    notifications = [
+        {"notification_id": i, "user_id": i, "title": "Payment sent", "message": "x" * 200}
+        for i in range(batch_size)
+    ]
+
+    notify_streams(conn, notifications)
+
+    assert len(conn.statements) == 1
+    payloads = conn.statements[0][1]["payloads"]
+    assert all(len(payload.encode()) < 8000 for payload in payloads)
@@ -0,0 +1,62 @@
+"""model_list_response returns the same JSON as FastAPI's default response path"""
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app import serialization
+from app.serialization import get_default_response_class, model_list_response
+
+
+class Item(BaseModel):
+    item_id: int
+    title: str
+    amount: float
+    note: Optional[str]
+    tags: List[str]
+    created_at: datetime
+
+
+ITEMS = [
+    Item(item_id=1, title="Laba ñ \"quoted\"", amount=1500.5, note=None, tags=["a", "b"],
+         created_at=datetime(2024, 5, 1, 8, 30)),
+    Item(item_id=2, title="Plancha", amount=0.1 + 0.2, note="x", tags=[],
+         created_at=datetime(2024, 5, 2, 23, 59, 59, 123456)),
+]
+
+
+@pytest.mark.parametrize("response_class", [JSONResponse, ORJSONResponse])
+def test_model_list_response_matches_default(response_class):
+    app = FastAPI(default_response_class=response_class)
+
+    @app.get("/default", response_model=List[Item])
+    def default():
+        return ITEMS
+
+    @app.get("/fast", response_model=List[Item])
+    def fast():
+        return model_list_response(ITEMS, Item)
+
+    client = TestClient(app)
+    default_response, fast_response = client.get("/default"), client.get("/fast")
+
+    assert fast_response.headers["content-type"] == "application/json"
+    assert fast_response.json() == default_response.json()
+
+
+def test_empty_list():
+    assert model_list_response([], Item).body == b"[]"
+
+
+def test_default_response_class(monkeypatch):
+    monkeypatch.setattr(serialization.settings, "orjson_responses", True)
+    assert get_default_response_class() is ORJSONResponse
+    monkeypatch.setattr(serialization.settings, "orjson_responses", False)
+    assert get_default_response_class() is JSONResponse
+    monkeypatch.setattr(serialization.settings, "orjson_responses", True)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert get_default_response_class() is JSONResponse
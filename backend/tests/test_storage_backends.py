@@ -0,0 +1,73 @@
+"""S3Storage against an in-process S3 (moto)"""
+import pytest
+import requests
+from moto import mock_s3
+
+from app.services.storage_backends import S3Storage
+
+BUCKET = "casaligan-test"
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        storage = S3Storage(
+            bucket=BUCKET,
+            region="us-east-1",
+            access_key_id="testing",
+            secret_access_key="testing",
+        )
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+def test_put_exists_read_delete(s3, tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"png bytes")
+    key = "cas/ab/cd/abcd.png"
+
+    assert not s3.exists(key)
+    s3.put_file(source, key, "image/png")
+
+    assert s3.exists(key)
+    assert not source.exists()  # moved, like LocalStorage
+    head = s3.client.head_object(Bucket=BUCKET, Key=key)
+    assert head["ContentType"] == "image/png"
+    assert "immutable" in head["CacheControl"]
+    with s3.local_file(key) as path:
+        assert path.read_bytes() == b"png bytes"
+
+    s3.delete(key)
+    assert not s3.exists(key)
+    s3.delete(key)  # deleting a missing key is not an error
+
+
+def test_only_content_addressed_objects_are_immutable(s3, tmp_path):
+    source = tmp_path / "upload"
+    source.write_bytes(b"video")
+    s3.put_file(source, "direct/video.mp4")
+
+    assert "CacheControl" not in s3.client.head_object(Bucket=BUCKET, Key="direct/video.mp4")
+
+
+def test_presigned_post_uploads_within_limits(s3):
+    presigned = s3.presigned_upload("direct/proof.png", "image/png", max_size=1024)
+
+    response = requests.post(
+        presigned["upload_url"],
+        data=presigned["fields"],
+        files={"file": ("proof.png", b"proof", "image/png")},
+    )
+
+    assert response.status_code in (200, 204)
+    assert s3.exists("direct/proof.png")
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    ({}, f"https://{BUCKET}.s3.amazonaws.com/cas/x.png"),
+    ({"endpoint_url": "http://localhost:9000/"}, f"http://localhost:9000/{BUCKET}/cas/x.png"),
+    ({"public_url": "https://cdn.example.com/"}, "https://cdn.example.com/cas/x.png"),
+])
+def test_url(kwargs, expected):
+    with mock_s3():
+        assert S3Storage(bucket=BUCKET, region="us-east-1", **kwargs).url("cas/x.png") == expected
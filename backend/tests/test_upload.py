@@ -0,0 +1,82 @@
+"""Upload routes leave nothing in storage when recording the blob fails"""
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.db import get_transactional_db
+from app.routers import upload
+from app.security import get_current_user
+from app.services import upload_storage
+from app.services.storage_backends import LocalStorage
+
+
+class FailingSession:
+    """Stands in for the request session; every statement fails"""
+
+    def __init__(self):
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        raise RuntimeError("database unavailable")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    local = LocalStorage(tmp_path / "uploads")
+    monkeypatch.setattr(upload, "get_storage", lambda: local)
+    monkeypatch.setattr(upload_storage, "get_storage", lambda: local)
+    monkeypatch.setattr(upload_storage, "TMP_DIR", tmp_path / "tmp")
+    return local
+
+
+@pytest.fixture
+def session():
+    return FailingSession()
+
+
+@pytest.fixture
+def client(session):
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.dependency_overrides[get_transactional_db] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: object()
+    return TestClient(app)
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _stored_files(storage):
+    return [p for p in storage.root.rglob("*") if p.is_file()]
+
+
+@pytest.mark.parametrize("route", ["/upload/image", "/upload/document"])
+def test_single_upload_removes_blob_when_recording_fails(client, session, storage, route):
+    response = client.post(route, files={"file": ("a.png", _png(), "image/png")})
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == upload.UPLOAD_FAILED_ERROR
+    assert session.rollbacks == 1
+    assert _stored_files(storage) == []
+
+
+def test_multiple_upload_removes_blobs_when_recording_fails(client, storage):
+    response = client.post("/upload/multiple", files=[
+        ("files", ("a.png", _png(), "image/png")),
+        ("files", ("b.txt", b"hello", "text/plain")),
+    ])
+
+    assert response.status_code == 200
+    statuses = [entry["status"] for entry in response.json()["files"]]
+    assert statuses == ["rejected", "rejected"]
+    assert response.json()["files"][0]["error"] == upload.UPLOAD_FAILED_ERROR
+    assert _stored_files(storage) == []
@@ -0,0 +1,123 @@
+"""The Web Push worker against a stub push service (a local HTTP server)"""
+import base64
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.models_v2.push_subscription import PushDelivery, PushSubscription
+from app.services import web_push
+
+# Stub push service responses per endpoint path
+RESPONSES = {"/ok": 201, "/gone": 410, "/fail": 500}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class StubPushService(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append((self.path, self.headers, body))
+        self.send_response(RESPONSES[self.path])
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def push_service():
+    StubPushService.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPushService)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def push_db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    PushSubscription.__table__.create(engine)
+    PushDelivery.__table__.create(engine)
+    monkeypatch.setattr(web_push, "transactional_connection", engine.connect)
+
+    vapid_key = ec.generate_private_key(ec.SECP256R1())
+    monkeypatch.setattr(settings, "vapid_private_key", _b64url(vapid_key.private_numbers().private_value.to_bytes(32, "big")))
+    return engine
+
+
+def _subscribe(conn, subscription_id: int, endpoint: str):
+    client_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    conn.execute(insert(PushSubscription.__table__).values(
+        subscription_id=subscription_id,
+        user_id=subscription_id,
+        endpoint=endpoint,
+        p256dh=_b64url(client_key.public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )),
+        auth=_b64url(os.urandom(16)),
+    ))
+    conn.execute(insert(PushDelivery.__table__).values(
+        delivery_id=subscription_id,
+        subscription_id=subscription_id,
+        notification_id=subscription_id,
+        payload='{"title": "Hello"}',
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc) - timedelta(minutes=1),
+    ))
+
+
+def test_worker_records_each_push_outcome(push_db, push_service):
+    with push_db.begin() as conn:
+        _subscribe(conn, 1, push_service + "/ok")
+        _subscribe(conn, 2, push_service + "/gone")
+        _subscribe(conn, 3, push_service + "/fail")
+
+    assert web_push.deliver_due_pushes(10) == 3
+
+    assert sorted(path for path, _, _ in StubPushService.received) == ["/fail", "/gone", "/ok"]
+    for _, headers, body in StubPushService.received:
+        assert headers["Authorization"].startswith("vapid t=")
+        assert headers["Content-Encoding"] == "aes128gcm"
+        assert b"Hello" not in body  # the payload is encrypted for the subscription
+
+    with push_db.connect() as conn:
+        subscriptions = {row.subscription_id: row for row in conn.execute(select(PushSubscription.__table__))}
+        deliveries = {row.delivery_id: row for row in conn.execute(select(PushDelivery.__table__))}
+
+    # Sent: delivered push removed, subscription marked healthy
+    assert 1 not in deliveries
+    assert subscriptions[1].last_success_at is not None
+    # Gone: the subscription is removed
+    assert 2 not in subscriptions
+    # Failed: kept for a retry with backoff
+    assert deliveries[3].attempts == 1
+    assert deliveries[3].last_error
+    assert deliveries[3].next_attempt_at > datetime.now(timezone.utc).replace(tzinfo=None)  # stored naive by SQLite
+
+    # Nothing is due until the backoff has passed
+    assert web_push.deliver_due_pushes(10) == 0
+
+
+def test_worker_drops_push_after_max_attempts(push_db, push_service):
+    with push_db.begin() as conn:
+        _subscribe(conn, 1, push_service + "/fail")
+        conn.execute(PushDelivery.__table__.update().values(attempts=web_push.MAX_PUSH_ATTEMPTS - 1))
+
+    assert web_push.deliver_due_pushes(10) == 1
+
+    with push_db.connect() as conn:
+        assert conn.execute(select(PushDelivery.__table__)).first() is None
@@ -342,6 +342,10 @@ CREATE TABLE IF NOT EXISTS conversations (
     participant_ids INTEGER[] NOT NULL,
     title VARCHAR(255),
     status conversation_status DEFAULT 'active',
+    last_message_id INTEGER,
+    last_message_preview VARCHAR(255),
+    last_message_at TIMESTAMP WITH TIME ZONE,
+    unread_counts INTEGER[] NOT NULL DEFAULT '{}',  -- unread_counts[i] belongs to participant_ids[i]
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     archived_at TIMESTAMP WITH TIME ZONE
@@ -358,6 +362,8 @@ CREATE TABLE IF NOT EXISTS messages (
     sender_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     content TEXT NOT NULL,
     message_type VARCHAR(50) DEFAULT 'text',
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED,
+    client_message_id VARCHAR(64),  -- client-generated idempotency key
     sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     read_at TIMESTAMP WITH TIME ZONE,
     deleted_at TIMESTAMP WITH TIME ZONE
@@ -365,6 +371,9 @@ CREATE TABLE IF NOT EXISTS messages (
 CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id);
 CREATE INDEX IF NOT EXISTS idx_messages_sent_at ON messages(sent_at);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_desc ON messages(conversation_id, message_id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_search ON messages USING GIN(search_vector);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_sender_client_id ON messages(sender_id, client_message_id) WHERE client_message_id IS NOT NULL;
 
 
 -- Ratings table
@@ -393,10 +402,88 @@ CREATE TABLE IF NOT EXISTS notifications (
     reference_id INTEGER,
     is_read BOOLEAN NOT NULL DEFAULT FALSE,
     read_at TIMESTAMP WITH TIME ZONE,
+    group_count INTEGER NOT NULL DEFAULT 1,  -- events merged into this row (digests)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id);
 CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications(user_id, is_read) WHERE is_read = FALSE;
+CREATE INDEX IF NOT EXISTS idx_notifications_read_created ON notifications(created_at) WHERE is_read = TRUE;
+CREATE INDEX IF NOT EXISTS idx_notifications_digest
+    ON notifications(user_id, type, reference_id, created_at DESC) WHERE is_read = FALSE;
+
+-- Read notifications past the retention period (moved here by the maintenance job)
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    notification_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type notification_type NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    reference_type VARCHAR(50),
+    reference_id INTEGER,
+    group_count INTEGER NOT NULL DEFAULT 1,
+    read_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_archive_user ON notifications_archive(user_id);
+
+-- Per-user notification preferences (no row = defaults)
+CREATE TABLE IF NOT EXISTS notification_preferences (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    muted_types VARCHAR[] NOT NULL DEFAULT '{}',
+    quiet_hours_start TIME,
+    quiet_hours_end TIME,
+    digest_frequency VARCHAR(20) NOT NULL DEFAULT 'hourly',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Web Push subscriptions (one per browser/device)
+CREATE TABLE IF NOT EXISTS push_subscriptions (
+    subscription_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    endpoint TEXT NOT NULL UNIQUE,
+    p256dh VARCHAR(255) NOT NULL,
+    auth VARCHAR(255) NOT NULL,
+    user_agent VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_success_at TIMESTAMP WITH TIME ZONE
+);
+CREATE INDEX IF NOT EXISTS idx_push_subscriptions_user ON push_subscriptions(user_id);
+
+-- Pushes waiting to be sent (retried with backoff)
+CREATE TABLE IF NOT EXISTS push_deliveries (
+    delivery_id SERIAL PRIMARY KEY,
+    subscription_id INTEGER NOT NULL REFERENCES push_subscriptions(subscription_id) ON DELETE CASCADE,
+    notification_id INTEGER,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_push_deliveries_due ON push_deliveries(next_attempt_at);
+
+-- Per-user unread notification count
+CREATE TABLE IF NOT EXISTS notification_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Notification outbox (written with the state change, delivered to notifications in batches)
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    outbox_id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type notification_type NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    reference_type VARCHAR(50),
+    reference_id INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending ON notification_outbox(outbox_id) WHERE attempts < 5;
 
 
 -- Reports table
@@ -451,6 +538,50 @@ CREATE TABLE IF NOT EXISTS payment_transactions (
 );
 
 
+-- Payment ledger (append-only) and running balances
+CREATE TABLE IF NOT EXISTS payment_ledger (
+    entry_id SERIAL PRIMARY KEY,
+    contract_id INTEGER NOT NULL REFERENCES contracts(contract_id) ON DELETE CASCADE,
+    worker_id INTEGER NOT NULL REFERENCES workers(worker_id),
+    schedule_id INTEGER,
+    transaction_id INTEGER,
+    entry_type VARCHAR(20) NOT NULL,
+    amount NUMERIC NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_payment_ledger_contract ON payment_ledger(contract_id);
+CREATE INDEX IF NOT EXISTS idx_payment_ledger_worker ON payment_ledger(worker_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_ledger_earned_once
+    ON payment_ledger(transaction_id) WHERE entry_type IN ('confirmed', 'recorded');
+
+CREATE TABLE IF NOT EXISTS contract_balances (
+    contract_id INTEGER PRIMARY KEY REFERENCES contracts(contract_id) ON DELETE CASCADE,
+    worker_id INTEGER NOT NULL REFERENCES workers(worker_id),
+    awaiting_amount NUMERIC NOT NULL DEFAULT 0,
+    earned_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_contract_balances_worker ON contract_balances(worker_id);
+
+CREATE TABLE IF NOT EXISTS worker_balances (
+    worker_id INTEGER PRIMARY KEY REFERENCES workers(worker_id),
+    awaiting_amount NUMERIC NOT NULL DEFAULT 0,
+    earned_amount NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+
+
+-- Stored files table (content-addressed uploads)
+CREATE TABLE IF NOT EXISTS stored_files (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    storage_path VARCHAR NOT NULL,
+    size INTEGER NOT NULL,
+    content_type VARCHAR(100),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_referenced_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- =======================================================
 -- DONE!
 -- =======================================================